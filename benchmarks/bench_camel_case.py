@@ -0,0 +1,86 @@
+"""
+Micro-benchmark of the snake_case to camelCase key conversion over synthetic payout documents.
+
+Compares the former per-key coroutine conversion with the memoized synchronous converter,
+one document at a time and as a batch.
+
+Usage:
+    python -m benchmarks.bench_camel_case [--documents 10000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import time
+
+from services.text_service import TextTransformService
+from benchmarks.bench_payout_concurrency import seed_payouts
+
+
+async def legacy_snake_to_camel(snake_str):
+    """
+    The original conversion: one coroutine, one split and several title() calls per key.
+    """
+    components = snake_str.split("_")
+    if components[0] == '':
+        return components[1] + ''.join(x.title() for x in components[2:])
+    return components[0] + ''.join(x.title() for x in components[1:])
+
+
+async def legacy_convert(documents):
+    """
+    The original document conversion, awaiting the per-key coroutine.
+    """
+    converted = []
+    for doc in documents:
+        converted_dict = {}
+        for key, value in doc.items():
+            converted_dict[await legacy_snake_to_camel(key)] = value
+        converted.append(converted_dict)
+    return converted
+
+
+async def wrapper_convert(documents):
+    """
+    The backward compatible async API, now a thin wrapper over the memoized converter.
+    """
+    return [await TextTransformService.convert_dict_camel_case(doc) for doc in documents]
+
+
+def best_of(repeat, function):
+    """
+    Returns the fastest of `repeat` timed runs of `function`, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = seed_payouts(args.documents)
+    loop = asyncio.new_event_loop()
+
+    cases = {
+        "legacy async per key": lambda: loop.run_until_complete(legacy_convert(documents)),
+        "async wrapper": lambda: loop.run_until_complete(wrapper_convert(documents)),
+        "convert_keys per doc": lambda: [TextTransformService.convert_keys(doc) for doc in documents],
+        "convert_many": lambda: TextTransformService.convert_many(documents),
+    }
+
+    baseline = None
+    print(f"{'converter':<24}{'ms':>10}{'docs/s':>14}{'speed-up':>10}")
+    for label, function in cases.items():
+        seconds = best_of(args.repeat, function)
+        baseline = baseline or seconds
+        print(f"{label:<24}{seconds * 1000:>10.2f}{args.documents / seconds:>14.0f}{baseline / seconds:>9.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
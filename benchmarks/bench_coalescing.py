@@ -0,0 +1,83 @@
+"""
+Burst load test of identical concurrent GET /payout requests, with and without query coalescing.
+
+Sends bursts of identical requests, as when several admins open the same report at once,
+against an emulated MongoDB with the response cache disabled, and reports how many MongoDB
+commands they cost and how many page queries were executed or coalesced.
+
+Usage:
+    python -m benchmarks.bench_coalescing [--bursts 20] [--burst-size 25] [--latency 0.005] [--documents 2000]
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+
+from main import app
+from database.connection import db
+from services.pagination_service import PaginationService
+from services.response_cache_service import ResponseCacheService
+from services.cache_service import TTLCache
+from services.token_service import TokenService
+from benchmarks.fake_mongo import FakeDatabase
+from benchmarks.reporting import percentile
+from benchmarks.seed import seed_payouts
+
+
+async def run_bursts(bursts, burst_size):
+    """
+    Sends `bursts` rounds of `burst_size` simultaneous identical requests, one report page per round.
+
+    Returns:
+    - tuple: The request latencies and the seconds spent.
+    """
+    transport = httpx.ASGITransport(app=app)
+    headers = {"authorization": TokenService.create_jwt("bench@example.com", "admin")}
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        async def one_request(page):
+            started = time.perf_counter()
+            response = await client.get("/payout", params={"page": page, "statuses": "paid,pending"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for burst in range(bursts):
+            await asyncio.gather(*(one_request(burst % 10 + 1) for _ in range(burst_size)))
+        return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--burst-size", type=int, default=25, help="Identical requests sent at once")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds per MongoDB round trip")
+    parser.add_argument("--documents", type=int, default=2000)
+    args = parser.parse_args()
+
+    documents = seed_payouts(args.documents)
+
+    print(f"{'coalescing':<12}{'requests':>10}{'commands':>10}{'commands/s':>12}{'executed':>10}{'coalesced':>11}{'p99 ms':>9}")
+    for coalesce in (False, True):
+        db.db = FakeDatabase(latency=args.latency)
+        db.db["payout_affiliate"].documents = documents
+        before = PaginationService.page_queries.stats()
+
+        # Every request must reach PaginationService, so the rendered page cache is off
+        with patch.object(ResponseCacheService, "cache", TTLCache(maxsize=0)), \
+                patch.object(PaginationService, "coalesce_queries", coalesce):
+            latencies, elapsed = asyncio.run(run_bursts(args.bursts, args.burst_size))
+
+        after = PaginationService.page_queries.stats()
+        commands = db.db.round_trips
+        print(f"{'on' if coalesce else 'off':<12}{len(latencies):>10}{commands:>10}{commands / elapsed:>12.1f}"
+              f"{after['executed'] - before['executed']:>10}{after['coalesced'] - before['coalesced']:>11}"
+              f"{percentile(latencies, 0.99) * 1000:>9.1f}")
+    db.db = None
+
+
+if __name__ == "__main__":
+    main()
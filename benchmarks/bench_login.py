@@ -0,0 +1,93 @@
+"""
+Load test of POST /login under concurrent logins.
+
+Drives the ASGI app in-process against an emulated users collection whose passwords are
+scrypt hashes, once with hashing run inline on the event loop and once on the bounded
+hashing pool, and reports the login latency percentiles. A heartbeat task measures how
+long the event loop is stalled meanwhile, which is what every other request would feel.
+
+Usage:
+    python -m benchmarks.bench_login [--requests 200] [--concurrency 50] [--users 50] [--latency 0.002]
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+
+from main import app
+from services.password_service import password_hasher
+from benchmarks.fake_mongo import FakeCollection
+from benchmarks.reporting import percentile
+
+
+async def measure_loop_lag(lags, interval=0.005):
+    """
+    Records how late each heartbeat of the event loop fires, until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - expected)
+
+
+async def run_load(users, total_requests, concurrency):
+    """
+    Sends `total_requests` logins with at most `concurrency` in flight.
+
+    Returns:
+    - tuple: Login latencies and event loop lags, in seconds.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    latencies, lags = [], []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_login(index):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/login", json={"email": f"user{index % users}@example.com", "password": "password"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        heartbeat = asyncio.create_task(measure_loop_lag(lags))
+        await asyncio.gather(*(one_login(i) for i in range(total_requests)))
+        heartbeat.cancel()
+    return latencies, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.002, help="Seconds per MongoDB round trip")
+    args = parser.parse_args()
+
+    # Hashing is salted per call, but a single hash for everyone keeps the seeding fast
+    hashed = password_hasher._hash("password")
+    documents = [{"_id": index, "email": f"user{index}@example.com", "password": hashed, "user_type": "admin"}
+                 for index in range(args.users)]
+
+    # Let every login queue for the pool, a 503 would abort the run
+    password_hasher.queue_size = args.requests
+
+    async def inline(function, *arguments):
+        return function(*arguments)
+
+    print(f"{'hashing':<10}{'logins':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max loop lag ms':>18}")
+    for label, runner in (("inline", inline), ("pool", password_hasher._run)):
+        users = SimpleNamespace(users=FakeCollection(documents, latency=args.latency, name="users"))
+        with patch("services.auth_service.db", users), patch.object(password_hasher, "_run", runner):
+            latencies, lags = asyncio.run(run_load(users=args.users, total_requests=args.requests, concurrency=args.concurrency))
+        print(f"{label:<10}{len(latencies):>8}"
+              f"{percentile(latencies, 0.50) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}"
+              f"{percentile(latencies, 0.99) * 1000:>9.1f}{max(lags, default=0) * 1000:>18.1f}")
+    print(f"pool: {password_hasher.stats()}, scrypt cost n={password_hasher.n}")
+
+
+if __name__ == "__main__":
+    main()
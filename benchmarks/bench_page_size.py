@@ -0,0 +1,79 @@
+"""
+Cost of scanning every payout through GET /payout at different page sizes.
+
+Walks the whole result set page by page, the way the admin UI fills a screen, against an
+emulated MongoDB and reports the requests, MongoDB round trips and wall time it took.
+Requests are authenticated with a real admin token, so each one pays its auth check.
+
+Usage:
+    python -m benchmarks.bench_page_size [--documents 1000] [--latency 0.002] [--page-sizes 3 10 25 50 100] [--mode page]
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from main import app
+from dependencies import get_db
+from services.token_service import TokenService
+from benchmarks.fake_mongo import FakeCollection
+from benchmarks.seed import seed_payouts
+
+
+async def scan(collection, page_size, mode):
+    """
+    Reads every payout with the given page size, by page number or by keyset cursor.
+
+    Returns:
+    - tuple: The number of requests, documents read and seconds spent.
+    """
+    transport = httpx.ASGITransport(app=app)
+    headers = {"authorization": TokenService.create_jwt("bench@example.com", "admin")}
+    requests = documents = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        app.dependency_overrides[get_db] = lambda: SimpleNamespace(payouts=collection)
+        started = time.perf_counter()
+        page, cursor = 1, ""
+        while True:
+            params = {"page_size": page_size}
+            params.update({"page": page} if mode == "page" else {"cursor": cursor})
+            response = await client.get("/payout", params=params)
+            response.raise_for_status()
+            body = response.json()
+            requests += 1
+            documents += len(body["results"])
+
+            if mode == "page":
+                if page >= body["totalPages"]:
+                    break
+                page += 1
+            else:
+                cursor = body["nextCursor"]
+                if cursor is None:
+                    break
+        return requests, documents, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.002, help="Seconds per MongoDB round trip")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[3, 10, 25, 50, 100])
+    parser.add_argument("--mode", choices=["page", "cursor"], default="page")
+    args = parser.parse_args()
+
+    documents = seed_payouts(args.documents)
+
+    print(f"{'page size':<11}{'requests':>10}{'round trips':>13}{'documents':>11}{'seconds':>10}{'ms/doc':>9}")
+    for page_size in args.page_sizes:
+        collection = FakeCollection(documents, latency=args.latency)
+        requests, read, elapsed = asyncio.run(scan(collection, page_size, args.mode))
+        print(f"{page_size:<11}{requests:>10}{collection.round_trips:>13}{read:>11}{elapsed:>10.2f}"
+              f"{elapsed / max(read, 1) * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
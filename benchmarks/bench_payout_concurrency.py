@@ -0,0 +1,70 @@
+"""
+Concurrency benchmark for GET /payout.
+
+Drives the ASGI app in-process with many parallel requests against an emulated MongoDB
+whose round trips either block the event loop (the former synchronous `MongoClient`)
+or yield to it (the asynchronous driver), and reports the resulting throughput.
+
+Usage:
+    python -m benchmarks.bench_payout_concurrency [--requests 200] [--concurrency 50] [--latency 0.005]
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+
+from main import app
+from dependencies import check_user_is_admin, get_db
+from benchmarks.fake_mongo import FakeCollection
+from benchmarks.seed import seed_payouts
+from services.cache_service import TTLCache
+from services.response_cache_service import ResponseCacheService
+
+
+async def run_load(collection, total_requests, concurrency):
+    """
+    Sends `total_requests` requests to /payout with at most `concurrency` in flight.
+
+    Returns:
+    - float: Requests per second.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_request(index):
+            async with semaphore:
+                response = await client.get("/payout", params={"page": index % 10 + 1})
+                response.raise_for_status()
+
+        app.dependency_overrides[get_db] = lambda: SimpleNamespace(payouts=collection)
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request(i) for i in range(total_requests)))
+        return total_requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds per MongoDB round trip")
+    parser.add_argument("--documents", type=int, default=1000)
+    args = parser.parse_args()
+
+    app.dependency_overrides[check_user_is_admin] = lambda: {"email": "bench@example.com", "user_type": "admin"}
+    documents = seed_payouts(args.documents)
+
+    print(f"{'driver':<10}{'requests':>10}{'concurrency':>13}{'req/s':>10}")
+    for label, blocking in (("sync", True), ("async", False)):
+        collection = FakeCollection(documents, latency=args.latency, blocking=blocking)
+        # Every request must reach the driver, so the rendered page cache is off
+        with patch.object(ResponseCacheService, "cache", TTLCache(maxsize=0)):
+            throughput = asyncio.run(run_load(collection, args.requests, args.concurrency))
+        print(f"{label:<10}{args.requests:>10}{args.concurrency:>13}{throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
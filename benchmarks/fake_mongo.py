@@ -0,0 +1,210 @@
+"""
+A small in-process stand-in for the asynchronous pymongo collections used by the services.
+
+It implements just enough of the collection and cursor API for the benchmarks to drive
+the real application code without a MongoDB server, and can emulate a network round trip
+either cooperatively (async driver) or by blocking the event loop (sync driver in an async handler).
+"""
+import asyncio
+import copy
+import time
+
+
+def _compare(value, operator, expected):
+    """
+    Evaluates a single query operator against a document value.
+    """
+    if operator == '$in':
+        return value in expected
+    if value is None:
+        return False
+    if operator == '$gte':
+        return value >= expected
+    if operator == '$lte':
+        return value <= expected
+    if operator == '$gt':
+        return value > expected
+    if operator == '$lt':
+        return value < expected
+    if operator == '$ne':
+        return value != expected
+    raise NotImplementedError(f"Operator {operator} is not supported by the fake collection")
+
+
+def matches(document, query):
+    """
+    Checks whether a document satisfies a (subset of the) MongoDB query language.
+    """
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(document, sub_query) for sub_query in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches(document, sub_query) for sub_query in condition):
+                return False
+            continue
+
+        value = document.get(key)
+        if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            if not all(_compare(value, op, expected) for op, expected in condition.items()):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    """
+    Lazily evaluated cursor supporting skip, limit, sort and async iteration.
+    """
+
+    def __init__(self, collection, query, projection=None):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._skip = 0
+        self._limit = 0
+        self._sort = None
+        self._batch_size = 0
+        self._results = None
+
+    def skip(self, skip):
+        self._skip = skip
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def batch_size(self, batch_size):
+        self._batch_size = batch_size
+        return self
+
+    async def _evaluate(self):
+        await self.collection._round_trip()
+        documents = [doc for doc in self.collection.documents if matches(doc, self.query)]
+        for key, direction in reversed(self._sort or []):
+            documents.sort(key=lambda doc: doc.get(key), reverse=direction == -1)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [self.collection._project(doc, self.projection) for doc in documents]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._results is None:
+            self._results = iter(await self._evaluate())
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        documents = await self._evaluate()
+        return documents[:length] if length else documents
+
+
+class FakeCollection:
+    """
+    In-memory collection emulating the awaitable pymongo collection API.
+
+    Args:
+    - documents (list): The documents held by the collection.
+    - latency (float): Seconds each round trip to the "server" takes.
+    - blocking (bool): When True the latency blocks the event loop like a synchronous driver would.
+    - name (str): The collection name.
+    """
+
+    def __init__(self, documents=None, latency=0.0, blocking=False, name="payout_affiliate"):
+        self.name = name
+        self.documents = list(documents or [])
+        self.latency = latency
+        self.blocking = blocking
+        self.round_trips = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        if not self.latency:
+            return
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+
+    @staticmethod
+    def _project(document, projection):
+        if not projection:
+            return copy.copy(document)
+        included = {key for key, flag in projection.items() if flag}
+        if included:
+            projected = {key: document[key] for key in included if key in document}
+            if projection.get('_id', 1) and '_id' in document:
+                projected['_id'] = document['_id']
+            return projected
+        return {key: value for key, value in document.items() if projection.get(key, 1)}
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(self, query or {}, projection)
+
+    async def find_one(self, query=None, projection=None):
+        await self._round_trip()
+        for document in self.documents:
+            if matches(document, query):
+                return self._project(document, projection)
+        return None
+
+    async def count_documents(self, query):
+        await self._round_trip()
+        return sum(1 for doc in self.documents if matches(doc, query))
+
+    async def estimated_document_count(self):
+        await self._round_trip()
+        return len(self.documents)
+
+    async def insert_one(self, document):
+        await self._round_trip()
+        self.documents.append(document)
+
+    async def insert_many(self, documents, ordered=True):
+        await self._round_trip()
+        self.documents.extend(documents)
+
+    async def update_one(self, query, update):
+        await self._round_trip()
+        for document in self.documents:
+            if matches(document, query):
+                document.update(update.get('$set', {}))
+                return
+
+
+class FakeDatabase:
+    """
+    In-memory database handing out `FakeCollection`s by name, created on first access.
+
+    Assigned to `MongoDatabase.db`, it serves every module going through the shared connection.
+
+    Args:
+    - latency (float): Seconds each round trip of its collections takes.
+    - blocking (bool): When True the latency blocks the event loop.
+    """
+
+    def __init__(self, latency=0.0, blocking=False):
+        self.latency = latency
+        self.blocking = blocking
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(latency=self.latency, blocking=self.blocking, name=name)
+        return self.collections[name]
+
+    @property
+    def round_trips(self):
+        return sum(collection.round_trips for collection in self.collections.values())
@@ -0,0 +1,80 @@
+"""
+Latency statistics and JSON result files shared by the benchmarks.
+"""
+import json
+import os
+import subprocess
+from datetime import datetime, timezone
+
+
+def percentile(samples, fraction):
+    """
+    Returns the nearest-rank percentile of a list of samples.
+    """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Summarizes the latencies (seconds) of one scenario run over `elapsed` seconds.
+
+    Returns:
+    - dict: Request counts, throughput and p50/p95/p99 latencies in milliseconds.
+    """
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50Ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p95Ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+        "p99Ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+    }
+
+
+def git_commit():
+    """
+    Returns the commit the working tree is at, or None outside of a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, config, path=None):
+    """
+    Writes a run to a JSON file, by default `benchmarks/results/<UTC time>-<commit>.json`.
+
+    Returns:
+    - str: The path written.
+    """
+    commit = git_commit()
+    now = datetime.now(timezone.utc)
+    if path is None:
+        path = os.path.join("benchmarks", "results", f"{now:%Y%m%dT%H%M%SZ}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({"commit": commit, "timestamp": now.isoformat(), "config": config, "results": results},
+                  file, indent=2)
+    return path
+
+
+def compare_results(baseline_path, results):
+    """
+    Prints the throughput and p99 change of every scenario against a previous run.
+    """
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    previous = {(row["endpoint"], row["shape"]): row for row in baseline["results"]}
+
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('timestamp')})")
+    print(f"{'endpoint':<14}{'shape':<16}{'req/s change':>14}{'p99 change':>12}")
+    for row in results:
+        before = previous.get((row["endpoint"], row["shape"]))
+        if before is None or not before["throughput"] or not before["p99Ms"] or row["p99Ms"] is None:
+            continue
+        throughput = (row["throughput"] / before["throughput"] - 1) * 100
+        p99 = (row["p99Ms"] / before["p99Ms"] - 1) * 100
+        print(f"{row['endpoint']:<14}{row['shape']:<16}{throughput:>+13.1f}%{p99:>+11.1f}%")
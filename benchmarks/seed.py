@@ -0,0 +1,69 @@
+"""
+Synthetic data for the benchmarks: users, wallets with transactions and payouts.
+
+Every generator is deterministic for a given volume, so runs on different commits
+measure the same data set.
+"""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from services.password_service import password_hasher
+from services.wallet_service import WalletService
+
+START = datetime(2024, 1, 1)
+PASSWORD = "password" # Password of every seeded user
+
+
+def seed_users(count):
+    """
+    Builds user documents, the first one being the admin the benchmarks log in with.
+
+    scrypt is salted per call, but one hash shared by everyone keeps seeding fast.
+    """
+    hashed = password_hasher._hash(PASSWORD)
+    return [
+        {
+            "_id": ObjectId(f"{index:024x}"),
+            "email": f"user{index}@example.com",
+            "password": hashed,
+            "user_type": "admin" if index == 0 else ("affiliate", "publisher")[index % 2],
+        }
+        for index in range(count)
+    ]
+
+
+def seed_wallets(users, transactions):
+    """
+    Builds one wallet per user holding `transactions` transactions, half of them already matured.
+    """
+    # Created before any transaction matured, so that sweeps have them all to settle
+    created = START - timedelta(days=1)
+    return [
+        {
+            "_id": ObjectId(),
+            **WalletService.new_wallet(user["_id"], [
+                {"amount": 5.0 + index, "date_available": START + timedelta(days=index * 30)}
+                for index in range(transactions)
+            ], now=created),
+        }
+        for user in users
+    ]
+
+
+def seed_payouts(count, users=50):
+    """
+    Builds synthetic payout documents spread over `users` users.
+    """
+    return [
+        {
+            "_id": index,
+            "user_id": index % users,
+            "amount": 10.5 + index,
+            "status": ("pending", "paid", "failed")[index % 3],
+            "user_type": ("affiliate", "publisher")[index % 2],
+            "created": START + timedelta(hours=index),
+            "payment_date": START + timedelta(days=1, hours=index),
+        }
+        for index in range(count)
+    ]
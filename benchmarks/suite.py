@@ -0,0 +1,192 @@
+"""
+Reproducible performance benchmark suite for /payout, /login and /signup.
+
+Seeds configurable volumes of users, wallets with transactions and payouts into either an
+in-process stand-in (default) or a local MongoDB (`--mongo-uri`), then drives the ASGI app
+in-process over httpx. Every scenario (an endpoint and a filter shape) is warmed up, run with
+a fixed concurrency, and reported as throughput plus p50/p95/p99 latency. The run is saved as
+JSON, tagged with the current commit, and can be compared with a previous run.
+
+Usage:
+    python -m benchmarks.suite [--users 200] [--wallet-transactions 10] [--payouts 5000]
+                               [--requests 200] [--concurrency 20] [--latency 0.001]
+                               [--mongo-uri mongodb://localhost:27017] [--scenarios payout login]
+                               [--output results.json] [--compare previous.json]
+"""
+import argparse
+import asyncio
+import time
+from itertools import count
+from unittest.mock import patch
+
+import httpx
+
+from main import app
+from database.connection import db
+from services.token_service import TokenService
+from services.cache_service import TTLCache
+from services.response_cache_service import ResponseCacheService
+from benchmarks.fake_mongo import FakeDatabase
+from benchmarks.reporting import summarize, save_results, compare_results
+from benchmarks.seed import PASSWORD, seed_users, seed_wallets, seed_payouts
+
+# Filter shapes of GET /payout, as query parameters added to each request
+PAYOUT_SHAPES = {
+    "unfiltered": {},
+    "statuses": {"statuses": "paid,failed"},
+    "created_range": {"start_date": "2024-02-01T00:00:00", "end_date": "2024-04-01T00:00:00"},
+    "payment_range": {"payment_start_date": "2024-02-01T00:00:00", "payment_end_date": "2024-04-01T00:00:00"},
+    "user_type": {"user_type": "affiliate"},
+    "combined": {"statuses": "paid", "user_type": "publisher", "start_date": "2024-02-01T00:00:00"},
+    "cursor": {"cursor": ""},
+    "page_size_100": {"page_size": 100},
+}
+
+
+def build_scenarios(args):
+    """
+    Lists the scenarios to run as (endpoint, shape, request factory) tuples.
+
+    A request factory takes the request index and returns the method, URL and httpx keyword arguments.
+    """
+    scenarios = []
+    if "payout" in args.scenarios:
+        for shape, params in PAYOUT_SHAPES.items():
+            def payout_request(index, params=params):
+                paged = {} if "cursor" in params else {"page": index % 10 + 1}
+                return "GET", "/payout", {"params": {**params, **paged}}
+            scenarios.append(("GET /payout", shape, payout_request))
+
+    if "login" in args.scenarios:
+        def login_request(index):
+            user = f"user{index % args.users}@example.com"
+            return "POST", "/login", {"json": {"email": user, "password": PASSWORD}}
+        scenarios.append(("POST /login", "existing_user", login_request))
+
+    if "signup" in args.scenarios:
+        signups = count()
+        def signup_request(index):
+            email = f"signup{next(signups)}-{time.time_ns()}@example.com"
+            return "POST", "/signup", {"json": {"email": email, "password": PASSWORD, "user_type": "affiliate"}}
+        scenarios.append(("POST /signup", "new_user", signup_request))
+    return scenarios
+
+
+async def seed(args):
+    """
+    Points the shared connection at the stand-in or the MongoDB under test and fills it.
+    """
+    if args.mongo_uri:
+        from pymongo import AsyncMongoClient
+        db.client = AsyncMongoClient(args.mongo_uri)
+        db.db = db.client[args.mongo_database]
+    else:
+        db.db = FakeDatabase(latency=args.latency)
+
+    users = seed_users(args.users)
+    collections = {
+        "users": users,
+        "user_wallet": seed_wallets(users, args.wallet_transactions),
+        "payout_affiliate": seed_payouts(args.payouts, users=args.users),
+    }
+    for name, documents in collections.items():
+        if args.mongo_uri:
+            await db.db[name].drop()
+            await db.db[name].insert_many(documents)
+        else:
+            db.db[name].documents = documents
+
+    if args.mongo_uri:
+        await db.ensure_indexes()
+
+
+async def run_scenario(client, request_factory, total_requests, concurrency, warmup):
+    """
+    Sends `warmup` unmeasured requests, then `total_requests` with at most `concurrency` in flight.
+
+    Returns:
+    - dict: The scenario summary, see `benchmarks.reporting.summarize`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one_request(index, measured=True):
+        nonlocal errors
+        method, url, kwargs = request_factory(index)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - started
+        if not measured:
+            return
+        if response.status_code >= 400:
+            errors += 1
+        else:
+            latencies.append(elapsed)
+
+    for index in range(warmup):
+        await one_request(index, measured=False)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(index) for index in range(total_requests)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run_suite(args):
+    """
+    Seeds the data set and runs every scenario against it.
+
+    Returns:
+    - list: One summary per scenario, tagged with its endpoint and shape.
+    """
+    await seed(args)
+    transport = httpx.ASGITransport(app=app)
+    headers = {"authorization": TokenService.create_jwt("user0@example.com", "admin")}
+    results = []
+    # Repeated pages must measure the query path, so the rendered page cache is off
+    page_cache = patch.object(ResponseCacheService, "cache", TTLCache(maxsize=0))
+    page_cache.start()
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            for endpoint, shape, request_factory in build_scenarios(args):
+                summary = await run_scenario(client, request_factory, args.requests, args.concurrency, args.warmup)
+                results.append({"endpoint": endpoint, "shape": shape, **summary})
+                print(f"{endpoint:<14}{shape:<16}{summary['requests']:>9}{summary['errors']:>8}"
+                      f"{summary['throughput']:>10.1f}{summary['p50Ms'] or 0:>9.1f}"
+                      f"{summary['p95Ms'] or 0:>9.1f}{summary['p99Ms'] or 0:>9.1f}")
+    finally:
+        page_cache.stop()
+        if args.mongo_uri:
+            await db.close()
+        db.db = None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--wallet-transactions", type=int, default=10, help="Transactions per wallet")
+    parser.add_argument("--payouts", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario")
+    parser.add_argument("--latency", type=float, default=0.001, help="Seconds per round trip of the in-process stand-in")
+    parser.add_argument("--mongo-uri", help="Benchmark against this MongoDB instead of the in-process stand-in")
+    parser.add_argument("--mongo-database", default="benchmark", help="Database (dropped and re-seeded) for --mongo-uri")
+    parser.add_argument("--scenarios", nargs="+", choices=["payout", "login", "signup"], default=["payout", "login", "signup"])
+    parser.add_argument("--output", help="JSON file to write, defaults to benchmarks/results/<time>-<commit>.json")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<14}{'shape':<16}{'requests':>9}{'errors':>8}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    results = asyncio.run(run_suite(args))
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    print(f"\nresults written to {save_results(results, config, args.output)}")
+    if args.compare:
+        compare_results(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,145 @@
-from pymongo import MongoClient
+import asyncio
+
+from pymongo import AsyncMongoClient
 from dotenv import load_dotenv
 
 from settings import Settings
+from services.metrics_service import MongoCommandMetrics
+from services.slow_query_service import SlowQueryMonitor
+from .indexes import INDEXES
 
 
 settings = Settings() # Load settings using the Settings class which pulls from environment variables
 
 class MongoDatabase:
     """
-    A class for handling connections to MongoDB
+    A class for handling the process-wide asynchronous connection pool to MongoDB
     """
 
     def __init__(self):
         """
         Initializes a new instance of the MongoDatabase class.
-        This includes loading environment variables, setting 
-        up MongoDB client with settings from the environment,
-        and connecting to the specified database.
+        The client itself is only created by `connect`, which the application
+        lifespan calls once per worker, so importing this module opens no sockets.
         """
         load_dotenv()
-        self.client = MongoClient(
+        self.client = None
+        self.db = None
+        self.slow_queries = None
+
+    async def connect(self):
+        """
+        Creates the shared client with the pool limits from the settings and warms it up.
+
+        The client does not open any socket until the first operation is awaited,
+        so the warm-up pings open `mongo_warm_up_connections` sockets up front and
+        surface configuration errors at startup instead of on the first request.
+        """
+        if self.client is not None:
+            return
+
+        listeners = [MongoCommandMetrics()] if settings.metrics_enabled else []
+        if settings.slow_query_threshold_ms is not None:
+            self.slow_queries = SlowQueryMonitor()
+            listeners.append(self.slow_queries)
+
+        self.client = AsyncMongoClient(
             host=settings.mongo_host,
-            port=27017,
+            port=settings.mongo_port,
             username=settings.mongo_username,
-            password=settings.mongo_password
+            password=settings.mongo_password,
+            minPoolSize=settings.mongo_min_pool_size,
+            maxPoolSize=settings.mongo_max_pool_size,
+            maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+            serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+            event_listeners=listeners,
         )
         self.db = self.client[settings.mongo_database]
+        if self.slow_queries is not None:
+            # Slow commands are explained through the same pool
+            self.slow_queries.client = self.client
+
+        if settings.mongo_warm_up_connections > 0:
+            await asyncio.gather(*(
+                self.client.admin.command('ping')
+                for _ in range(settings.mongo_warm_up_connections)
+            ))
+
+        if settings.mongo_ensure_indexes:
+            await self.ensure_indexes()
+
+    async def ensure_indexes(self):
+        """
+        Creates every index of the registry in `database.indexes`.
+
+        `create_indexes` is a no-op for indexes that already exist with the same
+        definition, so this is safe to run on every startup and from every worker.
+        """
+        database = self._database()
+        for collection_name, indexes in INDEXES.items():
+            await database[collection_name].create_indexes(indexes)
+
+    async def close(self):
+        """
+        Closes the shared client and every pooled socket.
+        """
+        if self.client is None:
+            return
+        await self.client.close()
+        self.client = None
+        self.db = None
+
+    def _database(self):
+        """
+        Returns the connected database, failing loudly if the lifespan has not run.
+        """
+        if self.db is None:
+            raise RuntimeError("MongoDatabase is not connected, call connect() first")
+        return self.db
         
     @property
     def users(self):
         """
         Provides access to the 'users' collection of the database.
         """
-        return self.db['users']
+        return self._database()['users']
     
     @property
     def wallet(self):
         """
         Provides access to the 'user_wallet' collection of the database.
         """        
-        return self.db['user_wallet']
+        return self._database()['user_wallet']
     
     @property
     def payouts(self):
         """
         Provides access to the 'payout_affiliate' collection of the database.
         """
-        return self.db['payout_affiliate']
+        return self._database()['payout_affiliate']
+
+
+    @property
+    def payout_rollups(self):
+        """
+        Provides access to the 'payout_daily_rollup' collection of the database.
+        """
+        return self._database()['payout_daily_rollup']
+
+    @property
+    def rollup_state(self):
+        """
+        Provides access to the 'rollup_state' collection, holding the watermarks of the rollup jobs.
+        """
+        return self._database()['rollup_state']
+
+    @property
+    def worker_leases(self):
+        """
+        Provides access to the 'worker_leases' collection, holding the leases of the background jobs.
+        """
+        return self._database()['worker_leases']
+
+
+# The single connection pool shared by every module of the worker process
+db = MongoDatabase()
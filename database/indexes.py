@@ -0,0 +1,32 @@
+from pymongo import ASCENDING, IndexModel
+
+
+# Indexes every collection needs, applied idempotently by `MongoDatabase.ensure_indexes` at startup.
+# Keep this in sync with the queries of the services: every filter shape produced by
+# `PayoutService.filter_payouts` must be able to use one of them (see `QueryPlanService`).
+INDEXES = {
+    "users": [
+        # Every login, signup and admin check looks users up by email
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "user_wallet": [
+        # Every balance lookup
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        # Wallets with matured transactions, found by the settlement worker
+        IndexModel([("transactions.date_available", ASCENDING)], name="transactions_date_available"),
+    ],
+    "payout_affiliate": [
+        # Date ranges on `created`, and the sort key of cursor pagination
+        IndexModel([("created", ASCENDING), ("_id", ASCENDING)], name="created_id"),
+        IndexModel([("payment_date", ASCENDING)], name="payment_date"),
+        IndexModel([("status", ASCENDING), ("created", ASCENDING)], name="status_created"),
+        IndexModel([("user_type", ASCENDING), ("created", ASCENDING)], name="user_type_created"),
+        # Payouts written since the watermark of the rollup job
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "payout_daily_rollup": [
+        # One row per day and group, replaced by the rollup job, and read by day range
+        IndexModel([("day", ASCENDING), ("status", ASCENDING), ("user_type", ASCENDING)],
+                   name="day_status_user_type_unique", unique=True),
+    ],
+}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional, Union
 from datetime import datetime
 
 
@@ -24,8 +24,31 @@ class PayoutQueryParams(BaseModel):
     """
     statuses: Optional[str] = None # Filter payouts by statuses.
     page: Optional[int] = None # Page number for pagination
+    page_size: Optional[int] = None # Documents per page, up to the configured maximum.
+    cursor: Optional[str] = None # Keyset pagination cursor, empty to fetch the first page. Exclusive with page.
+    fields: Optional[str] = None # Comma separated snake_case fields to return, all fields when omitted.
+    count_strategy: Optional[Literal["count", "facet", "estimated", "cached", "none"]] = None # How totalDocs is computed.
     start_date: Optional[datetime] = None # Filter payouts starting from this date.
     end_date: Optional[datetime] = None # Filter payouts up to this date.
     user_type: Optional[str] = None # Filter payouts by user type.
     payment_start_date: Optional[datetime] = None # Filter payouts with payments starting from this date.
     payment_end_date: Optional[datetime] = None # Filter payouts with payments up to this date.
+
+class PayoutSummaryParams(BaseModel):
+    """
+    A model for grouping the payouts summed by the summary endpoint.
+    """
+    group_by: str = "status,user_type" # Comma separated fields to group by, among status and user_type. Empty for overall totals.
+    interval: Optional[Literal["day", "week", "month"]] = None # Also group by this period of date_field.
+    date_field: Literal["created", "payment_date"] = "created" # The date the periods are taken from.
+
+class PayoutRecord(BaseModel):
+    """
+    A model to validate the payouts loaded by the bulk ingestion endpoint.
+    """
+    user_id: Union[int, str] # The user the payout belongs to.
+    amount: float # The amount paid out.
+    status: str # The payout status (e.g., pending, paid).
+    user_type: str # The type of the user (e.g., affiliate).
+    created: datetime # When the payout was created.
+    payment_date: Optional[datetime] = None # When the payout was paid, if it was.
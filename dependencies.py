@@ -1,34 +1,56 @@
 from fastapi import Header, HTTPException
 
 from services.token_service import TokenService
-from database.connection import MongoDatabase
+from services.auth_service import AuthService
+from services.revocation_service import token_revocations
+from database.connection import db
 
-# Initialize database connection
-db = MongoDatabase()
+
+def get_db():
+    """
+    Dependency providing the process-wide MongoDatabase opened by the application lifespan.
+
+    Returns:
+    - MongoDatabase: The shared database connection.
+    """
+    return db
 
 async def check_user_is_admin(authorization: str = Header(...)):
     """
     Middleware function to check if a user is an admin based on the provided JWT token.
 
+    Tokens carrying signed role claims are authorized without any I/O, checking only the
+    in-memory token revocation list. Tokens issued without them fall back to a user lookup.
+
     Args:
     - authorization (str): JWT token passed in the request header.
 
     Returns:
-    - json: User document from the database if the user is an admin.
+    - json: The user's email and type from the token claims, or the user document from the database if the user is an admin.
 
     Raises:
-    - HTTPException: If the token is invalid, user not found, or user is not an admin.
+    - HTTPException: If the token is invalid or revoked, user not found, or user is not an admin.
     """
 
     try:
-        # Extract email from token using TokenService
-        email = TokenService.get_email_from_token(authorization)
+        # Extract the payload and email from token using TokenService
+        payload = TokenService.decode_token(authorization)
+        email = payload["sub"]
     except Exception as e:
         # Handle any exception that might arise from decoding the token
         raise HTTPException(detail=str(e), status_code=401)
+
+    claims = TokenService.get_role_claims(payload)
+    if claims is not None:
+        user_type, token_version = claims
+        if not token_revocations.is_current(email, token_version):
+            raise HTTPException(detail='Token revoked', status_code=401)
+        if user_type != 'admin':
+            raise HTTPException(detail='User is not Admin', status_code=403)  # 403 for Forbidden
+        return {'email': email, 'user_type': user_type}
     
-    # Retrieve user information from database
-    user = db.users.find_one({'email': email})
+    # Retrieve user information through the user cache, falling back to the database
+    user = await AuthService.get_user_by_email(email)
     if user is None:
         raise HTTPException(detail='User not found', status_code=404)
 
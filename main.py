@@ -1,12 +1,58 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 # Import routers from different modules
 from routers.users import router as user_router
 from routers.receipt import router as receipt_router
+from routers.wallet import router as wallet_router
+from routers.metrics import router as metrics_router
+from database.connection import db
+from responses import BSONJSONResponse
+from middleware import MetricsMiddleware, RequestContextMiddleware
+from services.settlement_service import settlement_worker
+from services.rollup_service import rollup_worker
+from services.revocation_service import token_revocations
+from services.password_service import password_hasher
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the shared MongoDB connection pool and starts the background workers on startup,
+    then stops them and closes the pool on shutdown.
+    """
+    await db.connect()
+    password_hasher.start()
+    await token_revocations.refresh()
+    token_revocations.start()
+    if settings.settlement_worker_enabled:
+        settlement_worker.start()
+    if settings.rollup_worker_enabled:
+        rollup_worker.start()
+    yield
+    await settlement_worker.stop()
+    await rollup_worker.stop()
+    await token_revocations.stop()
+    password_hasher.shutdown()
+    await db.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan, default_response_class=BSONJSONResponse)
 
 # Include routers in the application
 app.include_router(user_router)
-app.include_router(receipt_router)
\ No newline at end of file
+app.include_router(receipt_router)
+app.include_router(wallet_router)
+
+# Lets the slow query log name the route that sent a command
+app.add_middleware(RequestContextMiddleware)
+
+if settings.metrics_enabled:
+    # Request timings per route, scraped from /metrics
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
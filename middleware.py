@@ -0,0 +1,60 @@
+from services.metrics_service import MetricsService
+from services.slow_query_service import current_request
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency, in-flight count and status of every HTTP request.
+
+    Requests are labelled with the template of the route that handled them (e.g. `/payout`),
+    read from the scope once routing is done, never with the raw path, so the number of series
+    stays bounded. The in-flight gauge is incremented before routing and is labelled by method
+    only. It is a plain ASGI middleware rather than a `BaseHTTPMiddleware`, so responses,
+    streaming ones included, pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500 # Reported if the application fails before sending a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = MetricsService.request_started(method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope, unmatched requests share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            MetricsService.request_finished(method, route, status, started)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware making the scope of the request being handled available to code without
+    access to the request, such as the MongoDB command listeners, through `current_request`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_request.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
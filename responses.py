@@ -0,0 +1,67 @@
+import base64
+import datetime
+import decimal
+
+import orjson
+from bson import DBRef, Decimal128, ObjectId, Regex, Timestamp
+from bson.binary import Binary
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from fastapi.responses import JSONResponse
+
+
+def encode_bson(value):
+    """
+    Converts the BSON types orjson cannot serialize natively to JSON values.
+
+    datetime, UUID, dataclasses and subclasses of int/str/dict/list (e.g. `Int64`,
+    `SON`) are handled by orjson itself and never reach this function.
+
+    Args:
+    - value: The value orjson could not serialize.
+
+    Returns:
+    - A JSON-serializable value. Containers may hold further BSON values, they are encoded recursively.
+
+    Raises:
+    - TypeError: If the type is not supported, as orjson expects.
+    """
+
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (Decimal128, decimal.Decimal)):
+        # A string keeps every digit, a float would not
+        return str(value)
+    if isinstance(value, (Binary, bytes)):
+        return base64.b64encode(value).decode()
+    if isinstance(value, Timestamp):
+        return {"t": value.time, "i": value.inc}
+    if isinstance(value, Regex):
+        return value.pattern
+    if isinstance(value, DBRef):
+        return value.as_doc()
+    if isinstance(value, (MinKey, MaxKey, datetime.timedelta)):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def render_json(content):
+    """
+    Serializes content, raw MongoDB documents included, to JSON bytes.
+    """
+
+    return orjson.dumps(content, default=encode_bson, option=orjson.OPT_NON_STR_KEYS)
+
+
+class BSONJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson, with native support for the BSON types of raw MongoDB documents.
+
+    Used as the application's default response class. Routes returning large documents should
+    return an instance directly, FastAPI then skips its `jsonable_encoder` pass over the content.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return render_json(content)
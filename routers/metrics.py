@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter(tags=["Monitoring"])
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Exposes the process metrics in the Prometheus text format.
+
+    Returns:
+    - Response: Request latency histograms, in-flight gauges and status counters per route,
+      MongoDB command timings and errors per collection, and the default process metrics.
+    """
+
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
 
 from services.payout_service import PayoutService
+from services.rollup_service import RollupService
 from services.pagination_service import PaginationService
-from dependencies import check_user_is_admin
+from services.export_service import ExportService
+from services.ingest_service import IngestService
+from services.response_cache_service import ResponseCacheService
+from dependencies import check_user_is_admin, get_db
 from database.connection import MongoDatabase
-from database.models import PayoutQueryParams
-
-# Initialize database connection
-db = MongoDatabase()
+from database.models import PayoutQueryParams, PayoutSummaryParams
+from responses import render_json
 
 # Configure router with relevant tags for organized documentation
 router = APIRouter(tags=["Receipts"])
@@ -15,23 +20,137 @@ router = APIRouter(tags=["Receipts"])
 @router.get("/payout")
 async def fetch_payouts(
     query_params: PayoutQueryParams = Depends(),
-    admin: str = Depends(check_user_is_admin)
+    admin: str = Depends(check_user_is_admin),
+    db: MongoDatabase = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Fetches paginated payouts based on provided query parameters.
 
+    Rendered pages are cached for a few seconds and carry a strong ETag, so polling clients
+    sending it back in `If-None-Match` get a bodiless 304 while the page is unchanged.
+    Unpaginated results (neither `page` nor `cursor`) can be arbitrarily large and are never cached.
+
     Parameters:
     - query_params: Filter and pagination criteria for payouts.
     - admin: Admin status validated by dependency to ensure user has admin privileges.
+    - db: The shared database connection.
+    - if_none_match: ETag of the copy the client already has, if any.
 
     Returns:
-    - json: Paginated list of payouts that match the query criteria.
+    - Response: Paginated list of payouts that match the query criteria, or 304 Not Modified.
     """
 
     # Generate MongoDB filter parameters from the query parameters
     match = PayoutService.filter_payouts(query_params)
+    projection = PayoutService.build_projection(query_params.fields)
     page = query_params.page  # Extract the page number directly from the query parameters
 
-    # Retrieve paginated results based on the generated filters
-    paginated_result = await PaginationService.create_paginate_response(page, db.payouts, match)
-    return paginated_result
\ No newline at end of file
+    async def render():
+        # Retrieve paginated results based on the generated filters, serialized without FastAPI's jsonable_encoder copy
+        paginated_result = await PaginationService.create_paginate_response(
+            page, db.payouts, match, cursor=query_params.cursor, count_strategy=query_params.count_strategy,
+            projection=projection, page_size=query_params.page_size
+        )
+        return render_json(paginated_result)
+
+    key = ResponseCacheService.cache_key(
+        db.payouts.name, match, page=page, cursor=query_params.cursor, page_size=query_params.page_size,
+        count_strategy=query_params.count_strategy, fields=query_params.fields
+    )
+    paginated = page is not None or query_params.cursor is not None
+    body, etag = await ResponseCacheService.get_or_render(key, render, store=paginated)
+    return ResponseCacheService.conditional_response(body, etag, if_none_match)
+
+@router.get("/payout/summary")
+async def summarize_payouts(
+    query_params: PayoutQueryParams = Depends(),
+    summary_params: PayoutSummaryParams = Depends(),
+    admin: str = Depends(check_user_is_admin),
+    db: MongoDatabase = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Counts and sums the payouts matching the query parameters, grouped on the server.
+
+    Pagination parameters are ignored, every matching payout is included. Whole days up to the
+    rollup watermark are read from the daily rollups, the rest is aggregated from the payouts.
+
+    Parameters:
+    - query_params: Filter criteria for payouts, as for `/payout`.
+    - summary_params: Grouping by status and/or user type, and optionally by day, week or month.
+    - admin: Admin status validated by dependency to ensure user has admin privileges.
+    - db: The shared database connection.
+    - if_none_match: ETag of the copy the client already has, if any.
+
+    Returns:
+    - Response: The overall and per-group counts and amount sums, or 304 Not Modified.
+    """
+
+    match = PayoutService.filter_payouts(query_params)
+
+    async def render():
+        return render_json(await RollupService.summarize(db, match, summary_params))
+
+    key = ResponseCacheService.cache_key(db.payouts.name, match, summary=summary_params.dict())
+    body, etag = await ResponseCacheService.get_or_render(key, render)
+    return ResponseCacheService.conditional_response(body, etag, if_none_match)
+
+@router.get("/payout/export")
+async def export_payouts(
+    query_params: PayoutQueryParams = Depends(),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    batch_size: Optional[int] = Query(None, ge=1, le=ExportService.MAX_BATCH_SIZE),
+    admin: str = Depends(check_user_is_admin),
+    db: MongoDatabase = Depends(get_db)
+):
+    """
+    Streams every payout matching the query parameters, ignoring pagination.
+
+    Parameters:
+    - query_params: Filter criteria for payouts.
+    - format: Output format, newline-delimited JSON or CSV.
+    - batch_size: Documents fetched from MongoDB per round trip, defaults to the configured export batch size, up to its maximum.
+    - admin: Admin status validated by dependency to ensure user has admin privileges.
+    - db: The shared database connection.
+
+    Returns:
+    - StreamingResponse: The matching payouts, serialized row by row as the cursor is read.
+    """
+
+    match = PayoutService.filter_payouts(query_params)
+    projection = PayoutService.build_projection(query_params.fields)
+    documents = ExportService.stream_documents(db.payouts, match, batch_size, projection)
+
+    if format == "csv":
+        body = ExportService.to_csv(documents)
+    else:
+        body = ExportService.to_ndjson(documents)
+
+    return StreamingResponse(
+        body,
+        media_type=ExportService.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="payouts.{format}"'},
+    )
+
+@router.post("/payout/bulk")
+async def ingest_payouts(
+    request: Request,
+    chunk_size: Optional[int] = Query(None, ge=1, le=IngestService.MAX_CHUNK_SIZE),
+    admin: str = Depends(check_user_is_admin),
+    db: MongoDatabase = Depends(get_db)
+):
+    """
+    Loads payouts sent as NDJSON, one JSON object per line, parsing the body as it is received.
+
+    Parameters:
+    - request: The request, whose body is read as a stream.
+    - chunk_size: Payouts written per insert, defaults to the configured ingestion chunk size, up to its maximum.
+    - admin: Admin status validated by dependency to ensure user has admin privileges.
+    - db: The shared database connection.
+
+    Returns:
+    - json: The number of lines read and payouts inserted, throughput, and the errors of every chunk.
+    """
+
+    return await IngestService.ingest(db.payouts, request.stream(), chunk_size)
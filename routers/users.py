@@ -19,10 +19,11 @@ async def login(request: LoginRequest):
     """
 
     # check credentials
-    user = AuthService.verify_user(request.email, request.password)
+    user = await AuthService.verify_user(request.email, request.password)
     if not user: 
         return {"message": "Authentication failed"}, 401
-    token = TokenService.create_jwt(user['email']) # If user was found, creates jwt and
+    # If user was found, creates jwt carrying its role claims
+    token = TokenService.create_jwt(user['email'], user.get('user_type'), user.get('token_version', 0))
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/signup")
@@ -38,6 +39,6 @@ async def signup(request: SignupRequest):
     """
 
     # creates user, then creates jwt token and returns it
-    AuthService.create_user(request.dict())
-    token = TokenService.create_jwt(request.email)
+    await AuthService.create_user(request.dict())
+    token = TokenService.create_jwt(request.email, request.user_type)
     return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+from services.settlement_service import settlement_worker
+from dependencies import check_user_is_admin
+
+# Configure router with relevant tags for organized documentation
+router = APIRouter(tags=["Wallet"])
+
+@router.get("/wallet/settlement")
+async def settlement_status(admin: str = Depends(check_user_is_admin)):
+    """
+    Reports the progress and lag of the background wallet settlement worker.
+
+    Parameters:
+    - admin: Admin status validated by dependency to ensure user has admin privileges.
+
+    Returns:
+    - json: The worker state, backlog and settlement counters.
+    """
+
+    return settlement_worker.status()
@@ -1,42 +1,153 @@
 from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-from database.connection import MongoDatabase
+from .cache_service import TTLCache, SingleFlight
+from .password_service import password_hasher
+from .revocation_service import token_revocations
+from database.connection import db
+from settings import Settings
 
-
-# Create a single instance of MongoDatabase to be used across the AuthService
-db = MongoDatabase()
+# Initialize settings
+settings = Settings()
 
 class AuthService:
     """
     A service class for managing authentication and user verification actions.
     """
+
+    # Read-through cache of user documents by email, used on the critical path of protected requests
+    user_cache = TTLCache(settings.user_cache_size, settings.user_cache_ttl_seconds)
+    user_lookups = SingleFlight()
+    user_cache_generation = 0 # Bumped by every invalidation, so lookups racing with one are not cached
+
+    @staticmethod
+    async def get_user_by_email(email):
+        """
+        Returns a user document by email through the user cache.
+
+        Concurrent misses for the same email share a single database query.
+
+        Args:
+        - email (str): The email of the user.
+
+        Returns:
+        - json: A copy of the user document, or None if the user does not exist.
+        """
+
+        user = AuthService.user_cache.get(email)
+        if user is None:
+            user = await AuthService.user_lookups.do(email, lambda: AuthService._load_user(email))
+        return None if user is None else dict(user)
+
+    @staticmethod
+    async def _load_user(email):
+        """
+        Loads a user from the database and caches it unless it was invalidated meanwhile.
+        """
+
+        generation = AuthService.user_cache_generation
+        user = await db.users.find_one({"email": email})
+        if user is not None and generation == AuthService.user_cache_generation:
+            AuthService.user_cache.set(email, user)
+        return user
+
+    @staticmethod
+    def invalidate_user(email):
+        """
+        Drops a user from the cache. Must be called by every operation that modifies a user.
+
+        Args:
+        - email (str): The email of the modified user.
+        """
+
+        AuthService.user_cache_generation += 1
+        AuthService.user_cache.pop(email)
+        AuthService.user_lookups.forget(email)
         
     @staticmethod
-    def verify_user(email, password):
+    async def verify_user(email, password):
         """
         Verifies if a user's email and password match the records in the database.
 
+        Passwords are checked off the event loop. Legacy plaintext passwords (and hashes with
+        outdated parameters) are transparently replaced by a new hash on a successful login.
+
         Returns:
         - json: The user's information if credentials are correct.
 
         Raises:
-        - HTTPException: If the credentials are incorrect or the user does not exist.
+        - HTTPException: If the credentials are incorrect or the user does not exist, or 503 if the hashing pool is saturated.
         """
 
-        user = db.users.find_one({"email": email})
-        if not user or user['password'] != password:
+        user = await db.users.find_one({"email": email})
+        if not user:
+            raise HTTPException(status_code=400, detail="Incorrect credentials")
+
+        matched, needs_rehash = await password_hasher.verify(password, user.get('password'))
+        if not matched:
             raise HTTPException(status_code=400, detail="Incorrect credentials")
+
+        if needs_rehash:
+            hashed = await password_hasher.hash(password)
+            # Only replace the value just verified, a concurrent password change wins
+            await db.users.update_one({"_id": user['_id'], "password": user['password']},
+                                      {"$set": {"password": hashed}})
+            AuthService.invalidate_user(email)
+            user = {**user, 'password': hashed}
         return user
 
     @staticmethod
-    def create_user(data):
+    async def create_user(data):
         """
-        Creates a new user record in the database.
+        Creates a new user record in the database, storing a hash of its password.
 
         Raises:
-        - HTTPException: If the user already exists.
+        - HTTPException: If the user already exists, or 503 if the hashing pool is saturated.
         """
                 
-        if db.users.find_one({"email": data['email']}):
+        if await db.users.find_one({"email": data['email']}):
+            raise HTTPException(status_code=400, detail="Email already exists")
+        data = {**data, 'password': await password_hasher.hash(data['password'])}
+        try:
+            await db.users.insert_one(data)
+        except DuplicateKeyError:
+            # A concurrent signup won the race, the unique email index rejected this one
             raise HTTPException(status_code=400, detail="Email already exists")
-        db.users.insert_one(data)
+        finally:
+            AuthService.invalidate_user(data['email'])
+
+    @staticmethod
+    async def revoke_tokens(email, user_type=None):
+        """
+        Revokes every token issued to a user so far, optionally changing the user's type.
+
+        The user's token version is incremented, so tokens carrying an older `ver` claim are
+        rejected immediately by this worker and by the others at their next refresh.
+
+        Args:
+        - email (str): The email of the user to log out.
+        - user_type (str): Optional new user type (e.g., to demote an admin).
+
+        Returns:
+        - int: The new token version.
+
+        Raises:
+        - HTTPException: If the user does not exist.
+        """
+
+        update = {"$inc": {"token_version": 1}}
+        if user_type is not None:
+            update["$set"] = {"user_type": user_type}
+
+        user = await db.users.find_one_and_update(
+            {"email": email}, update,
+            projection={"_id": 0, "token_version": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        AuthService.invalidate_user(email)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        token_revocations.bump(email, user["token_version"])
+        return user["token_version"]
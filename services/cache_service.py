@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from bson import json_util
+
+
+class TTLCache:
+    """
+    A bounded, in-process LRU cache whose entries expire after a time-to-live.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        """
+        Args:
+        - maxsize (int): Maximum number of entries kept, the least recently used one is evicted first.
+        - ttl (float): Default lifetime of an entry in seconds, None for entries that never expire.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (expires_at, value)
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for a key, or `default` if it is missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value, evicting the least recently used entry when the cache is full.
+
+        Args:
+        - key: The hashable cache key.
+        - value: The value to cache.
+        - ttl (float): Lifetime of this entry in seconds, defaults to the cache-wide ttl.
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Removes a key from the cache and returns its value.
+        """
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def pop_matching(self, predicate):
+        """
+        Removes every key for which `predicate(key)` is true.
+
+        Returns:
+        - int: The number of entries removed.
+        """
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        self._entries.clear()
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and current size of the cache.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key into a single execution.
+
+    The first caller for a key runs the coroutine, callers arriving while it is in flight
+    await the same result (or exception) instead of running it again.
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+        self._calls = {} # key -> in-flight task
+
+    async def do(self, key, function):
+        """
+        Runs `function()` for the key unless a call with the same key is already in flight.
+
+        Args:
+        - key: The hashable key identifying identical calls.
+        - function: A callable returning the coroutine to run.
+
+        Returns:
+        - The result of the shared call.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(function())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self.forget(key, task))
+        else:
+            self.coalesced += 1
+
+        # Shielded so that a cancelled caller does not cancel the call shared with the others
+        return await asyncio.shield(task)
+
+    def in_flight(self, key):
+        """
+        Checks whether a call for the key is currently running.
+        """
+        return key in self._calls
+
+    def forget(self, key, task=None):
+        """
+        Stops sharing the in-flight call of a key, later callers start a new one.
+
+        Args:
+        - key: The key to forget.
+        - task: Only forget the key if it still maps to this task.
+        """
+        if task is None or self._calls.get(key) is task:
+            self._calls.pop(key, None)
+
+    def stats(self):
+        """
+        Returns the executed/coalesced counters and the number of calls in flight.
+        """
+        return {"executed": self.executed, "coalesced": self.coalesced, "inFlight": len(self._calls)}
+
+
+def normalize_query(query):
+    """
+    Builds a canonical string for a MongoDB filter, usable as a cache key.
+
+    Dictionary keys are sorted and `$in` lists are ordered so that filters which
+    select the same documents produce the same key.
+
+    Args:
+    - query (json): The MongoDB filter.
+
+    Returns:
+    - str: The canonical representation of the filter.
+    """
+
+    def canonical(value):
+        if isinstance(value, dict):
+            return {key: sorted(inner, key=json_util.dumps) if key == '$in' else canonical(inner)
+                    for key, inner in value.items()}
+        if isinstance(value, list):
+            return [canonical(item) for item in value]
+        return value
+
+    return json_util.dumps(canonical(query), sort_keys=True)
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from .text_service import TextTransformService
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+class ExportService:
+    """
+    Service class to stream large query results without holding them in memory.
+    """
+
+    MAX_BATCH_SIZE = settings.export_max_batch_size # Largest batch size a client may request
+
+    MEDIA_TYPES = {
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv",
+    }
+
+    @staticmethod
+    async def stream_documents(collection, match, batch_size=None, projection=None):
+        """
+        Iterates over every document matching a filter, converting its keys to camelCase as it goes.
+
+        Args:
+        - collection: The MongoDB collection to query.
+        - match (json): The query parameters as a json.
+        - batch_size (int): Documents fetched per round trip, defaults to the configured export batch size.
+        - projection (json): Optional `$project` spec selecting and renaming the fields on the server.
+
+        Yields:
+        - dict: Each matching document with camelCase keys.
+        """
+
+        batch_size = batch_size or settings.export_batch_size
+
+        if projection:
+            # The server already returns camelCase keys, rows are yielded as they arrive
+            cursor = await collection.aggregate([{"$match": match}, {"$project": projection}], batchSize=batch_size)
+            async for doc in cursor:
+                yield doc
+            return
+
+        cursor = collection.find(match).batch_size(batch_size)
+        async for doc in cursor:
+            yield TextTransformService.convert_keys(doc)
+
+    @staticmethod
+    async def to_ndjson(documents):
+        """
+        Serializes documents as newline-delimited JSON, one line per document.
+
+        Args:
+        - documents: Async iterable of documents.
+
+        Yields:
+        - bytes: One encoded JSON line per document.
+        """
+
+        async for doc in documents:
+            yield (json.dumps(doc, default=ExportService.encode_value) + "\n").encode()
+
+    @staticmethod
+    async def to_csv(documents):
+        """
+        Serializes documents as CSV. The header is taken from the keys of the first document,
+        keys missing from later rows are left empty and extra keys are dropped.
+
+        Args:
+        - documents: Async iterable of documents.
+
+        Yields:
+        - bytes: The header line, then one encoded CSV line per document.
+        """
+
+        buffer = io.StringIO()
+        writer = None
+        async for doc in documents:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(doc), restval="", extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow({key: ExportService.encode_value(value) for key, value in doc.items()})
+
+            # Flush the row so that only the current line is ever buffered
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    @staticmethod
+    def encode_value(value):
+        """
+        Converts values JSON and CSV cannot represent natively (ObjectId, datetime, ...) to strings.
+        """
+
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            return value
+        return str(value)
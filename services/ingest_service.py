@@ -0,0 +1,209 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .response_cache_service import ResponseCacheService
+from database.models import PayoutRecord
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+class IngestService:
+    """
+    Service class to load large NDJSON payloads into a collection without holding them in memory.
+    """
+
+    MAX_CHUNK_SIZE = settings.ingest_max_chunk_size # Largest chunk size a client may request
+
+    @staticmethod
+    async def split_lines(chunks, max_line_bytes=None):
+        """
+        Splits a stream of byte chunks into lines as they arrive. Blank lines are skipped.
+
+        A line longer than `max_line_bytes` is not buffered: it is discarded up to its end
+        and yielded as None, so that it can be reported as invalid.
+
+        Args:
+        - chunks: Async iterable of bytes, e.g. `Request.stream()`.
+        - max_line_bytes (int): Longest accepted line, defaults to the configured limit.
+
+        Yields:
+        - tuple: The 1-based line number and the line bytes, or None for an oversized line.
+        """
+
+        max_line_bytes = max_line_bytes or settings.ingest_max_line_bytes
+        buffer = b""
+        number = 0
+        oversized = False
+
+        async for chunk in chunks:
+            buffer += chunk
+            # Lines are sliced at a moving offset, the rest of the buffer is copied once per chunk
+            start = 0
+            while True:
+                end = buffer.find(b"\n", start)
+                if end == -1:
+                    break
+                line = buffer[start:end]
+                start = end + 1
+                number += 1
+                if oversized or len(line) > max_line_bytes:
+                    oversized = False
+                    yield number, None
+                elif line.strip():
+                    yield number, line
+            buffer = buffer[start:]
+            if len(buffer) > max_line_bytes:
+                # Drop the start of the line, only its end is still looked for
+                oversized = True
+                buffer = b""
+
+        if oversized:
+            yield number + 1, None
+        elif buffer.strip():
+            yield number + 1, buffer
+
+    @staticmethod
+    def parse_record(line):
+        """
+        Decodes and validates one NDJSON line as a payout document.
+
+        Args:
+        - line (bytes): The JSON object, None if the line was too long.
+
+        Returns:
+        - dict: The document to insert.
+
+        Raises:
+        - ValueError: If the line is not a valid payout, with a readable message.
+        """
+
+        if line is None:
+            raise ValueError(f"Line longer than {settings.ingest_max_line_bytes} bytes")
+        try:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise ValueError("Expected a JSON object")
+        try:
+            record = PayoutRecord(**data)
+        except ValidationError as e:
+            raise ValueError("; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )) from None
+
+        return record.dict()
+
+    @staticmethod
+    async def write_chunk(collection, report, documents, lines):
+        """
+        Inserts the documents of a chunk unordered, recording the documents MongoDB rejected.
+
+        Documents are stamped with `updated_at` right before the insert, for the rollup worker.
+        It only looks `rollup_settle_seconds` back: a write taking longer may commit after the
+        worker moved past its stamp, so its documents are stamped again once it has committed.
+
+        Args:
+        - collection: The MongoDB collection to write to.
+        - report (dict): The chunk report, updated in place.
+        - documents (list): The valid documents of the chunk.
+        - lines (list): The line number of each document.
+        """
+
+        if not documents:
+            return
+        stamp = datetime.utcnow()
+        for document in documents:
+            document["updated_at"] = stamp
+        try:
+            result = await collection.insert_many(documents, ordered=False)
+            report["inserted"] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            report["inserted"] += e.details.get("nInserted", 0)
+            for error in e.details.get("writeErrors", []):
+                report["errors"].append({"line": lines[error["index"]], "error": error.get("errmsg")})
+        except PyMongoError as e:
+            # Which documents were written is unknown, the chunk is reported as failed
+            report["errors"].append({"line": None, "error": str(e)})
+
+        if datetime.utcnow() - stamp > timedelta(seconds=settings.rollup_settle_seconds):
+            # The driver set the `_id` of every document it sent
+            ids = [document["_id"] for document in documents if "_id" in document]
+            try:
+                await collection.update_many({"_id": {"$in": ids}}, {"$set": {"updated_at": datetime.utcnow()}})
+            except PyMongoError as e:
+                report["errors"].append({"line": None, "error": f"Rollups may miss this chunk: {e}"})
+
+    @staticmethod
+    async def ingest(collection, chunks, chunk_size=None):
+        """
+        Parses, validates and inserts NDJSON payouts as the request body is received.
+
+        Valid records are written in chunks of `chunk_size` with unordered `insert_many`; while
+        a chunk is written the next one is parsed, so at most two chunks are held in memory.
+        Invalid lines are skipped and reported with the chunk they belong to.
+
+        Args:
+        - collection: The payouts collection.
+        - chunks: Async iterable of the request body bytes.
+        - chunk_size (int): Records per `insert_many`, defaults to the configured chunk size.
+
+        Returns:
+        - json: The overall counts and throughput, and the report of every chunk.
+        """
+
+        chunk_size = chunk_size or settings.ingest_chunk_size
+        started = time.perf_counter()
+        reports = []
+        pending = None
+        documents, lines, report = [], [], None
+        total_lines = 0
+
+        async def flush():
+            nonlocal pending, documents, lines, report
+            if pending is not None:
+                await pending
+            pending = asyncio.create_task(IngestService.write_chunk(collection, report, documents, lines))
+            documents, lines, report = [], [], None
+
+        try:
+            async for number, line in IngestService.split_lines(chunks):
+                total_lines += 1
+                if report is None:
+                    report = {"chunk": len(reports), "firstLine": number, "lastLine": number, "inserted": 0, "errors": []}
+                    reports.append(report)
+                report["lastLine"] = number
+                try:
+                    documents.append(IngestService.parse_record(line))
+                    lines.append(number)
+                except ValueError as e:
+                    report["errors"].append({"line": number, "error": str(e)})
+                if total_lines % chunk_size == 0:
+                    await flush()
+            if report is not None:
+                await flush()
+        finally:
+            try:
+                if pending is not None:
+                    await pending
+            finally:
+                # Also when the body stream failed midway, the chunks inserted so far are visible
+                inserted = sum(report["inserted"] for report in reports)
+                if inserted:
+                    ResponseCacheService.invalidate(collection.name)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "lines": total_lines,
+            "inserted": inserted,
+            "failed": sum(len(report["errors"]) for report in reports),
+            "chunks": reports,
+            "elapsedSeconds": round(elapsed, 3),
+            "recordsPerSecond": round(inserted / elapsed, 1) if elapsed else None,
+        }
@@ -0,0 +1,58 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+
+class LeaseService:
+    """
+    Service class for the leases letting one application process at a time run a background job.
+
+    Every process starts the background workers; a worker runs only while it holds the lease
+    of its job, one document of `worker_leases` keyed by the job name.
+    """
+
+    @staticmethod
+    async def acquire(leases, name, owner, seconds):
+        """
+        Takes or renews a lease.
+
+        Args:
+        - leases: The `worker_leases` collection.
+        - name (str): The job the lease is for.
+        - owner (str): Identifies the worker.
+        - seconds (float): How long the lease is held unless renewed.
+
+        Returns:
+        - bool: Whether the lease is held by `owner`, False if another worker holds it.
+        """
+
+        now = datetime.utcnow()
+        try:
+            # Held by someone else, the filter does not match and the upsert collides on `_id`
+            await leases.find_one_and_update(
+                {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"owner": owner}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @staticmethod
+    async def release(leases, name, owner):
+        """
+        Gives a lease up, if `owner` still holds it.
+        """
+
+        await leases.delete_one({"_id": name, "owner": owner})
+
+    @staticmethod
+    def owner_id():
+        """
+        Builds an identifier unique to one worker of one process.
+        """
+
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
@@ -0,0 +1,116 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+
+# Collections whose commands are timed, anything else (admin pings, ...) is ignored
+MONITORED_COLLECTIONS = ("users", "user_wallet", "payout_affiliate", "payout_daily_rollup")
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests, by route template.",
+    ["method", "route"],
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled, by method.",
+    ["method"],
+)
+HTTP_RESPONSES = Counter(
+    "http_responses_total", "HTTP responses sent, by route template and status code.",
+    ["method", "route", "status"],
+)
+
+MONGO_COMMAND_DURATION = Histogram(
+    "mongodb_command_duration_seconds", "Server round trip time of MongoDB commands, by collection and command.",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+MONGO_COMMAND_ERRORS = Counter(
+    "mongodb_command_errors_total", "Failed MongoDB commands, by collection and command.",
+    ["collection", "command"],
+)
+PAGINATION_QUERIES = Counter(
+    "pagination_queries_total", "Page queries, executed against MongoDB or coalesced into an identical one in flight.",
+    ["outcome"],
+)
+
+
+class MetricsService:
+    """
+    Records the HTTP and MongoDB metrics exposed on `/metrics`.
+
+    Labelled children are resolved once per label set and kept, so recording a sample
+    costs a dictionary lookup and a lock-protected increment.
+    """
+
+    _children = {}
+
+    @staticmethod
+    def _child(metric, *labels):
+        key = (metric, labels)
+        child = MetricsService._children.get(key)
+        if child is None:
+            child = MetricsService._children[key] = metric.labels(*labels)
+        return child
+
+    @staticmethod
+    def request_started(method):
+        """
+        Counts a request as in flight and returns the time it started.
+        """
+        MetricsService._child(HTTP_REQUESTS_IN_FLIGHT, method).inc()
+        return time.perf_counter()
+
+    @staticmethod
+    def request_finished(method, route, status, started):
+        """
+        Records the latency and status of a request started by `request_started`.
+        """
+        MetricsService._child(HTTP_REQUESTS_IN_FLIGHT, method).dec()
+        MetricsService._child(HTTP_REQUEST_DURATION, method, route).observe(time.perf_counter() - started)
+        MetricsService._child(HTTP_RESPONSES, method, route, str(status)).inc()
+
+    @staticmethod
+    def command_finished(collection, command, duration, failed=False):
+        """
+        Records the round trip time of a MongoDB command, and counts it when it failed.
+        """
+        MetricsService._child(MONGO_COMMAND_DURATION, collection, command).observe(duration)
+        if failed:
+            MetricsService._child(MONGO_COMMAND_ERRORS, collection, command).inc()
+
+
+def command_collection(event):
+    """
+    Returns the monitored collection a command started event targets, None for any other.
+    """
+    # getMore names its collection in a field of its own, every other command in its first value
+    name = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+    return name if name in MONITORED_COLLECTIONS else None
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    pymongo command listener timing the commands sent to the monitored collections.
+
+    Durations are those measured by the driver itself, the listener only remembers which
+    collection each in-flight command targets between its started and finished events.
+    """
+
+    def __init__(self):
+        self._pending = {} # (request id, connection) -> collection
+
+    def started(self, event):
+        collection = command_collection(event)
+        if collection is not None:
+            self._pending[(event.request_id, event.connection_id)] = collection
+
+    def _finished(self, event, failed):
+        collection = self._pending.pop((event.request_id, event.connection_id), None)
+        if collection is not None:
+            MetricsService.command_finished(collection, event.command_name, event.duration_micros / 1e6, failed)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
@@ -1,48 +1,139 @@
+import base64
+import binascii
 from datetime import datetime
 
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+
 from .wallet_service import WalletService
 from .text_service import TextTransformService
-from database.connection import MongoDatabase
+from .cache_service import TTLCache, SingleFlight, normalize_query
+from .metrics_service import PAGINATION_QUERIES
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
 
-# Initialize a database connection
-db = MongoDatabase()
 
 class PaginationService:
     """
     Service class to handle pagination of database queries.
     """
         
-    DEFAULT_PAGE_SIZE = 3 # Standard size for pagination results
+    DEFAULT_PAGE_SIZE = settings.pagination_default_page_size # Page size when the client does not choose
+    MAX_PAGE_SIZE = settings.pagination_max_page_size # Largest page size a client may request
+    CURSOR_SORT = [("created", 1), ("_id", 1)] # Sort key encoded in keyset pagination cursors
+
+    # Totals cached by the "cached" count strategy, keyed by collection and normalized filter
+    count_cache = TTLCache(settings.pagination_count_cache_size, settings.pagination_count_cache_ttl_seconds)
+
+    # Identical page queries in flight, keyed by collection, normalized filter and options
+    page_queries = SingleFlight()
+    coalesce_queries = settings.pagination_coalesce_queries
 
     @staticmethod
-    async def create_paginate_response(page, collection, match, add_wallet=False):
+    async def create_paginate_response(page, collection, match, add_wallet=False, cursor=None, count_strategy=None,
+                                       projection=None, page_size=None):
         """
         Create a paginated response based on the database query.
 
+        Concurrent calls for the same collection, normalized filter, page or cursor and options
+        share a single database query and its result, which callers must therefore not modify.
+
         Args:
         - page (int): The current page number requested.
         - collection: The MongoDB collection to query.
         - match (json): The query parameters as a json.
         _ add_wallet (bool): Flag to decide if wallet data should be added to the results.
+        - cursor (str): Opaque keyset cursor from a previous response, or an empty string for the first page.
+        - count_strategy (str): How the total is computed in page mode, defaults to the configured strategy.
+        - projection (json): Optional `$project` spec selecting and renaming fields on the server,
+          see `PayoutService.build_projection`. Results are then returned as projected, without conversion.
+        - page_size (int): Documents per page, defaults to `DEFAULT_PAGE_SIZE`.
 
         Returns:
-        - json: A json containing pagination data and results.
+        - json: A json containing pagination data and results, including the count strategy actually used.
+
+        Raises:
+        - HTTPException: If both a page and a cursor are given, the cursor is malformed or the page size is out of range.
+        """
+
+        page_size = PaginationService.resolve_page_size(page_size)
+        if cursor is not None and page is not None:
+            raise HTTPException(detail="Use either page or cursor, not both", status_code=400)
+
+        async def query():
+            return await PaginationService.build_page(
+                page, collection, match, add_wallet, cursor, count_strategy, projection, page_size
+            )
+
+        if not PaginationService.coalesce_queries:
+            return await query()
+
+        key = (collection.name, normalize_query(match), normalize_query({
+            "page": page, "cursor": cursor, "countStrategy": count_strategy, "projection": projection,
+            "pageSize": page_size, "addWallet": add_wallet,
+        }))
+        PAGINATION_QUERIES.labels("coalesced" if PaginationService.page_queries.in_flight(key) else "executed").inc()
+        return await PaginationService.page_queries.do(key, query)
+
+    @staticmethod
+    async def build_page(page, collection, match, add_wallet, cursor, count_strategy, projection, page_size):
+        """
+        Queries one page and builds its response, see `create_paginate_response`.
         """
 
-        page, total_docs, result = await PaginationService.paginate_results(
-            page, collection, match, add_wallet
+        if cursor is not None:
+            next_cursor, result = await PaginationService.paginate_by_cursor(
+                cursor, collection, match, add_wallet, projection, page_size
+            )
+            return {
+                "pageSize": page_size,
+                "nextCursor": next_cursor,
+                "results": result,
+            }
+
+        page, total_docs, result, count_strategy = await PaginationService.paginate_results(
+            page, collection, match, add_wallet, count_strategy, projection, page_size
         )
+        if page is None:
+            total_docs = len(result)
         
         return {
             "page": page,
-            "pageSize": PaginationService.DEFAULT_PAGE_SIZE,
-            "totalPages": -(-total_docs // PaginationService.DEFAULT_PAGE_SIZE),
-            "totalDocs": total_docs if page else len(result),
+            "pageSize": page_size,
+            "totalPages": None if total_docs is None else -(-total_docs // page_size),
+            "totalDocs": total_docs,
+            "countStrategy": count_strategy,
             "results": result,
         }
 
     @staticmethod
-    async def paginate_results(page, collection, match, add_wallet=False):
+    def resolve_page_size(page_size):
+        """
+        Applies the default page size and enforces its bounds.
+
+        Args:
+        - page_size (int): The page size requested by the client, or None.
+
+        Returns:
+        - int: The page size to use.
+
+        Raises:
+        - HTTPException: If the page size is below 1 or above `MAX_PAGE_SIZE`.
+        """
+
+        if page_size is None:
+            return PaginationService.DEFAULT_PAGE_SIZE
+        if not 1 <= page_size <= PaginationService.MAX_PAGE_SIZE:
+            raise HTTPException(
+                detail=f"page_size must be between 1 and {PaginationService.MAX_PAGE_SIZE}", status_code=400
+            )
+        return page_size
+
+    @staticmethod
+    async def paginate_results(page, collection, match, add_wallet=False, count_strategy=None, projection=None,
+                               page_size=None):
         """
         Helper method to fetch paginated documents from a database collection.
 
@@ -51,47 +142,302 @@ class PaginationService:
         - collection: The MongoDB collection to query.
         - match (json): The query parameters as a json.
         - add_wallet (bool): Flag to decide if wallet data should be appended to each document.
+        - count_strategy (str): How the total is computed, defaults to the configured strategy.
+        - projection (json): Optional `$project` spec applied on the server instead of the camelCase conversion.
+        - page_size (int): Documents per page, defaults to `DEFAULT_PAGE_SIZE`.
 
         Returns:
-        - tuple: A tuple containing the current page, total number of documents, and list of documents.
+        - tuple: A tuple containing the current page, total number of documents (None when totals
+          are skipped), list of documents and the count strategy used (None when no page is requested).
         """
 
+        if add_wallet and projection:
+            raise ValueError("add_wallet needs the raw documents and cannot be combined with a projection")
+
         total_docs = 0
         result = []
+        strategy = None
+        page_size = page_size or PaginationService.DEFAULT_PAGE_SIZE
 
         if page is not None:
-            # Calculate total documents matching the query for pagination metadata
-            total_docs = collection.count_documents(match)
-
             # Calculate the number of documents to skip based on the current page number and page size
-            skip = (page - 1) * PaginationService.DEFAULT_PAGE_SIZE
+            skip = (page - 1) * page_size
 
             # Define the limit, which is the maximum number of documents to return
-            limit = PaginationService.DEFAULT_PAGE_SIZE
+            limit = page_size
+
+            strategy = count_strategy or settings.pagination_count_strategy
+            if strategy == "facet":
+                # Fetch the page and the total together in a single round trip
+                total_docs, result = await PaginationService.fetch_page_with_facet(
+                    collection, match, skip, limit, projection
+                )
+            else:
+                # Calculate total documents matching the query for pagination metadata
+                total_docs, strategy = await PaginationService.count_total(collection, match, strategy)
 
-            # Fetch the paginated documents from MongoDB, applying skip and limit for pagination
-            cursor = collection.find(match).skip(skip).limit(limit)
+                if projection:
+                    # Select and rename the fields on the server, the documents arrive already camelCased
+                    cursor = await collection.aggregate([
+                        {"$match": match}, {"$skip": skip}, {"$limit": limit}, {"$project": projection},
+                    ])
+                    result = await cursor.to_list(limit)
+                else:
+                    # Fetch the paginated documents from MongoDB, applying skip and limit for pagination
+                    cursor = collection.find(match).skip(skip).limit(limit)
+                    result = [doc async for doc in cursor]
 
-            # Convert each document's keys from snake_case to camelCase asynchronously
-            result = [await TextTransformService.convert_dict_camel_case(doc)
-                      for doc in cursor]
+            if not add_wallet and not projection:
+                # Convert each document's keys from snake_case to camelCase
+                result = TextTransformService.convert_many(result)
+        elif projection:
+            # If no page is specified, retrieve all documents matching the query, projected on the server
+            cursor = await collection.aggregate([{"$match": match}, {"$project": projection}])
+            result = await cursor.to_list(None)
         else:
             # If no page is specified, retrieve all documents matching the query
             cursor = collection.find(match)
-            result = list(cursor)
+            result = await cursor.to_list(None)
 
-        # Iterate over each document to possibly add wallet data and convert key naming format
         if add_wallet:
-            for index, doc in enumerate(result):
-                # Check and append the wallet balance details to the document if add_wallet is True
-                available_balance, pending_balance = await WalletService.check_available_and_pending_balance(doc["_id"])
-                doc.update({
-                    "available_balance": available_balance,
-                    "pending_balance": pending_balance
-                })
+            # Wallet data is looked up by the raw `_id`, so it is added before the keys are converted
+            await PaginationService.add_wallet_data(result)
+
+        return page, total_docs, result, strategy
+
+    @staticmethod
+    async def count_total(collection, match, strategy):
+        """
+        Computes the total number of documents matching a filter with the requested strategy.
+
+        Strategies:
+        - count: exact `count_documents`, scans every matching index entry or document.
+        - estimated: collection metadata count, only exact for an empty filter, so it falls back to `count` otherwise.
+        - cached: exact count kept in a TTL cache keyed by the normalized filter.
+        - none: skips the total altogether.
+
+        Args:
+        - collection: The MongoDB collection to query.
+        - match (json): The query parameters as a json.
+        - strategy (str): The requested count strategy.
+
+        Returns:
+        - tuple: The total (None for the `none` strategy) and the strategy actually used.
+        """
+
+        if strategy == "none":
+            return None, strategy
+
+        if strategy == "estimated":
+            if not match:
+                return await collection.estimated_document_count(), strategy
+            strategy = "count"
+
+        if strategy == "cached":
+            key = (collection.name, normalize_query(match))
+            total_docs = PaginationService.count_cache.get(key)
+            if total_docs is None:
+                total_docs = await collection.count_documents(match)
+                PaginationService.count_cache.set(key, total_docs)
+            return total_docs, strategy
+
+        return await collection.count_documents(match), "count"
+
+    @staticmethod
+    async def fetch_page_with_facet(collection, match, skip, limit, projection=None):
+        """
+        Fetches one page and the total number of matching documents with a single `$facet` aggregation.
+
+        Args:
+        - collection: The MongoDB collection to query.
+        - match (json): The query parameters as a json.
+        - skip (int): Number of documents to skip.
+        - limit (int): Maximum number of documents to return.
+        - projection (json): Optional `$project` spec applied to the documents of the page.
+
+        Returns:
+        - tuple: The total number of matching documents and the list of documents of the page.
+        """
+
+        page_stages = [{"$skip": skip}, {"$limit": limit}]
+        if projection:
+            page_stages.append({"$project": projection})
+
+        pipeline = [
+            {"$match": match},
+            {"$facet": {
+                "results": page_stages,
+                "total": [{"$count": "count"}],
+            }},
+        ]
+        cursor = await collection.aggregate(pipeline)
+        facet = (await cursor.to_list(1))[0]
+        total_docs = facet["total"][0]["count"] if facet["total"] else 0
+        return total_docs, facet["results"]
+
+    @staticmethod
+    async def paginate_by_cursor(cursor, collection, match, add_wallet=False, projection=None, page_size=None):
+        """
+        Fetches the page following a keyset cursor.
+
+        Instead of skipping over every previous document, the last sort key of the
+        previous page is turned into a range predicate, so each page costs the same
+        index walk however deep into the result set it is.
+
+        Args:
+        - cursor (str): Opaque cursor from a previous response, or an empty string for the first page.
+        - collection: The MongoDB collection to query.
+        - match (json): The query parameters as a json.
+        - add_wallet (bool): Flag to decide if wallet data should be appended to each document.
+        - projection (json): Optional `$project` spec applied on the server instead of the camelCase conversion.
+        - page_size (int): Documents per page, defaults to `DEFAULT_PAGE_SIZE`.
+
+        Returns:
+        - tuple: The cursor of the next page (None on the last page) and the list of documents.
+        """
+
+        if add_wallet and projection:
+            raise ValueError("add_wallet needs the raw documents and cannot be combined with a projection")
+
+        limit = page_size or PaginationService.DEFAULT_PAGE_SIZE
+        query = match
+        if cursor:
+            predicate = PaginationService.cursor_predicate(PaginationService.decode_cursor(cursor))
+            query = {"$and": [match, predicate]} if match else predicate
+
+        if projection:
+            return await PaginationService.project_by_cursor(collection, query, limit, projection)
+
+        documents = await collection.find(query).sort(PaginationService.CURSOR_SORT).limit(limit).to_list(limit)
+
+        # A short page means there is nothing left to read
+        next_cursor = PaginationService.encode_cursor(documents[-1]) if len(documents) == limit else None
+
+        if add_wallet:
+            # Wallet data is looked up by the raw `_id`, so it is added before the keys are converted
+            await PaginationService.add_wallet_data(documents)
+            return next_cursor, documents
+
+        result = TextTransformService.convert_many(documents)
+        return next_cursor, result
+
+    @staticmethod
+    async def project_by_cursor(collection, query, limit, projection):
+        """
+        Fetches a keyset page through an aggregation that projects and renames fields on the server.
+
+        The sort key is carried in a temporary `_cursor` field, so the next cursor can be built
+        whether or not the requested fields include it.
+
+        Args:
+        - collection: The MongoDB collection to query.
+        - query (json): The filter, including the keyset range predicate.
+        - limit (int): Maximum number of documents to return.
+        - projection (json): The `$project` spec.
+
+        Returns:
+        - tuple: The cursor of the next page (None on the last page) and the list of documents.
+        """
+
+        sort_fields = [field for field, _ in PaginationService.CURSOR_SORT]
+        cursor = await collection.aggregate([
+            {"$match": query},
+            {"$sort": dict(PaginationService.CURSOR_SORT)},
+            {"$limit": limit},
+            {"$project": {**projection, "_cursor": [f"${field}" for field in sort_fields]}},
+        ])
+        documents = await cursor.to_list(limit)
+        keys = [doc.pop("_cursor") for doc in documents]
+
+        next_cursor = None
+        if len(documents) == limit:
+            next_cursor = PaginationService.encode_cursor(dict(zip(sort_fields, keys[-1])))
+        return next_cursor, documents
+
+    @staticmethod
+    def encode_cursor(document):
+        """
+        Encodes the sort key of a document into an opaque, URL-safe cursor.
+
+        Args:
+        - document (dict): The last document of the current page.
+
+        Returns:
+        - str: The cursor pointing right after the document.
+        """
+
+        key = [document.get(field) for field, _ in PaginationService.CURSOR_SORT]
+        return base64.urlsafe_b64encode(json_util.dumps(key).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Decodes a cursor created by `encode_cursor` back into its sort key values.
+
+        Args:
+        - cursor (str): The opaque cursor.
+
+        Returns:
+        - list: The sort key values, in `CURSOR_SORT` order.
+
+        Raises:
+        - HTTPException: If the cursor cannot be decoded, or does not hold a sort key. Cursors come
+          from clients and their values go into the filter, so anything else (e.g. operators) is refused.
+        """
+
+        try:
+            key = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, ValueError, TypeError):
+            raise HTTPException(detail="Invalid cursor", status_code=400)
+        if not isinstance(key, list) or len(key) != len(PaginationService.CURSOR_SORT):
+            raise HTTPException(detail="Invalid cursor", status_code=400)
+        created, last_id = key
+        # Besides ObjectIds, plain integer and string ids (e.g. imported payouts) are scalars too
+        valid_id = isinstance(last_id, (ObjectId, int, str)) and not isinstance(last_id, bool)
+        if not (created is None or isinstance(created, datetime)) or not valid_id:
+            raise HTTPException(detail="Invalid cursor", status_code=400)
+        return key
+
+    @staticmethod
+    def cursor_predicate(key):
+        """
+        Builds the range predicate selecting documents sorted after the given key.
+
+        Args:
+        - key (list): The sort key values of the last document already returned.
+
+        Returns:
+        - json: A MongoDB filter equivalent to `(created, _id) > key`.
+        """
+
+        (created_field, _), (id_field, _) = PaginationService.CURSOR_SORT
+        created, last_id = key
+        return {"$or": [
+            {created_field: {"$gt": created}},
+            {created_field: created, id_field: {"$gt": last_id}},
+        ]}
+
+    @staticmethod
+    async def add_wallet_data(result):
+        """
+        Appends wallet balances to each document and converts its keys to camelCase, in place.
+
+        Balances for the whole page are fetched with one batched wallet lookup
+        instead of one lookup per document.
+
+        Args:
+        - result (list): The documents of the current page, with their raw snake_case keys.
+        """
 
-                # Convert the document's keys from snake_case to camelCase
-                result[index] = await TextTransformService.convert_dict_camel_case(doc)
+        balances = await WalletService.check_available_and_pending_balances([doc["_id"] for doc in result])
 
-        return page, total_docs, result
+        # Iterate over each document to add wallet data and convert key naming format
+        for index, doc in enumerate(result):
+            available_balance, pending_balance = balances[str(doc["_id"])]
+            doc.update({
+                "available_balance": available_balance,
+                "pending_balance": pending_balance
+            })
 
+            # Convert the document's keys from snake_case to camelCase
+            result[index] = TextTransformService.convert_keys(doc)
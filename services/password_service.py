@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with scrypt on a dedicated, size-bounded thread pool.
+
+    scrypt takes tens of milliseconds of CPU per call, so it never runs on the event loop.
+    hashlib releases the GIL while hashing, letting `workers` hashes run in parallel. At most
+    `queue_size` more calls may wait for a thread; beyond that callers get a 503 instead of
+    piling up latency for every login behind them.
+
+    Hashes are stored as `scrypt$<n>$<r>$<p>$<salt>$<key>`. Anything else is a legacy
+    plaintext password, which still verifies but is reported as needing a rehash.
+    """
+
+    PREFIX = "scrypt"
+    R = 8
+    P = 1
+    SALT_BYTES = 16
+    KEY_BYTES = 32
+
+    def __init__(self, workers=None, queue_size=None, n=None):
+        """
+        Args:
+        - workers (int): Hashing threads, defaults to the configured value.
+        - queue_size (int): Calls allowed to wait for a thread, defaults to the configured value.
+        - n (int): scrypt cost parameter, defaults to the configured value.
+        """
+        self.workers = workers or settings.password_hash_workers
+        self.queue_size = settings.password_hash_queue_size if queue_size is None else queue_size
+        self.n = n or settings.password_scrypt_n
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = None # Created by `start`, or by the first call
+
+    def _scrypt(self, password, salt, n, r, p):
+        # 128 * n * r bytes are needed, leave headroom over OpenSSL's 32 MiB default
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r, dklen=self.KEY_BYTES)
+
+    def _hash(self, password):
+        salt = os.urandom(self.SALT_BYTES)
+        key = self._scrypt(password, salt, self.n, self.R, self.P)
+        encode = lambda raw: base64.b64encode(raw).decode()
+        return f"{self.PREFIX}${self.n}${self.R}${self.P}${encode(salt)}${encode(key)}"
+
+    def _verify(self, password, stored):
+        try:
+            _, n, r, p, salt, key = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            salt, key = base64.b64decode(salt), base64.b64decode(key)
+        except ValueError:
+            return False, False
+        candidate = self._scrypt(password, salt, n, r, p)
+        return hmac.compare_digest(candidate, key), (n, r, p) != (self.n, self.R, self.P)
+
+    async def _run(self, function, *args):
+        """
+        Runs a hashing function on the pool, rejecting the call when the queue is full.
+
+        Raises:
+        - HTTPException: 503 if `workers + queue_size` calls are already in flight.
+        """
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, retry later")
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.start(), function, *args)
+        finally:
+            self.in_flight -= 1
+
+    def is_hashed(self, stored):
+        """
+        Checks whether a stored password is a hash produced by this class.
+        """
+        return isinstance(stored, str) and stored.startswith(self.PREFIX + "$")
+
+    async def hash(self, password):
+        """
+        Hashes a password with a fresh random salt.
+
+        Args:
+        - password (str): The plaintext password.
+
+        Returns:
+        - str: The encoded hash to store.
+        """
+        return await self._run(self._hash, password)
+
+    async def verify(self, password, stored):
+        """
+        Verifies a password against its stored value.
+
+        Args:
+        - password (str): The plaintext password to check.
+        - stored (str): The stored hash, or a legacy plaintext password.
+
+        Returns:
+        - tuple: Whether the password matches, and whether the stored value should be
+          replaced by a new hash (legacy plaintext or outdated scrypt parameters).
+        """
+        if not self.is_hashed(stored):
+            matched = isinstance(stored, str) and hmac.compare_digest(password.encode(), stored.encode())
+            return matched, matched
+        return await self._run(self._verify, password, stored)
+
+    def stats(self):
+        """
+        Returns the pool size and the current and rejected load.
+        """
+        return {"workers": self.workers, "queueSize": self.queue_size,
+                "inFlight": self.in_flight, "rejected": self.rejected}
+
+    def start(self):
+        """
+        Creates the hashing threads, unless they are running already.
+
+        Returns:
+        - ThreadPoolExecutor: The pool hashing calls run on.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def shutdown(self):
+        """
+        Stops the hashing threads once their pending calls are done. A later `start` creates new ones,
+        so the application can go through several lifespans in one process.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# The hasher shared by every request of this worker
+password_hasher = PasswordHasher()
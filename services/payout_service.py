@@ -1,4 +1,7 @@
-from database.models import PayoutQueryParams
+from fastapi import HTTPException
+
+from .text_service import TextTransformService
+from database.models import PayoutQueryParams, PayoutSummaryParams
 
 
 class PayoutService:
@@ -6,6 +9,8 @@ class PayoutService:
     Service class to handle the creation of database query filters for payouts based on provided parameters.
     """
 
+    SUMMARY_GROUP_FIELDS = ("status", "user_type") # Fields the summary may be grouped by
+
     @staticmethod
     def filter_payouts(params: PayoutQueryParams):
         """
@@ -52,4 +57,121 @@ class PayoutService:
         if statuses:
             match['status'] = {'$in': statuses.split(",")}
 
-        return match
\ No newline at end of file
+        return match
+
+    @staticmethod
+    def build_projection(fields):
+        """
+        Turns the comma separated `fields` parameter into a `$project` spec that selects
+        the fields and renames them from snake_case to camelCase on the server.
+
+        Args:
+        - fields (str): Comma separated top-level snake_case field names, e.g. "_id,amount,payment_date".
+
+        Returns:
+        - json: The `$project` spec, or None when no fields are requested.
+
+        Raises:
+        - HTTPException: If a field name is empty, nested or an operator.
+        """
+
+        if fields is None:
+            return None
+
+        names = [name.strip() for name in fields.split(",")]
+        if not all(names) or any(name.startswith("$") or "." in name for name in names):
+            raise HTTPException(detail="Invalid fields", status_code=400)
+
+        # `_id` is always listed so it is only returned when explicitly requested
+        projection = {"_id": 0}
+        for name in names:
+            projection[TextTransformService.to_camel(name)] = f"${name}"
+        return projection
+
+    @staticmethod
+    def summary_group_id(params: PayoutSummaryParams, date_field=None):
+        """
+        Builds the `$group` key of the summary, its fields named as they are returned.
+
+        Args:
+        - params (PayoutSummaryParams): The grouping fields and period.
+        - date_field (str): Field the periods are taken from, defaults to `params.date_field`.
+
+        Raises:
+        - HTTPException: If a grouping field is not one of `SUMMARY_GROUP_FIELDS`.
+        """
+
+        names = [name.strip() for name in params.group_by.split(",") if name.strip()]
+        if any(name not in PayoutService.SUMMARY_GROUP_FIELDS for name in names):
+            raise HTTPException(detail="Invalid group_by", status_code=400)
+
+        group_id = {TextTransformService.to_camel(name): f"${name}" for name in names}
+        if params.interval:
+            group_id["period"] = {"$dateTrunc": {
+                "date": f"${date_field or params.date_field}", "unit": params.interval, "startOfWeek": "monday",
+            }}
+        return group_id
+
+    @staticmethod
+    def build_summary_pipeline(match, params: PayoutSummaryParams):
+        """
+        Builds the aggregation summing the payouts matching a filter, grouped on the server.
+
+        A single `$facet` returns both the per-group and the overall counts and amount sums.
+        Periods are the start of the day, week (starting Monday) or month, in UTC.
+
+        Args:
+        - match (json): The filter produced by `filter_payouts`.
+        - params (PayoutSummaryParams): The grouping fields and period.
+
+        Returns:
+        - list: The aggregation pipeline.
+
+        Raises:
+        - HTTPException: If a grouping field is not one of `SUMMARY_GROUP_FIELDS`.
+        """
+
+        group_id = PayoutService.summary_group_id(params)
+        sums = {"count": {"$sum": 1}, "totalAmount": {"$sum": "$amount"}}
+
+        groups = [{"$group": {"_id": group_id, **sums}}]
+        if group_id:
+            # Periods first, so a grouped time series comes back in chronological order
+            order = sorted(group_id, key=lambda key: key != "period")
+            groups.append({"$sort": {f"_id.{key}": 1 for key in order}})
+        groups.append({"$replaceWith": {"$mergeObjects": ["$_id", {"count": "$count", "totalAmount": "$totalAmount"}]}})
+
+        return [
+            {"$match": match},
+            {"$facet": {
+                "groups": groups,
+                "totals": [
+                    {"$group": {"_id": None, **sums}},
+                    {"$project": {"_id": 0}},
+                ],
+            }},
+        ]
+
+    @staticmethod
+    async def summarize(collection, match, params: PayoutSummaryParams):
+        """
+        Counts and sums the payouts matching a filter with one server-side aggregation.
+
+        Args:
+        - collection: The payouts collection.
+        - match (json): The filter produced by `filter_payouts`.
+        - params (PayoutSummaryParams): The grouping fields and period.
+
+        Returns:
+        - json: The overall `totals` and one entry per group, with its keys, `count` and `totalAmount`.
+        """
+
+        cursor = await collection.aggregate(PayoutService.build_summary_pipeline(match, params))
+        facet = (await cursor.to_list(1))[0]
+        return {
+            "groupBy": list(PayoutService.summary_group_id(params)),
+            "interval": params.interval,
+            "dateField": params.date_field,
+            "totals": facet["totals"][0] if facet["totals"] else {"count": 0, "totalAmount": 0},
+            "groups": facet["groups"],
+        }
@@ -0,0 +1,117 @@
+"""
+Verifies that every filter shape `PayoutService.filter_payouts` can produce is served by an index.
+
+Usage (against the database configured in `.env`):
+    python -m services.query_plan_service
+Exits with status 1 and lists the offending shapes if any of them falls back to a COLLSCAN.
+"""
+import asyncio
+import sys
+from datetime import datetime
+from itertools import combinations
+
+from .payout_service import PayoutService
+from .pagination_service import PaginationService
+from database.models import PayoutQueryParams
+
+
+class QueryPlanService:
+    """
+    Service class to check the winning query plans of the payout filters.
+    """
+
+    # A sample value for every filter parameter of PayoutQueryParams
+    SAMPLE_FILTERS = {
+        "start_date": datetime(2024, 1, 1),
+        "end_date": datetime(2024, 12, 31),
+        "payment_start_date": datetime(2024, 1, 1),
+        "payment_end_date": datetime(2024, 12, 31),
+        "user_type": "affiliate",
+        "statuses": "pending,paid",
+    }
+
+    @staticmethod
+    def filter_shapes():
+        """
+        Builds one MongoDB filter for every non-empty combination of filter parameters.
+
+        Returns:
+        - list: Tuples of the parameter names used and the filter produced by `filter_payouts`.
+        """
+
+        shapes = []
+        names = list(QueryPlanService.SAMPLE_FILTERS)
+        for size in range(1, len(names) + 1):
+            for combination in combinations(names, size):
+                params = PayoutQueryParams(**{name: QueryPlanService.SAMPLE_FILTERS[name] for name in combination})
+                shapes.append((combination, PayoutService.filter_payouts(params)))
+        return shapes
+
+    @staticmethod
+    def plan_stages(plan):
+        """
+        Collects every stage name of a query plan tree.
+
+        Args:
+        - plan (dict): A plan node, e.g. `explain["queryPlanner"]["winningPlan"]`.
+
+        Returns:
+        - set: The stage names found in the tree.
+        """
+
+        stages = set()
+        if not isinstance(plan, dict):
+            return stages
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for key in ("inputStage", "queryPlan", "winningPlan"):
+            stages |= QueryPlanService.plan_stages(plan.get(key))
+        for child in plan.get("inputStages", []):
+            stages |= QueryPlanService.plan_stages(child)
+        return stages
+
+    @staticmethod
+    async def find_collscans(collection):
+        """
+        Explains every filter shape, unsorted and with the cursor pagination sort.
+
+        Args:
+        - collection: The payouts collection.
+
+        Returns:
+        - list: Descriptions of the shapes whose winning plan contains a COLLSCAN.
+        """
+
+        offending = []
+        for names, match in QueryPlanService.filter_shapes():
+            for sort in (None, PaginationService.CURSOR_SORT):
+                cursor = collection.find(match)
+                if sort:
+                    cursor = cursor.sort(sort)
+                explain = await cursor.explain()
+                if "COLLSCAN" in QueryPlanService.plan_stages(explain["queryPlanner"]):
+                    offending.append(f"{'+'.join(names)}{' sorted' if sort else ''}: {match}")
+        return offending
+
+
+async def main():
+    """
+    Connects to the configured database, applies the indexes and reports COLLSCAN plans.
+    """
+    from database.connection import db
+
+    await db.connect()
+    try:
+        await db.ensure_indexes()
+        offending = await QueryPlanService.find_collscans(db.payouts)
+    finally:
+        await db.close()
+
+    for shape in offending:
+        print(f"COLLSCAN {shape}")
+    print(f"{len(offending)} filter shape(s) without a usable index")
+    return 1 if offending else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
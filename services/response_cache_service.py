@@ -0,0 +1,126 @@
+import hashlib
+
+from fastapi.responses import Response
+
+from .cache_service import TTLCache, normalize_query
+from .pagination_service import PaginationService
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+
+class ResponseCacheService:
+    """
+    In-process cache of rendered responses, with strong ETags for conditional GETs.
+
+    Entries are keyed by collection, normalized filter and the request parameters that shape
+    the page (page, cursor, page size, ...), and hold the serialized body and its ETag. Every
+    write to a collection must call `invalidate` with its name.
+    """
+
+    cache = TTLCache(settings.payout_cache_size, settings.payout_cache_ttl_seconds)
+    generations = {} # collection -> invalidation count, so renders racing an invalidation are not cached
+
+    @staticmethod
+    def cache_key(collection_name, match, **params):
+        """
+        Builds the cache key of a response.
+
+        Args:
+        - collection_name (str): The collection queried.
+        - match (json): The MongoDB filter, normalized so equivalent filters share an entry.
+        - params: Every other parameter the response depends on.
+
+        Returns:
+        - tuple: The hashable cache key.
+        """
+
+        return collection_name, normalize_query(match), normalize_query(params)
+
+    @staticmethod
+    def etag(body):
+        """
+        Computes the strong ETag of a serialized body.
+        """
+
+        return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    @staticmethod
+    async def get_or_render(key, render, store=True):
+        """
+        Returns the cached body and ETag of a key, rendering and caching them on a miss.
+
+        Args:
+        - key (tuple): Key built by `cache_key`.
+        - render: A callable returning the coroutine producing the serialized body.
+        - store (bool): Whether the body may be cached. When False it is always rendered, and only given an ETag.
+
+        Returns:
+        - tuple: The body (bytes) and its ETag.
+        """
+
+        if not store:
+            body = await render()
+            return body, ResponseCacheService.etag(body)
+
+        entry = ResponseCacheService.cache.get(key)
+        if entry is not None:
+            return entry
+
+        collection_name = key[0]
+        generation = ResponseCacheService.generations.get(collection_name, 0)
+        body = await render()
+        entry = body, ResponseCacheService.etag(body)
+        if generation == ResponseCacheService.generations.get(collection_name, 0):
+            ResponseCacheService.cache.set(key, entry)
+        return entry
+
+    @staticmethod
+    def invalidate(collection_name):
+        """
+        Drops every cached response and total of a collection. Must be called after every write to it.
+
+        Args:
+        - collection_name (str): The name of the modified collection.
+
+        Returns:
+        - int: The number of cached responses dropped.
+        """
+
+        ResponseCacheService.generations[collection_name] = ResponseCacheService.generations.get(collection_name, 0) + 1
+        PaginationService.count_cache.pop_matching(lambda key: key[0] == collection_name)
+        return ResponseCacheService.cache.pop_matching(lambda key: key[0] == collection_name)
+
+    @staticmethod
+    def etag_matches(if_none_match, etag):
+        """
+        Checks an `If-None-Match` header against an ETag, using the weak comparison RFC 9110 requires.
+        """
+
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+        return etag in candidates
+
+    @staticmethod
+    def conditional_response(body, etag, if_none_match, media_type="application/json"):
+        """
+        Builds the response to a conditional GET: a bodiless 304 when the client's copy is current.
+
+        Args:
+        - body (bytes): The serialized body.
+        - etag (str): Its ETag.
+        - if_none_match (str): The request's `If-None-Match` header, if any.
+
+        Returns:
+        - Response: 304 Not Modified or 200 with the body, both carrying the ETag.
+        """
+
+        # Clients may reuse their copy, but must revalidate it with the ETag first
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if ResponseCacheService.etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=media_type, headers=headers)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+
+from database.connection import db
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+class TokenRevocationList:
+    """
+    In-memory set of per-user minimum token versions.
+
+    Tokens carry the user's `token_version` at issue time. Logging a user out or changing
+    their role increments the stored version, which revokes every token issued before.
+    Only users whose version is above 0 are held in memory, and the set is reloaded
+    periodically so that revocations made by other workers are picked up.
+    """
+
+    def __init__(self, interval=None):
+        """
+        Args:
+        - interval (float): Seconds between two reloads, defaults to the configured interval.
+        """
+        self.interval = interval or settings.token_version_refresh_seconds
+        self.versions = {} # email -> minimum valid token version
+        self.last_refreshed = None
+        self._task = None
+
+    def is_current(self, email, version):
+        """
+        Checks whether a token version is still valid for a user, without any I/O.
+
+        Args:
+        - email (str): The user's email (`sub` claim).
+        - version (int): The token version (`ver` claim).
+
+        Returns:
+        - bool: False if the token was revoked.
+        """
+        return version >= self.versions.get(email, 0)
+
+    def bump(self, email, version):
+        """
+        Records a new minimum token version for a user, revoking older tokens immediately in this worker.
+        """
+        if version > self.versions.get(email, 0):
+            self.versions[email] = version
+
+    async def refresh(self):
+        """
+        Reloads the token versions of every user whose tokens were ever revoked.
+        """
+        cursor = db.users.find({"token_version": {"$gt": 0}}, {"_id": 0, "email": 1, "token_version": 1})
+        versions = {user["email"]: user["token_version"] async for user in cursor}
+
+        # Keep local bumps newer than what was just read
+        for email, version in self.versions.items():
+            if version > versions.get(email, 0):
+                versions[email] = version
+        self.versions = versions
+        self.last_refreshed = asyncio.get_running_loop().time()
+
+    def start(self):
+        """
+        Starts the periodic reload as a background task of the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Cancels the periodic reload and waits for it to finish.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self):
+        """
+        Reloads forever, pausing `interval` seconds between reloads. Failed reloads are logged and retried.
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Token version refresh failed")
+
+
+# The revocation list loaded and refreshed by the application lifespan
+token_revocations = TokenRevocationList()
@@ -0,0 +1,493 @@
+"""
+Daily payout rollups: pre-aggregated counts and amount sums per (day, status, user_type).
+
+The rollup worker keeps `payout_daily_rollup` up to date incrementally, recomputing only the
+days of the payouts written since its watermark. The whole collection can be rebuilt with:
+    python -m services.rollup_service
+"""
+import asyncio
+import decimal
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson import Decimal128, ObjectId
+from pymongo import ReplaceOne
+
+from .lease_service import LeaseService
+from .payout_service import PayoutService
+from .response_cache_service import ResponseCacheService
+from database.connection import db
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+ONE_DAY = timedelta(days=1)
+
+
+def as_utc(moment):
+    """
+    Returns a datetime as naive UTC, like the datetimes read from MongoDB.
+    """
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def day_floor(moment):
+    """
+    Returns the start (UTC midnight) of the day of a datetime.
+    """
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_amounts(left, right):
+    """
+    Adds two amount sums, which MongoDB returns as numbers or Decimal128.
+    """
+    if isinstance(left, Decimal128) or isinstance(right, Decimal128):
+        to_decimal = lambda value: value.to_decimal() if isinstance(value, Decimal128) else decimal.Decimal(str(value))
+        return to_decimal(left) + to_decimal(right)
+    if isinstance(left, decimal.Decimal) != isinstance(right, decimal.Decimal):
+        return decimal.Decimal(str(left)) + decimal.Decimal(str(right))
+    return left + right
+
+
+class RollupService:
+    """
+    Service class building the daily payout rollups and answering summaries from them.
+
+    The rollup job finds the days to recompute from the creation time of the ObjectId `_id` of
+    inserted payouts, and from `updated_at` (UTC), which writers must set when they update a payout.
+    Deleted payouts are only reflected by a rebuild.
+    """
+
+    NAME = "payout_daily_rollup" # Key of the watermark in `rollup_state` and of the lease in `worker_leases`
+
+    @staticmethod
+    def rollup_pipeline(match):
+        """
+        Builds the aggregation computing the rollup rows of the payouts matching a filter.
+        """
+
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateTrunc": {"date": "$created", "unit": "day"}},
+                    "status": "$status",
+                    "user_type": "$user_type",
+                },
+                "count": {"$sum": 1},
+                "total_amount": {"$sum": "$amount"},
+            }},
+        ]
+
+    @staticmethod
+    async def days_written(payouts, since=None, until=None):
+        """
+        Lists the days (of `created`) of the payouts written in a period, or of every payout.
+
+        A payout was written in the period when its ObjectId was generated or its `updated_at`
+        set during it, so payouts inserted by writers unaware of `updated_at` are found too.
+
+        Args:
+        - payouts: The payouts collection.
+        - since (datetime): Exclusive start of the period, None for every payout.
+        - until (datetime): Inclusive end of the period.
+
+        Returns:
+        - list: The sorted day starts.
+        """
+
+        pipeline = [{"$group": {"_id": {"$dateTrunc": {"date": "$created", "unit": "day"}}}}]
+        if since is not None:
+            # ObjectIds hold whole seconds: ids of the second of `since` are matched again, never missed
+            pipeline.insert(0, {"$match": {"$or": [
+                {"_id": {"$gt": ObjectId.from_datetime(since), "$lte": ObjectId.from_datetime(until)}},
+                {"updated_at": {"$gt": since, "$lte": until}},
+            ]}})
+        cursor = await payouts.aggregate(pipeline)
+        return sorted([row["_id"] async for row in cursor if row["_id"] is not None])
+
+    @staticmethod
+    async def rebuild_days(payouts, rollups, days, stamp):
+        """
+        Recomputes the rollup rows of some days from the payouts.
+
+        Rows are replaced in place and stamped, then the rows of those days left over from
+        groups that no longer exist are deleted, so readers never see a day missing.
+
+        Args:
+        - payouts: The payouts collection.
+        - rollups: The rollup collection.
+        - days (list): The day starts to recompute.
+        - stamp (datetime): Marks the rows written by this run.
+
+        Returns:
+        - int: The number of rollup rows written.
+        """
+
+        if not days:
+            return 0
+
+        match = {"$or": [{"created": {"$gte": day, "$lt": day + ONE_DAY}} for day in days]}
+        cursor = await payouts.aggregate(RollupService.rollup_pipeline(match))
+        operations = []
+        async for row in cursor:
+            key = row["_id"]
+            operations.append(ReplaceOne(
+                key, {**key, "count": row["count"], "total_amount": row["total_amount"], "rebuilt_at": stamp},
+                upsert=True,
+            ))
+
+        if operations:
+            await rollups.bulk_write(operations, ordered=False)
+        await rollups.delete_many({"day": {"$in": days}, "rebuilt_at": {"$ne": stamp}})
+        return len(operations)
+
+    @staticmethod
+    async def get_watermark(state):
+        """
+        Returns the watermark of the rollup job, None if the rollups were never built.
+        """
+
+        document = await state.find_one({"_id": RollupService.NAME})
+        return None if document is None else document["watermark"]
+
+    @staticmethod
+    async def set_watermark(state, watermark):
+        await state.update_one(
+            {"_id": RollupService.NAME},
+            {"$set": {"watermark": watermark, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    @staticmethod
+    async def rollup_range(state, match):
+        """
+        Finds the whole days of a `created` range that can be answered from the rollups.
+
+        Days are whole when the range covers them from midnight to midnight, and trusted up
+        to (excluding) the day of the watermark, later days still receiving new payouts.
+
+        Args:
+        - state: The rollup state collection.
+        - match (json): The payout filter.
+
+        Returns:
+        - tuple: The start (None for unbounded) and exclusive end of the days, or None if no day qualifies.
+        """
+
+        if "payment_date" in match or not settings.rollup_worker_enabled:
+            return None
+        watermark = await RollupService.get_watermark(state)
+        if watermark is None:
+            return None
+
+        created = match.get("created", {})
+        start, end = as_utc(created.get("$gte")), as_utc(created.get("$lte"))
+        first = None if start is None else (start if start == day_floor(start) else day_floor(start) + ONE_DAY)
+        # `$lte end` covers the day of end whole only when end is its very last millisecond
+        last = day_floor(watermark) if end is None else min(day_floor(end + timedelta(milliseconds=1)), day_floor(watermark))
+        if first is not None and first >= last:
+            return None
+        return first, last
+
+    @staticmethod
+    async def summarize(database, match, params):
+        """
+        Summarizes the payouts matching a filter, from the rollups wherever possible.
+
+        Whole days are read from the rollups, the partial days at the edges of the range (and
+        the days after the watermark) are aggregated live from the payouts, and both are merged.
+        Falls back to a fully live summary when the filter or the periods need the payouts
+        themselves (`payment_date`), see `PayoutService.summarize`.
+
+        Args:
+        - database (MongoDatabase): The database connection.
+        - match (json): The filter produced by `PayoutService.filter_payouts`.
+        - params (PayoutSummaryParams): The grouping fields and period.
+
+        Returns:
+        - json: The summary, as returned by `PayoutService.summarize`, and the `rollupRange` used.
+        """
+
+        rollup_range = None
+        if not (params.interval and params.date_field != "created"):
+            rollup_range = await RollupService.rollup_range(database.rollup_state, match)
+        if rollup_range is None:
+            return {**await PayoutService.summarize(database.payouts, match, params), "rollupRange": None}
+
+        first, last = rollup_range
+        created = {bound: as_utc(value) for bound, value in match.get("created", {}).items()}
+        others = {key: value for key, value in match.items() if key != "created"}
+
+        # The rollup rows carry the status and user_type filters as is
+        day_range = {"$lt": last} if first is None else {"$gte": first, "$lt": last}
+        parts = [RollupService.rollup_groups(database.payout_rollups, {**others, "day": day_range}, params)]
+
+        if first is not None and created["$gte"] < first:
+            parts.append(RollupService.live_groups(
+                database.payouts, {**others, "created": {"$gte": created["$gte"], "$lt": first}}, params
+            ))
+        if "$lte" not in created or created["$lte"] >= last:
+            tail = {"$gte": last, **({"$lte": created["$lte"]} if "$lte" in created else {})}
+            parts.append(RollupService.live_groups(database.payouts, {**others, "created": tail}, params))
+
+        keys = list(PayoutService.summary_group_id(params))
+        groups = RollupService.merge_groups(keys, await asyncio.gather(*parts))
+        totals = {"count": 0, "totalAmount": 0}
+        for group in groups:
+            totals = {"count": totals["count"] + group["count"],
+                      "totalAmount": add_amounts(totals["totalAmount"], group["totalAmount"])}
+
+        return {
+            "groupBy": keys,
+            "interval": params.interval,
+            "dateField": params.date_field,
+            "totals": totals,
+            "groups": groups,
+            "rollupRange": {"start": first, "end": last},
+        }
+
+    @staticmethod
+    async def rollup_groups(rollups, match, params):
+        """
+        Groups rollup rows like `PayoutService.summarize` groups payouts.
+        """
+
+        cursor = await rollups.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": PayoutService.summary_group_id(params, date_field="day"),
+                "count": {"$sum": "$count"},
+                "totalAmount": {"$sum": "$total_amount"},
+            }},
+            {"$replaceWith": {"$mergeObjects": ["$_id", {"count": "$count", "totalAmount": "$totalAmount"}]}},
+        ])
+        return await cursor.to_list(None)
+
+    @staticmethod
+    async def live_groups(payouts, match, params):
+        """
+        Groups the payouts of a partial range with the live summary aggregation.
+        """
+
+        cursor = await payouts.aggregate(PayoutService.build_summary_pipeline(match, params))
+        return (await cursor.to_list(1))[0]["groups"]
+
+    @staticmethod
+    def merge_groups(keys, parts):
+        """
+        Adds up the groups with the same keys coming from several parts, sorted by period then keys.
+
+        Args:
+        - keys (list): The group key names.
+        - parts (list): Lists of groups.
+
+        Returns:
+        - list: The merged groups.
+        """
+
+        merged = {}
+        for groups in parts:
+            for group in groups:
+                key = tuple(group.get(name) for name in keys)
+                if key in merged:
+                    merged[key]["count"] += group["count"]
+                    merged[key]["totalAmount"] = add_amounts(merged[key]["totalAmount"], group["totalAmount"])
+                else:
+                    merged[key] = dict(group)
+
+        order = sorted(range(len(keys)), key=lambda index: keys[index] != "period")
+        sort_key = lambda key: [(key[index] is not None, key[index]) for index in order]
+        return [merged[key] for key in sorted(merged, key=sort_key)]
+
+
+class RollupWorker:
+    """
+    Background worker keeping the daily payout rollups up to date.
+
+    Each run recomputes the days of the payouts written since the watermark, up to a few
+    seconds ago (`settle`) so that writes still in flight are picked up by the next run.
+    The first run, without any watermark, rebuilds every day.
+
+    Every application process starts a worker; a lease in `worker_leases` lets only one of
+    them run at a time, the others skip their run.
+    """
+
+    def __init__(self, interval=None, settle=None, batch_days=None, lease=None):
+        """
+        Args:
+        - interval (float): Seconds between two runs, defaults to the configured interval.
+        - settle (float): Seconds writes are given to land, defaults to the configured value.
+        - batch_days (int): Days recomputed per aggregation, defaults to the configured value.
+        - lease (float): Seconds the lease is held without renewal, defaults to the configured value.
+        """
+        self.interval = interval or settings.rollup_interval_seconds
+        self.settle = timedelta(seconds=settings.rollup_settle_seconds if settle is None else settle)
+        self.batch_days = batch_days or settings.rollup_batch_days
+        self.lease = lease or settings.rollup_lease_seconds
+        self.owner = LeaseService.owner_id()
+        self._task = None
+
+        # Progress of the worker, exposed through `status`
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_finished = None
+        self.last_days = 0
+        self.watermark = None
+
+    def start(self):
+        """
+        Starts the rollup loop as a background task of the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Cancels the rollup loop and waits for it to finish.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self):
+        """
+        Runs forever, pausing `interval` seconds between runs. Failed runs are logged and retried.
+        """
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.exception("Payout rollup run failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, full=False):
+        """
+        Recomputes the days written since the watermark, then moves the watermark forward.
+        Skipped when another worker holds the lease.
+
+        Args:
+        - full (bool): Rebuild every day, as done when there is no watermark yet.
+
+        Returns:
+        - int: The number of days recomputed, None if the run was skipped.
+        """
+        if not await LeaseService.acquire(db.worker_leases, RollupService.NAME, self.owner, self.lease):
+            self.skipped += 1
+            return None
+        try:
+            watermark = await RollupService.get_watermark(db.rollup_state)
+            if full or watermark is None:
+                return await self.rebuild()
+
+            until = datetime.utcnow() - self.settle
+            days = await RollupService.days_written(db.payouts, since=watermark, until=until)
+            await self.rebuild_in_batches(days, stamp=datetime.utcnow())
+            await self.renew()
+            await RollupService.set_watermark(db.rollup_state, until)
+            return self.finished(days, until)
+        finally:
+            await LeaseService.release(db.worker_leases, RollupService.NAME, self.owner)
+
+    async def rebuild(self):
+        """
+        Recomputes every day from scratch and drops the rows of days without payouts anymore.
+        Must run while holding the lease, see `run_once(full=True)`.
+
+        Returns:
+        - int: The number of days recomputed.
+        """
+        # Payouts written while the rebuild runs may be missed, the next run picks them up
+        until = datetime.utcnow() - self.settle
+        stamp = datetime.utcnow()
+        days = await RollupService.days_written(db.payouts)
+        await self.rebuild_in_batches(days, stamp)
+        await self.renew()
+        await db.payout_rollups.delete_many({"rebuilt_at": {"$ne": stamp}})
+        await RollupService.set_watermark(db.rollup_state, until)
+        return self.finished(days, until)
+
+    async def rebuild_in_batches(self, days, stamp):
+        for index in range(0, len(days), self.batch_days):
+            await self.renew()
+            await RollupService.rebuild_days(db.payouts, db.payout_rollups, days[index:index + self.batch_days], stamp)
+
+    async def renew(self):
+        """
+        Extends the lease before each write, aborting the run if another worker took it over.
+        """
+        if not await LeaseService.acquire(db.worker_leases, RollupService.NAME, self.owner, self.lease):
+            raise RuntimeError("Rollup lease lost to another worker")
+
+    def finished(self, days, watermark):
+        self.runs += 1
+        self.last_days = len(days)
+        self.watermark = watermark
+        self.last_finished = datetime.utcnow()
+        if days:
+            # Cached summaries may cover the recomputed days
+            ResponseCacheService.invalidate("payout_affiliate")
+        return len(days)
+
+    def status(self):
+        """
+        Returns the progress of the worker.
+
+        Returns:
+        - dict: The worker state and its counters.
+        """
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "intervalSeconds": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "lastError": self.last_error,
+            "lastFinished": self.last_finished,
+            "lastDays": self.last_days,
+            "watermark": self.watermark,
+        }
+
+
+# The worker started by the application lifespan
+rollup_worker = RollupWorker()
+
+
+async def main():
+    """
+    Connects to the configured database, applies the indexes and rebuilds every rollup.
+    """
+    await db.connect()
+    try:
+        await db.ensure_indexes()
+        days = await rollup_worker.run_once(full=True)
+    finally:
+        await db.close()
+
+    if days is None:
+        print("Another worker is updating the payout rollups, retry later")
+        return 1
+    print(f"Rebuilt the payout rollups of {days} day(s), watermark {rollup_worker.watermark}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
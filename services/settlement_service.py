@@ -0,0 +1,233 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from .lease_service import LeaseService
+from .wallet_service import WalletService
+from database.connection import db
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+class SettlementWorker:
+    """
+    Background worker moving matured wallet transactions into the available balance.
+
+    Each sweep finds the wallets of `user_wallet` whose balances are out of date and settles
+    them with the server-side settlement pipeline, in chunked unordered `bulk_write` batches
+    with a bounded number of batches in flight.
+
+    Every application process starts a worker; a lease in `worker_leases` lets only one of
+    them sweep at a time, the others skip their sweep.
+    """
+
+    NAME = "wallet_settlement" # Key of the lease in `worker_leases`
+
+    def __init__(self, interval=None, batch_size=None, concurrency=None, lease=None):
+        """
+        Args:
+        - interval (float): Seconds between two sweeps, defaults to the configured interval.
+        - batch_size (int): Wallets per bulk write, defaults to the configured batch size.
+        - concurrency (int): Bulk writes in flight at once, defaults to the configured concurrency.
+        - lease (float): Seconds the lease is held without renewal, defaults to the configured value.
+        """
+        self.interval = interval or settings.settlement_interval_seconds
+        self.batch_size = batch_size or settings.settlement_batch_size
+        self.concurrency = concurrency or settings.settlement_concurrency
+        self.lease = lease or settings.settlement_lease_seconds
+        self.owner = LeaseService.owner_id()
+        self._task = None
+
+        # Progress of the worker, exposed through `status`
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_started = None
+        self.last_finished = None
+        self.backlog_wallets = 0 # Wallets out of date when the last sweep started
+        self.lag_seconds = 0.0 # How long the oldest matured transaction had been waiting then
+        self.last_settled = 0
+        self.total_settled = 0
+        self.current_settled = 0 # Wallets settled so far by the running sweep
+        self.backfilled = False # Whether the wallets created without balances were settled
+
+    def start(self):
+        """
+        Starts the sweep loop as a background task of the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """
+        Cancels the sweep loop and waits for it to finish.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self):
+        """
+        Sweeps forever, pausing `interval` seconds between sweeps. Failed sweeps are logged and retried.
+        """
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.exception("Wallet settlement sweep failed")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self):
+        """
+        Settles every wallet that is out of date at the start of the sweep.
+        Skipped when another worker holds the lease.
+
+        Returns:
+        - int: The number of wallets modified, None if the sweep was skipped.
+        """
+        if not await LeaseService.acquire(db.worker_leases, self.NAME, self.owner, self.lease):
+            self.skipped += 1
+            return None
+        try:
+            return await self.settle_unsettled()
+        finally:
+            await LeaseService.release(db.worker_leases, self.NAME, self.owner)
+
+    async def settle_unsettled(self):
+        """
+        Runs one sweep while holding the lease, renewing it before each bulk write.
+
+        Returns:
+        - int: The number of wallets modified.
+        """
+        if not self.backfilled:
+            # One unindexed pass per process, later sweeps only select matured transactions
+            backfilled = await self.backfill()
+            if backfilled:
+                logger.info("Settled %d wallet(s) created without balances", backfilled)
+            self.backfilled = True
+
+        now = datetime.utcnow()
+        unsettled = WalletService.unsettled_filter(now)
+        self.last_started = now
+        self.current_settled = 0
+        await self.measure_backlog(unsettled, now)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+
+        async def settle(chunk):
+            try:
+                # The filter is repeated so wallets settled meanwhile by someone else are skipped
+                result = await db.wallet.bulk_write(
+                    [UpdateOne({"_id": wallet_id, **unsettled}, WalletService.SETTLEMENT_PIPELINE)
+                     for wallet_id in chunk],
+                    ordered=False,
+                )
+                self.current_settled += result.modified_count
+            finally:
+                semaphore.release()
+
+        chunk = []
+        lost = False
+        cursor = db.wallet.find(unsettled, {"_id": 1}).batch_size(self.batch_size)
+        async for wallet in cursor:
+            chunk.append(wallet["_id"])
+            if len(chunk) == self.batch_size:
+                if not await LeaseService.acquire(db.worker_leases, self.NAME, self.owner, self.lease):
+                    lost = True
+                    break
+                # Wait for a free slot before reading further, bounding both writes and memory
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(settle(chunk)))
+                chunk = []
+        if chunk and not lost:
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(settle(chunk)))
+
+        # Writes already sent are harmless to finish, the filter skips wallets settled by the new holder
+        await asyncio.gather(*tasks)
+        if lost:
+            raise RuntimeError("Settlement lease lost to another worker")
+
+        self.runs += 1
+        self.last_settled = self.current_settled
+        self.total_settled += self.current_settled
+        self.last_finished = datetime.utcnow()
+        return self.last_settled
+
+    async def backfill(self):
+        """
+        Settles the wallets created without `pending_balance`, which sweeps do not select.
+
+        Returns:
+        - int: The number of wallets settled.
+        """
+        result = await db.wallet.update_many({"pending_balance": {"$exists": False}}, WalletService.SETTLEMENT_PIPELINE)
+        return result.modified_count
+
+    async def measure_backlog(self, unsettled, now):
+        """
+        Counts the out-of-date wallets and how long their oldest matured transaction has been waiting.
+
+        Args:
+        - unsettled (json): The filter selecting out-of-date wallets.
+        - now (datetime): The start of the sweep.
+        """
+        cursor = await db.wallet.aggregate([
+            {"$match": unsettled},
+            {"$group": {
+                "_id": None,
+                "wallets": {"$sum": 1},
+                "oldest": {"$min": {"$min": "$transactions.date_available"}},
+            }},
+        ])
+        backlog = await cursor.to_list(1)
+        if not backlog:
+            self.backlog_wallets, self.lag_seconds = 0, 0.0
+            return
+        oldest = backlog[0]["oldest"]
+        self.backlog_wallets = backlog[0]["wallets"]
+        self.lag_seconds = max((now - oldest).total_seconds(), 0.0) if oldest else 0.0
+
+    def status(self):
+        """
+        Returns the progress and lag of the worker.
+
+        Returns:
+        - dict: The worker state and its counters.
+        """
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "intervalSeconds": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "lastError": self.last_error,
+            "lastStarted": self.last_started,
+            "lastFinished": self.last_finished,
+            "backlogWallets": self.backlog_wallets,
+            "lagSeconds": self.lag_seconds,
+            "currentSettled": self.current_settled,
+            "lastSettled": self.last_settled,
+            "totalSettled": self.total_settled,
+        }
+
+
+# The worker started by the application lifespan
+settlement_worker = SettlementWorker()
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+from .metrics_service import command_collection
+from settings import Settings
+
+# Initialize settings
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+# ASGI scope of the request being handled, set by `RequestContextMiddleware`
+current_request = ContextVar("current_request", default=None)
+
+# Driver and session fields, neither part of the command shape nor accepted inside `explain`
+_TRANSPORT_FIELDS = {"lsid", "txnNumber", "$db", "$clusterTime", "$readPreference", "readConcern",
+                     "writeConcern", "autocommit", "startTransaction", "apiVersion", "apiStrict"}
+# Fields whose values describe the shape of a command rather than user data, kept unredacted
+_STRUCTURAL_FIELDS = {"sort", "projection", "$sort", "$project", "hint"}
+# Commands that can be explained without side effects
+_EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+
+
+def current_route():
+    """
+    Returns the method and route template of the request being handled, or None outside of a request.
+    """
+    scope = current_request.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+
+class SlowQueryMonitor(monitoring.CommandListener):
+    """
+    pymongo command listener logging the commands slower than a threshold.
+
+    Slow commands are logged with their shape, values redacted, the duration measured by the
+    driver and the route of the request that sent them. A sample of them can additionally be
+    explained with `executionStats`. The explain runs as a background task once the command
+    has completed, at most `max_explains` at a time and once per shape every `explain_cooldown`
+    seconds, so it never adds latency to the request.
+
+    Args:
+    - threshold_ms (float): Commands taking at least this long are logged.
+    - sample_rate (float): Fraction of the slow commands logged, between 0 and 1.
+    - explain (bool): Whether to explain the logged commands.
+    """
+
+    def __init__(self, threshold_ms=None, sample_rate=None, explain=None, explain_cooldown=60, max_explains=2):
+        self.threshold = (settings.slow_query_threshold_ms if threshold_ms is None else threshold_ms) / 1000
+        self.sample_rate = settings.slow_query_sample_rate if sample_rate is None else sample_rate
+        self.explain = settings.slow_query_explain if explain is None else explain
+        self.explain_cooldown = explain_cooldown
+        self.max_explains = max_explains
+        self.client = None # Set by MongoDatabase.connect, used to run the explains
+        self._pending = {} # (request id, connection) -> (collection, command, route)
+        self._explained = {} # shape -> time it was last explained
+        self._explains = set()
+
+    @staticmethod
+    def redact(value, structural=False):
+        """
+        Replaces every value of a command with `?`, keeping its keys and operators.
+
+        Args:
+        - value: The command, or a part of it.
+        - structural (bool): Whether the value is a sort, projection or hint, kept as is.
+
+        Returns:
+        - The redacted copy.
+        """
+        if structural:
+            return value
+        if isinstance(value, dict):
+            return {key: SlowQueryMonitor.redact(item, key in _STRUCTURAL_FIELDS) for key, item in value.items()}
+        if isinstance(value, list):
+            # Pipelines keep every stage, value lists collapse into a single placeholder
+            if value and all(isinstance(item, dict) for item in value):
+                return [SlowQueryMonitor.redact(item) for item in value]
+            return ["?"]
+        return "?"
+
+    @staticmethod
+    def command_shape(command_name, command):
+        """
+        Builds the redacted shape of a command, without its driver and session fields.
+        """
+        body = {key: value for key, value in command.items() if key not in _TRANSPORT_FIELDS}
+        shape = SlowQueryMonitor.redact({key: value for key, value in body.items() if key != command_name})
+        return {command_name: body.get(command_name), **shape}
+
+    def started(self, event):
+        collection = command_collection(event)
+        if collection is not None:
+            self._pending[(event.request_id, event.connection_id)] = (collection, event.command, current_route())
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        duration = event.duration_micros / 1e6
+        if duration < self.threshold or random.random() >= self.sample_rate:
+            return
+
+        collection, command, route = pending
+        shape = self.command_shape(event.command_name, command)
+        logger.warning(
+            "Slow MongoDB command %s on %s took %.1f ms%s (route: %s): %s",
+            event.command_name, collection, duration * 1000, " and failed" if failed else "", route or "-", shape,
+        )
+        if self.explain and not failed and event.command_name in _EXPLAINABLE:
+            self.schedule_explain(event.database_name, event.command_name, command, repr(shape))
+
+    def schedule_explain(self, database_name, command_name, command, shape_key):
+        """
+        Starts a background explain of a command, unless the shape was explained recently or too many are running.
+        """
+        now = time.monotonic()
+        if self.client is None or len(self._explains) >= self.max_explains:
+            return
+        if now - self._explained.get(shape_key, float("-inf")) < self.explain_cooldown:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._explained[shape_key] = now
+        body = {key: value for key, value in command.items() if key not in _TRANSPORT_FIELDS}
+        task = loop.create_task(self.run_explain(database_name, command_name, body))
+        self._explains.add(task)
+        task.add_done_callback(self._explains.discard)
+
+    async def run_explain(self, database_name, command_name, body):
+        """
+        Explains a command with `executionStats` and logs a summary of its plan.
+        """
+        try:
+            explain = await self.client[database_name].command(
+                {"explain": body, "verbosity": "executionStats"}
+            )
+        except Exception:
+            logger.exception("Explaining a slow %s command failed", command_name)
+            return
+
+        summary = self.summarize_explain(explain)
+        logger.warning(
+            "Explain of slow %s on %s: %s",
+            command_name, body.get(command_name), summary,
+        )
+        return summary
+
+    @staticmethod
+    def summarize_explain(explain):
+        """
+        Extracts the plan stages and examined/returned counts of an `executionStats` explain.
+
+        Args:
+        - explain (dict): The explain output, of a find or of an aggregation.
+
+        Returns:
+        - dict: The stages of the winning plan, documents and keys examined, documents returned,
+          the docs-examined ratio and whether a collection scan was used.
+        """
+        from .query_plan_service import QueryPlanService
+
+        # Aggregations nest the query part in their first stage on older servers
+        if "queryPlanner" not in explain and explain.get("stages"):
+            explain = explain["stages"][0].get("$cursor", {})
+
+        stats = explain.get("executionStats", {})
+        stages = QueryPlanService.plan_stages(explain.get("queryPlanner", {}).get("winningPlan"))
+        returned = stats.get("nReturned", 0)
+        examined = stats.get("totalDocsExamined", 0)
+        return {
+            "stages": sorted(stages),
+            "collscan": "COLLSCAN" in stages,
+            "docsExamined": examined,
+            "keysExamined": stats.get("totalKeysExamined", 0),
+            "returned": returned,
+            "examinedPerReturned": round(examined / returned, 1) if returned else None,
+            "executionTimeMs": stats.get("executionTimeMillis"),
+        }
@@ -1,30 +1,95 @@
+from functools import lru_cache
+
+
 class TextTransformService:
     """
     Service class dedicated to text transformations.
     """
 
+    KEY_CACHE_SIZE = 4096 # Distinct keys whose camelCase translation is memoized
+
     @staticmethod
     async def convert_dict_camel_case(data):
         """
         Convert dictionary(json) keys from snake_case to camelCase.
 
+        Thin async wrapper kept for backward compatibility, new code should call `convert_keys`.
+
         Args:
         - data (dict): The dictionary with keys in snake_case.
 
         Returns:
         - dict: The dictionary with keys converted to camelCase.
         """
-        converted_dict = {}
-        for key, value in data.items():
-            camel_key = await TextTransformService.snake_to_camel(key)
-            converted_dict[camel_key] = value
-        return converted_dict
+        return TextTransformService.convert_keys(data)
 
     @staticmethod
     async def snake_to_camel(snake_str):
         """
         Helper method to convert a snake_case string to camelCase.
 
+        Thin async wrapper kept for backward compatibility, new code should call `to_camel`.
+
+        Args:
+        - snake_str (str): The snake_case string to convert.
+
+        Returns:
+        - str: The converted camelCase string.
+        """
+        return TextTransformService.to_camel(snake_str)
+
+    @staticmethod
+    def convert_keys(data, recursive=False):
+        """
+        Convert dictionary(json) keys from snake_case to camelCase synchronously.
+
+        Args:
+        - data (dict): The dictionary with keys in snake_case.
+        - recursive (bool): Also convert the keys of nested dictionaries, including those inside lists.
+
+        Returns:
+        - dict: The dictionary with keys converted to camelCase.
+        """
+        to_camel = TextTransformService.to_camel
+        if not recursive:
+            return {to_camel(key): value for key, value in data.items()}
+        return {to_camel(key): TextTransformService._convert_nested(value) for key, value in data.items()}
+
+    @staticmethod
+    def convert_many(documents, recursive=False):
+        """
+        Convert the keys of every dictionary of a result list from snake_case to camelCase.
+
+        Args:
+        - documents (list): The dictionaries with keys in snake_case.
+        - recursive (bool): Also convert the keys of nested dictionaries, including those inside lists.
+
+        Returns:
+        - list: New dictionaries with keys converted to camelCase.
+        """
+        convert_keys = TextTransformService.convert_keys
+        return [convert_keys(doc, recursive) for doc in documents]
+
+    @staticmethod
+    def _convert_nested(value):
+        """
+        Recursively converts the keys of dictionaries found in a value.
+        """
+        if isinstance(value, dict):
+            return TextTransformService.convert_keys(value, recursive=True)
+        if isinstance(value, list):
+            return [TextTransformService._convert_nested(item) for item in value]
+        return value
+
+    @staticmethod
+    @lru_cache(maxsize=KEY_CACHE_SIZE)
+    def to_camel(snake_str):
+        """
+        Converts a snake_case string to camelCase, memoizing the translation.
+
+        Documents of a collection share a small set of keys, so after the first
+        document every key is a cache hit.
+
         Args:
         - snake_str (str): The snake_case string to convert.
 
@@ -39,4 +104,4 @@ class TextTransformService:
             return components[1] + ''.join(x.title() for x in components[2:])
         else:
             # Normal conversion for strings not starting with an underscore
-            return components[0] + ''.join(x.title() for x in components[1:])
\ No newline at end of file
+            return components[0] + ''.join(x.title() for x in components[1:])
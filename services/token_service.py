@@ -1,7 +1,10 @@
 from fastapi import Header, HTTPException
 import jwt
+import hashlib
+import time
 from datetime import datetime, timedelta
 
+from .cache_service import TTLCache
 from settings import Settings
 
 # Initialize settings
@@ -11,14 +14,22 @@ class TokenService:
     """
     Service class for handling JWT token operations, including creation and decoding of tokens.
     """
+
+    # Payloads of already verified tokens, keyed by the SHA-256 of the token and expiring with it
+    token_cache = TTLCache(settings.jwt_cache_size)
     
     @staticmethod
-    def create_jwt(email):
+    def create_jwt(email, user_type=None, token_version=0):
         """
         Creates a JWT token with an expiration set from the current time.
 
+        When the user type is given, it is signed into the token together with the user's
+        token version, so authorization can trust the token without a database lookup.
+
         Args:
         - email (str): User's email to encode within the JWT.
+        - user_type (str): User's type (e.g., admin) to encode as the `role` claim.
+        - token_version (int): User's current token version, encoded as the `ver` claim.
 
         Returns:
         - str: Encoded JWT.
@@ -26,6 +37,8 @@ class TokenService:
 
         expiration = datetime.utcnow() + timedelta(minutes=settings.jwt_expiration_minutes)
         payload = {"sub": email, "exp": expiration}
+        if user_type is not None:
+            payload.update({"role": user_type, "ver": token_version})
         return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
     @staticmethod
@@ -33,18 +46,41 @@ class TokenService:
         """
         Decodes a JWT token to extract the payload.
 
+        The signature is only verified the first time a token is seen, its payload is then
+        served from `token_cache` until the token's own `exp` claim.
+
         Args:
         - token (str): The JWT token to be decoded.
 
         Returns:
-        - dict: The decoded token payload or an empty dict if decoding fails.
+        - dict: The decoded token payload.
+
+        Raises:
+        - HTTPException: If the token is invalid or expired.
         """
 
+        key = hashlib.sha256(token.encode()).hexdigest()
+        payload = TokenService.token_cache.get(key)
+        if payload is not None:
+            return dict(payload)
+
         try:
             payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-            return payload
         except:
             raise HTTPException(detail="Invalid token", status_code=401)
+
+        # Tokens without an expiry are never cached, they could otherwise live forever
+        if isinstance(payload.get("exp"), (int, float)):
+            TokenService.token_cache.set(key, payload, ttl=payload["exp"] - time.time())
+        return dict(payload)
+
+    @staticmethod
+    def cache_stats():
+        """
+        Returns the hit/miss counters and size of the verified token cache.
+        """
+
+        return TokenService.token_cache.stats()
         
     @staticmethod
     def get_email_from_token(authorization: str = Header(...)):
@@ -67,5 +103,21 @@ class TokenService:
         except:
             raise HTTPException(detail="Invalid token", status_code=401)
         return email
+
+    @staticmethod
+    def get_role_claims(payload):
+        """
+        Extracts the signed role claims from a decoded token payload.
+
+        Args:
+        - payload (dict): The decoded token payload.
+
+        Returns:
+        - tuple: The user type and token version, or None for tokens issued without role claims.
+        """
+
+        if "role" not in payload or not isinstance(payload.get("ver"), int):
+            return None
+        return payload["role"], payload["ver"]
             
         
\ No newline at end of file
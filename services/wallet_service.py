@@ -1,28 +1,108 @@
 from fastapi import HTTPException
 from datetime import datetime
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 
-from database.connection import MongoDatabase
+from database.connection import db
+from settings import Settings
 
+# Initialize settings
+settings = Settings()
 
-# Initialize a database connection
-db = MongoDatabase()
+# Condition, inside `$filter`/`$reduce` over `transactions`, for a transaction whose funds are available
+_MATURED = {"$lte": ["$$this.date_available", "$$NOW"]}
+_TRANSACTIONS = {"$ifNull": ["$transactions", []]}
 
 class WalletService:
     """
     Service class to manage wallet-related operations.
     """
 
+    # Aggregation-pipeline update settling a wallet on the server: matured transactions are
+    # added to the available balance and removed, the remaining ones make up the pending balance.
+    # Every field is computed from the same input document, so the update is atomic per wallet.
+    SETTLEMENT_PIPELINE = [
+        {"$set": {
+            "available_balance": {"$add": [
+                {"$ifNull": ["$available_balance", 0]},
+                {"$reduce": {
+                    "input": _TRANSACTIONS,
+                    "initialValue": 0,
+                    "in": {"$cond": [_MATURED, {"$add": ["$$value", "$$this.amount"]}, "$$value"]},
+                }},
+            ]},
+            "pending_balance": {"$reduce": {
+                "input": _TRANSACTIONS,
+                "initialValue": 0,
+                "in": {"$cond": [_MATURED, "$$value", {"$add": ["$$value", "$$this.amount"]}]},
+            }},
+            "transactions": {"$filter": {"input": _TRANSACTIONS, "cond": {"$not": [_MATURED]}}},
+        }},
+    ]
+
+    # Only the balances travel back to the application, never the transactions array
+    BALANCE_PROJECTION = {"_id": 0, "user_id": 1, "available_balance": 1, "pending_balance": 1}
+
+    @staticmethod
+    def new_wallet(user_id, transactions=(), now=None):
+        """
+        Builds a wallet document whose balances are settled from the start.
+
+        Wallets must be created with `pending_balance`: sweeps only look for matured transactions,
+        so a wallet without it would keep reporting a pending balance of 0.
+
+        Args:
+        - user_id (ObjectId): The owner of the wallet.
+        - transactions (list): Transactions with an `amount` and a `date_available`.
+        - now (datetime): The moment (UTC) against which transactions are considered matured.
+
+        Returns:
+        - json: The wallet document to insert.
+        """
+
+        now = now or datetime.utcnow()
+        pending = [transaction for transaction in transactions if transaction["date_available"] > now]
+        return {
+            "user_id": user_id,
+            "available_balance": sum(t["amount"] for t in transactions if t["date_available"] <= now),
+            "pending_balance": sum(transaction["amount"] for transaction in pending),
+            "transactions": pending,
+        }
+
+    @staticmethod
+    def unsettled_filter(now, never_settled=False):
+        """
+        Builds the filter selecting wallets whose stored balances are out of date.
+
+        Args:
+        - now (datetime): The moment (UTC) against which transactions are considered matured.
+        - never_settled (bool): Also select wallets without `pending_balance`. That branch has no
+          index, so it is only meant for filters already narrowed down, e.g. by `user_id`.
+
+        Returns:
+        - json: Wallets holding matured transactions, or never settled before.
+        """
+
+        matured = {"transactions.date_available": {"$lte": now}}
+        if not never_settled:
+            return matured
+        return {"$or": [matured, {"pending_balance": {"$exists": False}}]}
+
     @staticmethod
     async def check_available_and_pending_balance(user_id):
         """
-        Checks and returns the available and pending balances for a specified user's wallet.
+        Settles and returns the available and pending balances for a specified user's wallet.
+
+        Settlement runs on the server in a single `find_one_and_update`, so it is atomic
+        under concurrent requests and the transactions array is never sent to the application.
+        When the background settlement worker is enabled the stored balances are read as they
+        are, at most one sweep interval behind.
         
         Args:
         - user_id (str): The MongoDB ObjectId string of the user whose balance is being checked.
 
         Returns:
-        - tuple: A tuple containing the available balances.
+        - tuple: A tuple containing the available and pending balances.
 
         Raises:
         - HTTPException: If the user_id is not a valid ObjectId or if the wallet data is not found.
@@ -32,34 +112,65 @@ class WalletService:
         if not ObjectId.is_valid(user_id):
             raise HTTPException(detail="not valid object id", status_code=400)
         
-        # Retrieve the wallet data from the database
-        wallet = db.wallet.find_one({"user_id": ObjectId(user_id)})
+        if settings.settlement_worker_enabled:
+            # Balances are kept settled by the background worker, so this is a pure lookup
+            wallet = await db.wallet.find_one({"user_id": ObjectId(user_id)}, WalletService.BALANCE_PROJECTION)
+        else:
+            # Settle the wallet and read back its new balances in one round trip
+            wallet = await db.wallet.find_one_and_update(
+                {"user_id": ObjectId(user_id)},
+                WalletService.SETTLEMENT_PIPELINE,
+                projection=WalletService.BALANCE_PROJECTION,
+                return_document=ReturnDocument.AFTER,
+            )
         if not wallet:
             raise HTTPException(detail="Wallet not found.", status_code=404)
-        
-        # Calculate available balances
-        available_balance = wallet.get('available_balance', 0)
-        pending_balance = 0
-        transactions_to_delete = []
-        for transaction in wallet["transactions"]:
-            if transaction["date_available"] <= datetime.now():
-                available_balance += transaction["amount"]
-                transactions_to_delete.append(transaction["id"])
-            else:
-                pending_balance += transaction["amount"]
-
-        # Update the wallet with the new balances
-        wallet.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "available_balance": available_balance,
-                    "pending_balance": pending_balance,
-                },
-                "$pull": {
-                    "transactions": {"id": {"$in": transactions_to_delete}}
-                },
-            },
-        )
-
-        return available_balance, pending_balance
+
+        return wallet.get("available_balance", 0), wallet.get("pending_balance", 0)
+
+    @staticmethod
+    async def check_available_and_pending_balances(user_ids):
+        """
+        Batch version of `check_available_and_pending_balance` for a whole page of users.
+
+        Wallets holding matured transactions (or never settled before) are settled with a single
+        `update_many` running the settlement pipeline, then every balance is read back with one
+        projected `$in` query, so the cost is two round trips however many users are requested.
+        When the background settlement worker is enabled only the read is performed.
+
+        Args:
+        - user_ids (list): The MongoDB ObjectId strings of the users whose balances are being checked.
+
+        Returns:
+        - dict: Maps each user id (as a string) to a tuple of its available and pending balances.
+
+        Raises:
+        - HTTPException: If a user_id is not a valid ObjectId or if a wallet is not found.
+        """
+
+        # Validate every user_id is a proper ObjectId
+        if not all(ObjectId.is_valid(user_id) for user_id in user_ids):
+            raise HTTPException(detail="not valid object id", status_code=400)
+
+        object_ids = list({ObjectId(user_id) for user_id in user_ids})
+        if not object_ids:
+            return {}
+
+        if not settings.settlement_worker_enabled:
+            # Settle only the wallets whose stored balances are out of date
+            await db.wallet.update_many(
+                {"user_id": {"$in": object_ids}, **WalletService.unsettled_filter(datetime.utcnow(), never_settled=True)},
+                WalletService.SETTLEMENT_PIPELINE,
+            )
+
+        # Read every balance back in a single round trip
+        wallets = await db.wallet.find(
+            {"user_id": {"$in": object_ids}}, WalletService.BALANCE_PROJECTION
+        ).to_list(None)
+        if len(wallets) < len(object_ids):
+            raise HTTPException(detail="Wallet not found.", status_code=404)
+
+        return {
+            str(wallet["user_id"]): (wallet.get("available_balance", 0), wallet.get("pending_balance", 0))
+            for wallet in wallets
+        }
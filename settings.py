@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -10,9 +12,50 @@ class Settings(BaseSettings):
     mongo_database: str
     mongo_username: str
     mongo_password: str
+    mongo_port: int = 27017
+    mongo_min_pool_size: int = 0 # Sockets kept open per worker even when idle.
+    mongo_max_pool_size: int = 100 # Upper bound on concurrent sockets per worker.
+    mongo_max_idle_time_ms: Optional[int] = None # Close pooled sockets idle for longer than this.
+    mongo_server_selection_timeout_ms: int = 30000
+    mongo_warm_up_connections: int = 1 # Sockets to open at startup, 0 disables the warm-up.
+    mongo_ensure_indexes: bool = True # Create the indexes of database/indexes.py at startup.
+    pagination_default_page_size: int = 3 # Documents per page when the client does not choose.
+    pagination_max_page_size: int = 100 # Largest page size a client may request.
+    pagination_coalesce_queries: bool = True # Identical concurrent page queries share one database query.
+    pagination_count_strategy: Literal["count", "facet", "estimated", "cached", "none"] = "count"
+    pagination_count_cache_ttl_seconds: float = 30 # Lifetime of cached totals for the "cached" strategy.
+    pagination_count_cache_size: int = 1024
+    payout_cache_ttl_seconds: float = 10 # How long a rendered /payout page is served from memory, 0 disables it.
+    payout_cache_size: int = 256
+    user_cache_ttl_seconds: float = 30 # How long an authenticated user lookup is reused.
+    user_cache_size: int = 1024
+    export_batch_size: int = 500 # Documents fetched per round trip when streaming exports.
+    export_max_batch_size: int = 5000 # Largest export batch size a client may request.
+    ingest_chunk_size: int = 1000 # Payouts written per insert_many by the bulk ingestion endpoint.
+    ingest_max_chunk_size: int = 100000 # Largest ingestion chunk size a client may request.
+    ingest_max_line_bytes: int = 65536 # Longer NDJSON lines are rejected without being buffered.
+    settlement_worker_enabled: bool = True # Settle wallets in the background, making balance reads pure lookups.
+    settlement_interval_seconds: float = 60 # Pause between two settlement sweeps.
+    settlement_batch_size: int = 500 # Wallets settled per bulk write.
+    settlement_concurrency: int = 4 # Bulk writes in flight at once.
+    settlement_lease_seconds: float = 300 # How long a worker holds the settlement lease without renewing it.
+    rollup_worker_enabled: bool = True # Maintain the daily payout rollups read by /payout/summary.
+    rollup_interval_seconds: float = 60 # Pause between two incremental rollup runs.
+    rollup_settle_seconds: float = 5 # Writes younger than this are left to the next run, covering clock skew.
+    rollup_batch_days: int = 100 # Days recomputed per aggregation.
+    rollup_lease_seconds: float = 300 # How long a worker holds the rollup lease without renewing it.
+    metrics_enabled: bool = True # Expose /metrics and time every request and MongoDB command.
+    slow_query_threshold_ms: Optional[float] = 100 # Log MongoDB commands at least this slow, unset to disable.
+    slow_query_sample_rate: float = 1.0 # Fraction of the slow commands logged.
+    slow_query_explain: bool = False # Explain logged commands with executionStats, in the background.
     jwt_secret: str
     jwt_algorithm: str
     jwt_expiration_minutes: int
+    jwt_cache_size: int = 10000 # Verified tokens kept in memory, 0 disables the cache.
+    token_version_refresh_seconds: float = 30 # How often revocations made by other workers are picked up.
+    password_hash_workers: int = 4 # Threads hashing and verifying passwords off the event loop.
+    password_hash_queue_size: int = 64 # Hashes allowed to wait for a thread before requests get a 503.
+    password_scrypt_n: int = 16384 # scrypt cost, raising it rehashes existing passwords on their next login.
 
     class Config:
-        env_file = ".env"
\ No newline at end of file
+        env_file = ".env"
@@ -1,91 +1,254 @@
 import unittest
-from unittest.mock import patch
+import asyncio
+from unittest.mock import patch, AsyncMock
 from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 
 from services.auth_service import AuthService
+from services.password_service import password_hasher
 
-class TestAuthService(unittest.TestCase):
+class TestAuthService(unittest.IsolatedAsyncioTestCase):
     """
     Unit tests for AuthService which handles user authentication and account management.
     """
 
+    def setUp(self):
+        """
+        Start every test with an empty user cache.
+        """
+        AuthService.user_cache.clear()
+
     @patch('services.auth_service.db')
-    def test_verify_user_success(self, mock_db):
+    async def test_verify_user_success(self, mock_db):
         """
         Test successful user verification when correct credentials are provided.
         """
-        # Setup dummy data for a successful lookup
-        mock_db.users.find_one.return_value = {'email': 'test@example.com', 'password': 'password'}
+        # Setup dummy data for a successful lookup of a hashed password
+        hashed = await password_hasher.hash('password')
+        mock_db.users.find_one = AsyncMock(return_value={'email': 'test@example.com', 'password': hashed})
+        mock_db.users.update_one = AsyncMock()
         
+        # Test successful verification, the current hash is kept
+        result = await AuthService.verify_user('test@example.com', 'password')
+        self.assertEqual(result, {'email': 'test@example.com', 'password': hashed})
+        mock_db.users.update_one.assert_not_awaited()
+
+    @patch('services.auth_service.db')
+    async def test_verify_user_rehashes_legacy_password(self, mock_db):
+        """
+        Test that a legacy plaintext password still logs in and is replaced by a hash.
+        """
+        # Setup dummy data for a user stored before passwords were hashed
+        mock_db.users.find_one = AsyncMock(return_value={'_id': 1, 'email': 'test@example.com', 'password': 'password'})
+        mock_db.users.update_one = AsyncMock()
+
         # Test successful verification
-        result = AuthService.verify_user('test@example.com', 'password')
-        self.assertEqual(result, {'email': 'test@example.com', 'password': 'password'})
+        result = await AuthService.verify_user('test@example.com', 'password')
+
+        # Verification: The stored plaintext (and only it) is replaced by a hash
+        query, update = mock_db.users.update_one.await_args.args
+        self.assertEqual(query, {'_id': 1, 'password': 'password'})
+        self.assertTrue(password_hasher.is_hashed(update['$set']['password']))
+        self.assertEqual(result['password'], update['$set']['password'])
         
     @patch('services.auth_service.db')
-    def test_verify_user_failure_by_email(self, mock_db):
+    async def test_verify_user_failure_by_email(self, mock_db):
         """
         Test user verification fails correctly when the email does not exist.
         """
         # Setup mock to return None, simulating user not found
-        mock_db.users.find_one.return_value = None
+        mock_db.users.find_one = AsyncMock(return_value=None)
         
         # Test verification failure
         with self.assertRaises(HTTPException) as context:
-            AuthService.verify_user('test@example.com', 'password')
+            await AuthService.verify_user('test@example.com', 'password')
             
         self.assertEqual(context.exception.status_code, 400)
         self.assertEqual(context.exception.detail, "Incorrect credentials")
         
     @patch('services.auth_service.db')
-    def test_verify_user_failure_by_password(self, mock_db):
+    async def test_verify_user_failure_by_password(self, mock_db):
         """
         Test user verification fails correctly when the password is incorrect.
         """
         # Setup dummy data for the existing user but incorrect password scenario
-        mock_db.users.find_one.return_value = {'email': 'test@example.com', 'password': 'password'}
+        mock_db.users.find_one = AsyncMock(return_value={'email': 'test@example.com', 'password': 'password'})
         
         # Test verification failure
         with self.assertRaises(HTTPException) as context:
-            AuthService.verify_user('test@example.com', 'not_password')
+            await AuthService.verify_user('test@example.com', 'not_password')
             
         self.assertEqual(context.exception.status_code, 400)
         self.assertEqual(context.exception.detail, "Incorrect credentials")
     
     @patch('services.auth_service.db')
-    def test_create_user_success(self, mock_db):
+    async def test_create_user_success(self, mock_db):
         """
         Test successful creation of a new user when no existing user is found.
         """
         # Setup mock to simulate user does not exist then return new user data
         user_data = {'email': 'test@example.com', 'password': 'password', "user_type": 'admin'}
-        mock_db.users.find_one.side_effect = [None, user_data]  # No user found initially, then simulate user creation
+        mock_db.users.find_one = AsyncMock(side_effect=[None, user_data])  # No user found initially, then simulate user creation
+        mock_db.users.insert_one = AsyncMock()
         
         # Execution: Try to create the user
         try:
-            AuthService.create_user(user_data)
+            await AuthService.create_user(user_data)
         except HTTPException:
             self.fail("HTTPException was raised unexpectedly!")
 
         # Verification: Ensure the user was created correctly
         mock_db.users.find_one.assert_called_with({'email': 'test@example.com'})
-        created_user = mock_db.users.find_one({'email': 'test@example.com'})
+        created_user = await mock_db.users.find_one({'email': 'test@example.com'})
         self.assertEqual(created_user, user_data)
+
+        # Verification: Only a hash of the password was stored
+        stored = mock_db.users.insert_one.await_args.args[0]
+        self.assertTrue(password_hasher.is_hashed(stored['password']))
+        self.assertEqual(await password_hasher.verify('password', stored['password']), (True, False))
     
     @patch('services.auth_service.db')
-    def test_create_user_failure(self, mock_db):
+    async def test_create_user_failure(self, mock_db):
         """
         Test failure to create a user when the email already exists in the database.
         """
         # Setup: Mock find_one to return existing user data
-        mock_db.users.find_one.return_value = {'email': 'exists@example.com'}
+        mock_db.users.find_one = AsyncMock(return_value={'email': 'exists@example.com'})
         
         # Execution: Attempt to create a user that should already exist
         with self.assertRaises(HTTPException) as context:
-            AuthService.create_user({'email': 'exists@example.com', 'password': 'secure'})
+            await AuthService.create_user({'email': 'exists@example.com', 'password': 'secure'})
             
         # Verification: Check correct HTTPException is raised
         self.assertEqual(context.exception.status_code, 400)
         self.assertEqual(context.exception.detail, "Email already exists")
 
+    @patch('services.auth_service.db')
+    async def test_create_user_race(self, mock_db):
+        """
+        Test that a signup losing a race against a concurrent one is rejected by the unique email index.
+        """
+        # Setup: No user found, but the insert violates the unique index
+        mock_db.users.find_one = AsyncMock(return_value=None)
+        mock_db.users.insert_one = AsyncMock(side_effect=DuplicateKeyError('E11000 duplicate key'))
+
+        # Execution: Attempt to create the user
+        with self.assertRaises(HTTPException) as context:
+            await AuthService.create_user({'email': 'race@example.com', 'password': 'secure'})
+
+        # Verification: Same error as a sequential duplicate signup
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(context.exception.detail, "Email already exists")
+
+    @patch('services.auth_service.db')
+    async def test_get_user_by_email_cached(self, mock_db):
+        """
+        Test that a user is read from the database once and then served from the cache.
+        """
+        # Setup: Existing admin user
+        mock_db.users.find_one = AsyncMock(return_value={'email': 'admin@example.com', 'user_type': 'admin'})
+
+        # Execute: Look the user up twice
+        first = await AuthService.get_user_by_email('admin@example.com')
+        second = await AuthService.get_user_by_email('admin@example.com')
+
+        # Verification: One query, equal but independent copies returned
+        mock_db.users.find_one.assert_awaited_once_with({'email': 'admin@example.com'})
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+    @patch('services.auth_service.db')
+    async def test_get_user_by_email_coalesces_misses(self, mock_db):
+        """
+        Test that concurrent misses for the same email share a single database query.
+        """
+        # Setup: Slow database lookup
+        async def slow_find_one(query):
+            await asyncio.sleep(0.01)
+            return {'email': query['email'], 'user_type': 'admin'}
+        mock_db.users.find_one = AsyncMock(side_effect=slow_find_one)
+
+        # Execute: Ten concurrent lookups of the same email
+        users = await asyncio.gather(*(AuthService.get_user_by_email('admin@example.com') for _ in range(10)))
+
+        # Verification: Every caller got the user from one query
+        self.assertEqual(len(users), 10)
+        mock_db.users.find_one.assert_awaited_once()
+
+    @patch('services.auth_service.db')
+    async def test_missing_user_not_cached(self, mock_db):
+        """
+        Test that an unknown email is looked up again on the next call.
+        """
+        mock_db.users.find_one = AsyncMock(return_value=None)
+
+        self.assertIsNone(await AuthService.get_user_by_email('ghost@example.com'))
+        self.assertIsNone(await AuthService.get_user_by_email('ghost@example.com'))
+        self.assertEqual(mock_db.users.find_one.await_count, 2)
+
+    @patch('services.auth_service.db')
+    async def test_create_user_invalidates_cache(self, mock_db):
+        """
+        Test that creating a user drops any cached entry for its email.
+        """
+        # Setup: A cached (stale) entry for the email
+        AuthService.user_cache.set('new@example.com', {'email': 'new@example.com', 'user_type': 'stale'})
+        mock_db.users.find_one = AsyncMock(return_value=None)
+        mock_db.users.insert_one = AsyncMock()
+
+        # Execution: Create the user
+        await AuthService.create_user({'email': 'new@example.com', 'password': 'secure', 'user_type': 'admin'})
+
+        # Verification: The stale entry is gone
+        self.assertIsNone(AuthService.user_cache.get('new@example.com'))
+
+    @patch('services.auth_service.db')
+    async def test_lookup_racing_invalidation_not_cached(self, mock_db):
+        """
+        Test that a lookup started before an invalidation does not cache its possibly stale result.
+        """
+        # Setup: A lookup which is invalidated while its query is in flight
+        async def find_one_then_invalidate(query):
+            AuthService.invalidate_user(query['email'])
+            return {'email': query['email'], 'user_type': 'admin'}
+        mock_db.users.find_one = AsyncMock(side_effect=find_one_then_invalidate)
+
+        # Execution: Look the user up
+        await AuthService.get_user_by_email('admin@example.com')
+
+        # Verification: Nothing was cached
+        self.assertEqual(len(AuthService.user_cache), 0)
+    @patch('services.auth_service.token_revocations')
+    @patch('services.auth_service.db')
+    async def test_revoke_tokens(self, mock_db, mock_revocations):
+        """
+        Test that revoking tokens bumps the stored token version, the revocation list and drops the cached user.
+        """
+        # Setup: A cached user whose stored version becomes 3
+        AuthService.user_cache.set('admin@example.com', {'email': 'admin@example.com', 'user_type': 'admin'})
+        mock_db.users.find_one_and_update = AsyncMock(return_value={'token_version': 3})
+
+        # Execution: Demote the user, revoking its tokens
+        version = await AuthService.revoke_tokens('admin@example.com', user_type='user')
+
+        # Verification
+        self.assertEqual(version, 3)
+        query, update = mock_db.users.find_one_and_update.await_args.args
+        self.assertEqual(query, {'email': 'admin@example.com'})
+        self.assertEqual(update, {'$inc': {'token_version': 1}, '$set': {'user_type': 'user'}})
+        mock_revocations.bump.assert_called_once_with('admin@example.com', 3)
+        self.assertIsNone(AuthService.user_cache.get('admin@example.com'))
+
+    @patch('services.auth_service.db')
+    async def test_revoke_tokens_user_not_found(self, mock_db):
+        """
+        Test that revoking the tokens of an unknown user raises a 404.
+        """
+        mock_db.users.find_one_and_update = AsyncMock(return_value=None)
+
+        with self.assertRaises(HTTPException) as context:
+            await AuthService.revoke_tokens('nonexistent@example.com')
+        self.assertEqual(context.exception.status_code, 404)
+
 if __name__ == '__main__':
     unittest.main()
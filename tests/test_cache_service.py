@@ -0,0 +1,134 @@
+import unittest
+import asyncio
+from unittest.mock import patch
+
+from services.cache_service import TTLCache, SingleFlight, normalize_query
+
+
+class TestTTLCache(unittest.TestCase):
+    """
+    Unit tests for the TTLCache class, a bounded LRU cache with expiring entries.
+    """
+
+    def test_get_and_counters(self):
+        """
+        Test that hits and misses are counted and stored values are returned.
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2})
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used entry is evicted once the cache is full.
+        """
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # 'b' becomes the least recently used entry
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('services.cache_service.time.monotonic')
+    def test_expiry(self, mock_monotonic):
+        """
+        Test that entries expire after the default ttl or their own ttl.
+        """
+        mock_monotonic.return_value = 100.0
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set('default', 1)
+        cache.set('short', 2, ttl=1)
+
+        mock_monotonic.return_value = 102.0
+        self.assertEqual(cache.get('default'), 1)
+        self.assertIsNone(cache.get('short'))
+
+        mock_monotonic.return_value = 106.0
+        self.assertIsNone(cache.get('default'))
+        self.assertEqual(len(cache), 0)
+
+    def test_pop_matching(self):
+        """
+        Test that only the entries selected by the predicate are removed.
+        """
+        cache = TTLCache(maxsize=10)
+        cache.set(('payouts', 1), 'a')
+        cache.set(('payouts', 2), 'b')
+        cache.set(('users', 1), 'c')
+
+        self.assertEqual(cache.pop_matching(lambda key: key[0] == 'payouts'), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get(('users', 1)), 'c')
+
+    def test_normalize_query(self):
+        """
+        Test that equivalent filters produce the same key regardless of key and `$in` ordering.
+        """
+        first = {'status': {'$in': ['paid', 'pending']}, 'user_type': 'affiliate'}
+        second = {'user_type': 'affiliate', 'status': {'$in': ['pending', 'paid']}}
+
+        self.assertEqual(normalize_query(first), normalize_query(second))
+        self.assertNotEqual(normalize_query(first), normalize_query({'user_type': 'affiliate'}))
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for SingleFlight which coalesces identical concurrent calls.
+    """
+
+    async def test_concurrent_calls_share_one_execution(self):
+        """
+        Test that concurrent calls with the same key run once and all receive the result.
+        """
+        flight = SingleFlight()
+        calls = []
+
+        async def query():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'result'
+
+        results = await asyncio.gather(*(flight.do('key', query) for _ in range(5)))
+
+        self.assertEqual(results, ['result'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {'executed': 1, 'coalesced': 4, 'inFlight': 0})
+
+    async def test_exceptions_are_shared(self):
+        """
+        Test that every waiter receives the exception of the shared call and that the key is released.
+        """
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise ValueError('boom')
+
+        results = await asyncio.gather(flight.do('key', failing), flight.do('key', failing), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.stats()['inFlight'], 0)
+
+    async def test_sequential_calls_execute_again(self):
+        """
+        Test that calls made after the previous one finished are not coalesced.
+        """
+        flight = SingleFlight()
+
+        async def query():
+            return 1
+
+        await flight.do('key', query)
+        await flight.do('key', query)
+
+        self.assertEqual(flight.stats()['executed'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
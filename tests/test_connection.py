@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from database.connection import MongoDatabase
+from services.metrics_service import MongoCommandMetrics
+from database.indexes import INDEXES
+
+
+class TestMongoDatabase(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for MongoDatabase which owns the process-wide MongoDB connection pool.
+    """
+
+    def setUp(self):
+        """
+        Set up mocked settings with explicit pool limits.
+        """
+        self.mock_settings = MagicMock()
+        self.mock_settings.mongo_host = "mongo-db"
+        self.mock_settings.mongo_port = 27017
+        self.mock_settings.mongo_database = "cleancode"
+        self.mock_settings.mongo_min_pool_size = 5
+        self.mock_settings.mongo_max_pool_size = 20
+        self.mock_settings.mongo_max_idle_time_ms = 60000
+        self.mock_settings.mongo_server_selection_timeout_ms = 2000
+        self.mock_settings.mongo_warm_up_connections = 3
+        self.mock_settings.mongo_ensure_indexes = False
+        self.mock_settings.metrics_enabled = True
+        self.mock_settings.slow_query_threshold_ms = None
+
+        self.settings_patch = patch('database.connection.settings', self.mock_settings)
+        self.settings_patch.start()
+
+    def tearDown(self):
+        """
+        Clean up (stop) settings patch after each test.
+        """
+        self.settings_patch.stop()
+
+    @patch('database.connection.AsyncMongoClient')
+    async def test_connect_configures_pool_and_warms_up(self, mock_client_class):
+        """
+        Test that connect creates one client sized from the settings and pings it once per warm-up connection.
+        """
+        # Setup: Mock client whose ping succeeds
+        mock_client = MagicMock()
+        mock_client.admin.command = AsyncMock(return_value={'ok': 1})
+        mock_client_class.return_value = mock_client
+
+        # Execute: Connect twice, the second call must reuse the existing client
+        database = MongoDatabase()
+        await database.connect()
+        await database.connect()
+
+        # Assert: A single client with the configured pool options was created and warmed up
+        mock_client_class.assert_called_once()
+        options = mock_client_class.call_args.kwargs
+        self.assertEqual(options['minPoolSize'], 5)
+        self.assertEqual(options['maxPoolSize'], 20)
+        self.assertEqual(options['maxIdleTimeMS'], 60000)
+        self.assertEqual(options['serverSelectionTimeoutMS'], 2000)
+        self.assertIsInstance(options['event_listeners'][0], MongoCommandMetrics)
+        self.assertEqual(mock_client.admin.command.await_count, 3)
+
+    @patch('database.connection.AsyncMongoClient')
+    async def test_close_releases_client(self, mock_client_class):
+        """
+        Test that close shuts the client down and that collections are unavailable afterwards.
+        """
+        # Setup: Connected database without warm-up
+        self.mock_settings.mongo_warm_up_connections = 0
+        mock_client = MagicMock()
+        mock_client.close = AsyncMock()
+        mock_client_class.return_value = mock_client
+        database = MongoDatabase()
+        await database.connect()
+
+        # Execute: Close the connection
+        await database.close()
+
+        # Assert: Client closed and collections no longer reachable
+        mock_client.close.assert_awaited_once()
+        with self.assertRaises(RuntimeError):
+            database.users
+
+    @patch('database.connection.AsyncMongoClient')
+    async def test_connect_ensures_indexes(self, mock_client_class):
+        """
+        Test that every index of the registry is created on its collection at startup.
+        """
+        # Setup: Index creation enabled, warm-up disabled
+        self.mock_settings.mongo_ensure_indexes = True
+        self.mock_settings.mongo_warm_up_connections = 0
+        collections = {}
+
+        def get_collection(name):
+            return collections.setdefault(name, MagicMock(create_indexes=AsyncMock()))
+
+        mock_client = MagicMock()
+        mock_client.__getitem__.return_value.__getitem__.side_effect = get_collection
+        mock_client_class.return_value = mock_client
+
+        # Execute: Connect
+        await MongoDatabase().connect()
+
+        # Assert: Each registered collection received its index models, including the unique email index
+        self.assertEqual(set(collections), set(INDEXES))
+        for name, indexes in INDEXES.items():
+            collections[name].create_indexes.assert_awaited_once_with(indexes)
+        email_index = INDEXES['users'][0].document
+        self.assertEqual(email_index['key'], {'email': 1})
+        self.assertTrue(email_index['unique'])
+
+    def test_collections_require_connect(self):
+        """
+        Test that accessing a collection before the lifespan connected the pool fails loudly.
+        """
+        with self.assertRaises(RuntimeError):
+            MongoDatabase().payouts
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch, AsyncMock
+from fastapi import HTTPException
+
+from dependencies import check_user_is_admin
+from services.revocation_service import token_revocations
+
+
+class TestCheckUserIsAdmin(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the admin authorization dependency.
+    """
+
+    def setUp(self):
+        """
+        Start every test with an empty revocation list.
+        """
+        token_revocations.versions.clear()
+
+    @patch('dependencies.AuthService.get_user_by_email', new_callable=AsyncMock)
+    @patch('dependencies.TokenService.decode_token')
+    async def test_role_claims_need_no_lookup(self, mock_decode, mock_get_user):
+        """
+        Test that an admin token with role claims is authorized without looking the user up.
+        """
+        mock_decode.return_value = {'sub': 'admin@example.com', 'role': 'admin', 'ver': 0}
+
+        user = await check_user_is_admin('token')
+
+        self.assertEqual(user, {'email': 'admin@example.com', 'user_type': 'admin'})
+        mock_get_user.assert_not_awaited()
+
+    @patch('dependencies.TokenService.decode_token')
+    async def test_role_claims_not_admin(self, mock_decode):
+        """
+        Test that a non-admin role claim is forbidden.
+        """
+        mock_decode.return_value = {'sub': 'user@example.com', 'role': 'user', 'ver': 0}
+
+        with self.assertRaises(HTTPException) as context:
+            await check_user_is_admin('token')
+        self.assertEqual(context.exception.status_code, 403)
+
+    @patch('dependencies.TokenService.decode_token')
+    async def test_revoked_token(self, mock_decode):
+        """
+        Test that a token issued before the user's tokens were revoked is rejected.
+        """
+        token_revocations.bump('admin@example.com', 1)
+        mock_decode.return_value = {'sub': 'admin@example.com', 'role': 'admin', 'ver': 0}
+
+        with self.assertRaises(HTTPException) as context:
+            await check_user_is_admin('token')
+        self.assertEqual(context.exception.status_code, 401)
+
+    @patch('dependencies.AuthService.get_user_by_email', new_callable=AsyncMock)
+    @patch('dependencies.TokenService.decode_token')
+    async def test_legacy_token_falls_back_to_lookup(self, mock_decode, mock_get_user):
+        """
+        Test that tokens issued without role claims are still authorized through a user lookup.
+        """
+        mock_decode.return_value = {'sub': 'admin@example.com'}
+        mock_get_user.return_value = {'email': 'admin@example.com', 'user_type': 'admin'}
+
+        user = await check_user_is_admin('token')
+
+        self.assertEqual(user['user_type'], 'admin')
+        mock_get_user.assert_awaited_once_with('admin@example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
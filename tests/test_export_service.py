@@ -0,0 +1,110 @@
+import unittest
+import json
+from unittest.mock import MagicMock, AsyncMock
+from datetime import datetime
+from bson.objectid import ObjectId
+
+from services.export_service import ExportService
+
+
+async def collect(stream):
+    """
+    Gathers every chunk of an async generator into one bytes object.
+    """
+    return b"".join([chunk async for chunk in stream])
+
+
+async def iterate(items):
+    """
+    Wraps a list into an async iterator.
+    """
+    for item in items:
+        yield item
+
+
+class TestExportService(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the ExportService class which streams query results as NDJSON or CSV.
+    """
+
+    def setUp(self):
+        """
+        Set up sample payout documents with BSON types.
+        """
+        self.object_id = ObjectId('507f1f77bcf86cd799439011')
+        self.docs = [
+            {'_id': self.object_id, 'user_type': 'affiliate', 'created': datetime(2024, 1, 1)},
+            {'_id': self.object_id, 'user_type': 'publisher', 'created': datetime(2024, 1, 2), 'extra': 1},
+        ]
+
+    async def test_stream_documents(self):
+        """
+        Test that documents are read with the requested batch size and converted to camelCase row by row.
+        """
+        # Setup: Mock cursor yielding the sample documents
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = mock_collection
+        mock_collection.batch_size.return_value = mock_collection
+        mock_collection.__aiter__.return_value = self.docs
+
+        # Execute: Stream the documents
+        rows = [row async for row in ExportService.stream_documents(mock_collection, {'status': 'paid'}, 50)]
+
+        # Assert: Batch size applied and keys converted
+        mock_collection.find.assert_called_with({'status': 'paid'})
+        mock_collection.batch_size.assert_called_with(50)
+        self.assertEqual(rows[0], {'id': self.object_id, 'userType': 'affiliate', 'created': datetime(2024, 1, 1)})
+
+    async def test_stream_documents_with_projection(self):
+        """
+        Test that a projection streams server-renamed rows from an aggregation without converting them again.
+        """
+        # Setup: Aggregation cursor yielding projected rows
+        mock_collection = MagicMock()
+        rows = [{'userType': 'affiliate'}]
+        aggregate_cursor = MagicMock()
+        aggregate_cursor.__aiter__.return_value = rows
+        mock_collection.aggregate = AsyncMock(return_value=aggregate_cursor)
+        projection = {'_id': 0, 'userType': '$user_type'}
+
+        # Execute: Stream the documents
+        streamed = [row async for row in ExportService.stream_documents(mock_collection, {}, 20, projection)]
+
+        # Assert: One aggregation with the requested batch size
+        self.assertEqual(streamed, rows)
+        mock_collection.aggregate.assert_awaited_once_with([{'$match': {}}, {'$project': projection}], batchSize=20)
+        mock_collection.find.assert_not_called()
+
+    async def test_to_ndjson(self):
+        """
+        Test that every document becomes one JSON line with BSON values encoded as strings.
+        """
+        body = await collect(ExportService.to_ndjson(iterate(self.docs)))
+
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0]),
+                         {'_id': str(self.object_id), 'user_type': 'affiliate', 'created': '2024-01-01T00:00:00'})
+
+    async def test_to_csv(self):
+        """
+        Test that the CSV header comes from the first document and extra keys of later rows are dropped.
+        """
+        body = await collect(ExportService.to_csv(iterate(self.docs)))
+
+        self.assertEqual(body.decode().splitlines(), [
+            '_id,user_type,created',
+            f'{self.object_id},affiliate,2024-01-01T00:00:00',
+            f'{self.object_id},publisher,2024-01-02T00:00:00',
+        ])
+
+    async def test_to_csv_empty(self):
+        """
+        Test that an empty result produces an empty body.
+        """
+        body = await collect(ExportService.to_csv(iterate([])))
+        self.assertEqual(body, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
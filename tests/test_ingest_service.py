@@ -0,0 +1,200 @@
+import time
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+from services.ingest_service import IngestService
+
+
+async def iterate(items):
+    """
+    Wraps a list into an async iterator.
+    """
+    for item in items:
+        yield item
+
+
+def payout_line(index):
+    """
+    Builds one valid NDJSON payout line.
+    """
+    return (
+        b'{"user_id": %d, "amount": 10.5, "status": "paid", "user_type": "affiliate", "created": "2024-01-01T00:00:00"}\n'
+        % index
+    )
+
+
+def mock_collection():
+    """
+    Builds a collection whose `insert_many` reports every document as inserted.
+    """
+    collection = MagicMock()
+    collection.name = "payout_affiliate"
+    collection.insert_many = AsyncMock(side_effect=lambda documents, ordered: MagicMock(inserted_ids=list(documents)))
+    return collection
+
+
+class TestIngestService(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the IngestService class which loads NDJSON payouts in chunks.
+    """
+
+    async def test_split_lines_across_chunks(self):
+        """
+        Test that lines split over several chunks are reassembled and blank lines skipped.
+        """
+        chunks = [b'{"a"', b': 1}\n\n{"b": 2}\n{"c"', b': 3}']
+        lines = [item async for item in IngestService.split_lines(iterate(chunks))]
+        self.assertEqual(lines, [(1, b'{"a": 1}'), (3, b'{"b": 2}'), (4, b'{"c": 3}')])
+
+    async def test_split_lines_oversized(self):
+        """
+        Test that an oversized line is yielded as None without being buffered.
+        """
+        chunks = [b'{"a": 1}\n', b'x' * 20, b'x' * 20, b'\n{"b": 2}\n']
+        lines = [item async for item in IngestService.split_lines(iterate(chunks), max_line_bytes=10)]
+        self.assertEqual(lines, [(1, b'{"a": 1}'), (2, None), (3, b'{"b": 2}')])
+
+    async def test_split_lines_large_chunk(self):
+        """
+        Test that a large chunk of small lines is split in linear time, every line intact.
+        """
+        chunk = b''.join(b'{"n": %d}\n' % index for index in range(100000))
+
+        started = time.perf_counter()
+        lines = [item async for item in IngestService.split_lines(iterate([chunk[:-3], chunk[-3:]]))]
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(lines), 100000)
+        self.assertEqual(lines[0], (1, b'{"n": 0}'))
+        self.assertEqual(lines[-1], (100000, b'{"n": 99999}'))
+        self.assertEqual([number for number, _ in lines], list(range(1, 100001)))
+        # Re-slicing the buffer after every line took over 3 seconds on this input
+        self.assertLess(elapsed, 1.5)
+
+    def test_parse_record(self):
+        """
+        Test that valid lines are converted and stamped, and invalid ones explained.
+        """
+        document = IngestService.parse_record(payout_line(1))
+        self.assertEqual(document['created'], datetime(2024, 1, 1))
+        self.assertIsNone(document['payment_date'])
+
+        with self.assertRaisesRegex(ValueError, 'Invalid JSON'):
+            IngestService.parse_record(b'{"user_id": ')
+        with self.assertRaisesRegex(ValueError, 'Expected a JSON object'):
+            IngestService.parse_record(b'[1, 2]')
+        with self.assertRaisesRegex(ValueError, 'amount'):
+            IngestService.parse_record(b'{"user_id": 1, "status": "paid", "user_type": "a", "created": "2024-01-01"}')
+
+    async def test_ingest_chunks(self):
+        """
+        Test that records are inserted unordered in chunks, invalid lines reported per chunk.
+        """
+        collection = mock_collection()
+        body = [payout_line(1) + payout_line(2) + b'not json\n', payout_line(4) + payout_line(5)]
+
+        with patch('services.ingest_service.ResponseCacheService.invalidate') as invalidate:
+            result = await IngestService.ingest(collection, iterate(body), chunk_size=2)
+
+        self.assertEqual([len(call.args[0]) for call in collection.insert_many.call_args_list], [2, 1, 1])
+        self.assertFalse(collection.insert_many.call_args.kwargs['ordered'])
+        self.assertEqual(result['lines'], 5)
+        self.assertEqual(result['inserted'], 4)
+        self.assertEqual(result['failed'], 1)
+        self.assertEqual(result['chunks'][1]['firstLine'], 3)
+        self.assertEqual(result['chunks'][1]['errors'][0]['line'], 3)
+        invalidate.assert_called_once_with('payout_affiliate')
+
+    async def test_write_chunk_stamps_before_insert(self):
+        """
+        Test that documents are stamped right before a fast insert, and not touched afterwards.
+        """
+        collection = mock_collection()
+        collection.update_many = AsyncMock()
+        report = {'inserted': 0, 'errors': []}
+        documents = [{'amount': 1}, {'amount': 2}]
+
+        before = datetime.utcnow()
+        await IngestService.write_chunk(collection, report, documents, [1, 2])
+
+        self.assertTrue(all(document['updated_at'] >= before for document in documents))
+        collection.update_many.assert_not_called()
+
+    async def test_write_chunk_committed_after_watermark(self):
+        """
+        Test that a chunk committing after the rollup worker moved past its stamp is stamped again.
+        """
+        committed = {}
+
+        async def slow_insert(documents, ordered):
+            # The rollup worker moves its watermark past the stamp while the write is in flight
+            committed['watermark'] = datetime.utcnow()
+            for index, document in enumerate(documents):
+                document['_id'] = index
+            committed['at'] = datetime.utcnow()
+            return MagicMock(inserted_ids=[document['_id'] for document in documents])
+
+        collection = mock_collection()
+        collection.insert_many = AsyncMock(side_effect=slow_insert)
+        collection.update_many = AsyncMock()
+        report = {'inserted': 0, 'errors': []}
+        documents = [{'amount': 1}, {'amount': 2}]
+
+        with patch('services.ingest_service.settings', MagicMock(rollup_settle_seconds=-1)):
+            await IngestService.write_chunk(collection, report, documents, [1, 2])
+
+        self.assertTrue(all(document['updated_at'] <= committed['watermark'] for document in documents))
+        query, update = collection.update_many.call_args.args
+        self.assertEqual(query, {'_id': {'$in': [0, 1]}})
+        self.assertGreaterEqual(update['$set']['updated_at'], committed['at'])
+        self.assertEqual(report, {'inserted': 2, 'errors': []})
+
+    async def test_ingest_write_errors(self):
+        """
+        Test that documents rejected by MongoDB are reported with their line numbers.
+        """
+        collection = mock_collection()
+        collection.insert_many = AsyncMock(side_effect=BulkWriteError({
+            'nInserted': 1, 'writeErrors': [{'index': 1, 'errmsg': 'E11000 duplicate key'}],
+        }))
+
+        with patch('services.ingest_service.ResponseCacheService.invalidate'):
+            result = await IngestService.ingest(collection, iterate([payout_line(1) + b'\n' + payout_line(2)]))
+
+        self.assertEqual(result['inserted'], 1)
+        self.assertEqual(result['chunks'][0]['errors'], [{'line': 3, 'error': 'E11000 duplicate key'}])
+
+    async def test_ingest_invalidates_when_stream_fails(self):
+        """
+        Test that chunks inserted before the body stream failed still invalidate the caches.
+        """
+        async def disconnecting():
+            yield payout_line(1) + payout_line(2)
+            raise ConnectionResetError('client disconnected')
+
+        collection = mock_collection()
+        with patch('services.ingest_service.ResponseCacheService.invalidate') as invalidate:
+            with self.assertRaises(ConnectionResetError):
+                await IngestService.ingest(collection, disconnecting(), chunk_size=1)
+
+        self.assertEqual(collection.insert_many.await_count, 2)
+        invalidate.assert_called_once_with('payout_affiliate')
+
+    async def test_ingest_empty_body(self):
+        """
+        Test that an empty body inserts nothing and leaves the caches alone.
+        """
+        collection = mock_collection()
+        with patch('services.ingest_service.ResponseCacheService.invalidate') as invalidate:
+            result = await IngestService.ingest(collection, iterate([b'']))
+
+        self.assertEqual((result['lines'], result['inserted'], result['chunks']), (0, 0, []))
+        collection.insert_many.assert_not_called()
+        invalidate.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from pymongo.errors import DuplicateKeyError
+
+from services.lease_service import LeaseService
+
+
+class TestLeaseService(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the LeaseService class letting one process at a time run a background job.
+    """
+
+    async def test_acquire(self):
+        """
+        Test that the lease is taken when free, expired or already ours, and refused otherwise.
+        """
+        leases = MagicMock()
+        leases.find_one_and_update = AsyncMock()
+        self.assertTrue(await LeaseService.acquire(leases, 'job', 'a', 60))
+        query, update = leases.find_one_and_update.call_args.args
+        self.assertEqual(query['_id'], 'job')
+        self.assertEqual(query['$or'][1], {'owner': 'a'})
+        self.assertEqual(update['$set']['owner'], 'a')
+        self.assertTrue(leases.find_one_and_update.call_args.kwargs['upsert'])
+
+        leases.find_one_and_update = AsyncMock(side_effect=DuplicateKeyError('E11000'))
+        self.assertFalse(await LeaseService.acquire(leases, 'job', 'b', 60))
+
+    async def test_release(self):
+        """
+        Test that a lease is only released by its owner.
+        """
+        leases = MagicMock()
+        leases.delete_one = AsyncMock()
+        await LeaseService.release(leases, 'job', 'a')
+        leases.delete_one.assert_awaited_once_with({'_id': 'job', 'owner': 'a'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from types import SimpleNamespace
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from middleware import MetricsMiddleware
+from routers.metrics import router as metrics_router
+from services.metrics_service import MongoCommandMetrics
+
+
+def sample(name, **labels):
+    """
+    Reads the current value of a sample from the default registry, 0 when not recorded yet.
+    """
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetricsMiddleware(unittest.TestCase):
+    """
+    Unit tests for the per-route HTTP metrics.
+    """
+
+    def setUp(self):
+        """
+        Build a small app with a templated route and the metrics endpoint.
+        """
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(metrics_router)
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int):
+            if item_id == 0:
+                raise HTTPException(status_code=404, detail="Not found")
+            return {"id": item_id}
+
+        self.client = TestClient(app)
+
+    def test_requests_labelled_by_route_template(self):
+        """
+        Test that latency and status are recorded per route template, not per raw path.
+        """
+        labels = {"method": "GET", "route": "/items/{item_id}"}
+        before_ok = sample("http_responses_total", status="200", **labels)
+        before_missing = sample("http_responses_total", status="404", **labels)
+        before_count = sample("http_request_duration_seconds_count", **labels)
+
+        self.client.get("/items/1")
+        self.client.get("/items/2")
+        self.client.get("/items/0")
+
+        self.assertEqual(sample("http_responses_total", status="200", **labels) - before_ok, 2)
+        self.assertEqual(sample("http_responses_total", status="404", **labels) - before_missing, 1)
+        self.assertEqual(sample("http_request_duration_seconds_count", **labels) - before_count, 3)
+        self.assertEqual(sample("http_requests_in_flight", method="GET"), 0)
+
+    def test_metrics_endpoint(self):
+        """
+        Test that /metrics serves the Prometheus text format, including the route metrics.
+        """
+        self.client.get("/items/1")
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="GET",route="/items/{item_id}"}', response.text)
+
+
+class TestMongoCommandMetrics(unittest.TestCase):
+    """
+    Unit tests for the pymongo command listener.
+    """
+
+    def event(self, command_name, command, request_id=1):
+        return SimpleNamespace(command_name=command_name, command=command, request_id=request_id,
+                               connection_id=("localhost", 27017), duration_micros=1500)
+
+    def test_records_monitored_collections(self):
+        """
+        Test that commands on monitored collections are timed and failures counted, getMore included.
+        """
+        listener = MongoCommandMetrics()
+        labels = {"collection": "payout_affiliate", "command": "find"}
+        before = sample("mongodb_command_duration_seconds_count", **labels)
+        before_sum = sample("mongodb_command_duration_seconds_sum", **labels)
+        before_errors = sample("mongodb_command_errors_total", collection="user_wallet", command="getMore")
+
+        listener.started(self.event("find", {"find": "payout_affiliate"}, request_id=1))
+        listener.succeeded(self.event("find", {}, request_id=1))
+        listener.started(self.event("getMore", {"getMore": 42, "collection": "user_wallet"}, request_id=2))
+        listener.failed(self.event("getMore", {}, request_id=2))
+
+        self.assertEqual(sample("mongodb_command_duration_seconds_count", **labels) - before, 1)
+        self.assertAlmostEqual(sample("mongodb_command_duration_seconds_sum", **labels) - before_sum, 0.0015)
+        self.assertEqual(sample("mongodb_command_errors_total", collection="user_wallet", command="getMore") - before_errors, 1)
+        self.assertEqual(listener._pending, {})
+
+    def test_ignores_other_commands(self):
+        """
+        Test that commands outside the monitored collections are not tracked.
+        """
+        listener = MongoCommandMetrics()
+
+        listener.started(self.event("ping", {"ping": 1}))
+        listener.succeeded(self.event("ping", {}))
+
+        self.assertEqual(listener._pending, {})
+        self.assertEqual(sample("mongodb_command_duration_seconds_count", collection="admin", command="ping"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,25 +1,28 @@
+import base64
 import unittest
-from unittest.mock import patch, MagicMock
 import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from datetime import datetime
+from bson import json_util
+from bson.objectid import ObjectId
+from fastapi import HTTPException
 
 from services.pagination_service import PaginationService
 
-class TestPaginationService(unittest.TestCase):
+class TestPaginationService(unittest.IsolatedAsyncioTestCase):
     """
     Unit tests for the PaginationService class that handles data pagination.
     """
 
-    @patch('services.pagination_service.WalletService.check_available_and_pending_balance')
-    @patch('services.pagination_service.TextTransformService.convert_dict_camel_case')
-    @patch('services.pagination_service.db')
-    def test_create_paginate_response(self, mock_db, mock_convert, mock_wallet):
+    @patch('services.pagination_service.WalletService.check_available_and_pending_balances')
+    @patch('services.pagination_service.TextTransformService.convert_keys')
+    async def test_create_paginate_response(self, mock_convert, mock_wallet):
         """
         Test the create_paginate_response method for proper pagination logic, ensuring it handles
         MongoDB collection operations correctly and transforms documents appropriately.
         """
         # Create a mock MongoDB collection object
         mock_collection = MagicMock()
-        mock_db.wallet.return_value = mock_collection
         
         # Set up method chaining for MongoDB collection operations
         mock_collection.find.return_value = mock_collection
@@ -27,19 +30,16 @@ class TestPaginationService(unittest.TestCase):
         mock_collection.limit.return_value = mock_collection
         
         # Simulate count_documents and cursor iteration for a collection
-        mock_collection.count_documents.return_value = 10  # Assume there are 10 documents total
+        mock_collection.count_documents = AsyncMock(return_value=10)  # Assume there are 10 documents total
         mock_docs = [{'_id': '123', 'data': 'value'} for _ in range(3)]
-        mock_collection.__iter__.return_value = iter(mock_docs)
+        mock_collection.__aiter__.return_value = mock_docs
         
         # Mock data transformation and wallet balance check
         mock_convert.side_effect = lambda x: x  # Return unchanged document for simplicity
-        mock_wallet.return_value = (100, 50)  # Mocked available and pending balances
+        mock_wallet.return_value = {'123': (100, 50)}  # Mocked available and pending balances
 
         # Execute the pagination asynchronously
-        loop = asyncio.get_event_loop()
-        response = loop.run_until_complete(
-            PaginationService.create_paginate_response(1, mock_collection, {}, add_wallet=True)
-        )
+        response = await PaginationService.create_paginate_response(1, mock_collection, {}, add_wallet=True)
 
         # Assertions to verify pagination results
         self.assertEqual(response['page'], 1)
@@ -50,5 +50,288 @@ class TestPaginationService(unittest.TestCase):
             self.assertIn('pending_balance', doc)
             mock_convert.assert_called()
 
+        # The whole page is enriched with a single batched wallet lookup
+        mock_wallet.assert_awaited_once_with(['123', '123', '123'])
+
+    def test_cursor_round_trip(self):
+        """
+        Test that a cursor decodes back to the exact sort key of the document it was built from.
+        """
+        # Setup: Document with a datetime and ObjectId sort key
+        doc = {'_id': ObjectId('507f1f77bcf86cd799439011'), 'created': datetime(2024, 5, 1, 12, 30)}
+
+        # Execute: Encode and decode the cursor
+        cursor = PaginationService.encode_cursor(doc)
+        key = PaginationService.decode_cursor(cursor)
+
+        # Assert: Types and values survive the round trip
+        self.assertEqual(key, [doc['created'], doc['_id']])
+
+    def test_decode_invalid_cursor(self):
+        """
+        Test that a malformed cursor is rejected with a 400 error.
+        """
+        with self.assertRaises(HTTPException) as context:
+            PaginationService.decode_cursor('not-a-cursor')
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_decode_cursor_rejects_operators(self):
+        """
+        Test that cursors holding anything but a sort key, such as injected operators, are rejected.
+        """
+        for key in ([{'$ne': None}, {'$gt': 0}], [datetime(2024, 5, 1), {'$gt': 0}], ['2024-05-01', 1],
+                    [None, True], [None, [1]]):
+            cursor = base64.urlsafe_b64encode(json_util.dumps(key).encode()).decode()
+            with self.assertRaises(HTTPException) as context:
+                PaginationService.decode_cursor(cursor)
+            self.assertEqual(context.exception.status_code, 400)
+
+    async def test_cursor_mode_uses_range_predicate(self):
+        """
+        Test that a cursor page is fetched with a range predicate on the sort key instead of skip,
+        and that a full page returns the cursor of its last document.
+        """
+        # Setup: Mock collection returning a full page
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = mock_collection
+        mock_collection.sort.return_value = mock_collection
+        mock_collection.limit.return_value = mock_collection
+        docs = [{'_id': ObjectId(), 'created': datetime(2024, 1, day)} for day in range(2, 5)]
+        mock_collection.to_list = AsyncMock(return_value=docs)
+        previous = PaginationService.encode_cursor({'_id': ObjectId('507f1f77bcf86cd799439011'),
+                                                    'created': datetime(2024, 1, 1)})
+
+        # Execute: Request the page following the previous cursor
+        response = await PaginationService.create_paginate_response(
+            None, mock_collection, {'status': 'paid'}, cursor=previous
+        )
+
+        # Assert: The query combines the filter with the keyset predicate and skip is never used
+        query = mock_collection.find.call_args.args[0]
+        self.assertEqual(query['$and'][0], {'status': 'paid'})
+        self.assertEqual(query['$and'][1]['$or'][0], {'created': {'$gt': datetime(2024, 1, 1)}})
+        mock_collection.skip.assert_not_called()
+        mock_collection.sort.assert_called_with(PaginationService.CURSOR_SORT)
+        self.assertEqual(PaginationService.decode_cursor(response['nextCursor']),
+                         [docs[-1]['created'], docs[-1]['_id']])
+        self.assertEqual(response['results'][0]['id'], docs[0]['_id'])
+
+    async def test_cursor_mode_last_page(self):
+        """
+        Test that the first cursor page uses the plain filter and a short page ends the iteration.
+        """
+        # Setup: Mock collection returning fewer documents than the page size
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = mock_collection
+        mock_collection.sort.return_value = mock_collection
+        mock_collection.limit.return_value = mock_collection
+        mock_collection.to_list = AsyncMock(return_value=[{'_id': ObjectId(), 'created': datetime(2024, 1, 1)}])
+
+        # Execute: Start cursor pagination with an empty cursor
+        response = await PaginationService.create_paginate_response(None, mock_collection, {}, cursor='')
+
+        # Assert: No predicate applied and no next cursor returned
+        mock_collection.find.assert_called_with({})
+        self.assertIsNone(response['nextCursor'])
+
+    async def test_page_and_cursor_are_exclusive(self):
+        """
+        Test that requesting both page and cursor modes at once is rejected.
+        """
+        with self.assertRaises(HTTPException) as context:
+            await PaginationService.create_paginate_response(1, MagicMock(), {}, cursor='')
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_facet_count_strategy(self):
+        """
+        Test that the facet strategy fetches the page and the total in one aggregation round trip.
+        """
+        # Setup: Aggregation returning a single facet document
+        mock_collection = MagicMock()
+        facet_cursor = MagicMock()
+        facet_cursor.to_list = AsyncMock(return_value=[{'results': [{'_id': '1'}], 'total': [{'count': 7}]}])
+        mock_collection.aggregate = AsyncMock(return_value=facet_cursor)
+
+        # Execute: Request the second page with the facet strategy
+        response = await PaginationService.create_paginate_response(
+            2, mock_collection, {'status': 'paid'}, count_strategy='facet'
+        )
+
+        # Assert: One aggregation and no separate count or find
+        pipeline = mock_collection.aggregate.call_args.args[0]
+        self.assertEqual(pipeline[0], {'$match': {'status': 'paid'}})
+        self.assertEqual(pipeline[1]['$facet']['results'], [{'$skip': 3}, {'$limit': 3}])
+        mock_collection.count_documents.assert_not_called()
+        mock_collection.find.assert_not_called()
+        self.assertEqual(response['totalDocs'], 7)
+        self.assertEqual(response['totalPages'], 3)
+        self.assertEqual(response['countStrategy'], 'facet')
+        self.assertEqual(response['results'], [{'id': '1'}])
+
+    async def test_estimated_count_strategy(self):
+        """
+        Test that the estimated strategy is only used for an empty filter and falls back to an exact count otherwise.
+        """
+        # Setup: Mock collection with both counting methods
+        mock_collection = MagicMock()
+        mock_collection.estimated_document_count = AsyncMock(return_value=100)
+        mock_collection.count_documents = AsyncMock(return_value=4)
+
+        # Execute and Assert: Empty filter uses collection metadata
+        total, strategy = await PaginationService.count_total(mock_collection, {}, 'estimated')
+        self.assertEqual((total, strategy), (100, 'estimated'))
+
+        # Execute and Assert: A filter needs an exact count
+        total, strategy = await PaginationService.count_total(mock_collection, {'status': 'paid'}, 'estimated')
+        self.assertEqual((total, strategy), (4, 'count'))
+
+    async def test_cached_count_strategy(self):
+        """
+        Test that the cached strategy counts a normalized filter only once.
+        """
+        # Setup: Empty cache and a collection counting 5 documents
+        PaginationService.count_cache.clear()
+        mock_collection = MagicMock()
+        mock_collection.name = 'payout_affiliate'
+        mock_collection.count_documents = AsyncMock(return_value=5)
+
+        # Execute: Count the same filter twice with different `$in` ordering
+        first = await PaginationService.count_total(mock_collection, {'status': {'$in': ['a', 'b']}}, 'cached')
+        second = await PaginationService.count_total(mock_collection, {'status': {'$in': ['b', 'a']}}, 'cached')
+
+        # Assert: A single count round trip served both calls
+        self.assertEqual(first, (5, 'cached'))
+        self.assertEqual(second, (5, 'cached'))
+        mock_collection.count_documents.assert_awaited_once()
+
+    async def test_skip_totals_strategy(self):
+        """
+        Test that the none strategy skips the count and reports unknown totals.
+        """
+        # Setup: Mock collection with an empty page
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = mock_collection
+        mock_collection.skip.return_value = mock_collection
+        mock_collection.limit.return_value = mock_collection
+        mock_collection.__aiter__.return_value = []
+
+        # Execute: Request a page without totals
+        response = await PaginationService.create_paginate_response(1, mock_collection, {}, count_strategy='none')
+
+        # Assert: No count was run and totals are unknown
+        mock_collection.count_documents.assert_not_called()
+        self.assertIsNone(response['totalDocs'])
+        self.assertIsNone(response['totalPages'])
+        self.assertEqual(response['countStrategy'], 'none')
+
+    async def test_projection_renames_on_server(self):
+        """
+        Test that a projection fetches the page through an aggregation and skips the Python key conversion.
+        """
+        # Setup: Aggregation returning already projected documents
+        mock_collection = MagicMock()
+        mock_collection.count_documents = AsyncMock(return_value=1)
+        page_cursor = MagicMock()
+        page_cursor.to_list = AsyncMock(return_value=[{'paymentDate': datetime(2024, 1, 1)}])
+        mock_collection.aggregate = AsyncMock(return_value=page_cursor)
+        projection = {'_id': 0, 'paymentDate': '$payment_date'}
+
+        # Execute: Request the first page with a projection
+        with patch('services.pagination_service.TextTransformService.convert_many') as mock_convert:
+            response = await PaginationService.create_paginate_response(
+                1, mock_collection, {'status': 'paid'}, count_strategy='count', projection=projection
+            )
+
+        # Assert: Skip, limit and projection all run on the server
+        pipeline = mock_collection.aggregate.call_args.args[0]
+        self.assertEqual(pipeline, [
+            {'$match': {'status': 'paid'}}, {'$skip': 0}, {'$limit': 3}, {'$project': projection},
+        ])
+        mock_collection.find.assert_not_called()
+        mock_convert.assert_not_called()
+        self.assertEqual(response['results'], [{'paymentDate': datetime(2024, 1, 1)}])
+
+    async def test_projection_with_cursor(self):
+        """
+        Test that cursor pages with a projection still produce a next cursor from the hidden sort key.
+        """
+        # Setup: Aggregation returning a full page carrying the temporary sort key
+        mock_collection = MagicMock()
+        last_id = ObjectId()
+        docs = [{'amount': amount, '_cursor': [datetime(2024, 1, amount), last_id]} for amount in (1, 2, 3)]
+        page_cursor = MagicMock()
+        page_cursor.to_list = AsyncMock(return_value=docs)
+        mock_collection.aggregate = AsyncMock(return_value=page_cursor)
+
+        # Execute: Start cursor pagination with a projection
+        response = await PaginationService.create_paginate_response(
+            None, mock_collection, {}, cursor='', projection={'_id': 0, 'amount': '$amount'}
+        )
+
+        # Assert: The sort key is removed from the results and encoded in the next cursor
+        self.assertEqual(response['results'], [{'amount': 1}, {'amount': 2}, {'amount': 3}])
+        self.assertEqual(PaginationService.decode_cursor(response['nextCursor']), [datetime(2024, 1, 3), last_id])
+
+    async def test_page_size(self):
+        """
+        Test that a client page size drives skip, limit and the page count.
+        """
+        # Setup: Mock collection with 45 matching documents
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = mock_collection
+        mock_collection.skip.return_value = mock_collection
+        mock_collection.limit.return_value = mock_collection
+        mock_collection.count_documents = AsyncMock(return_value=45)
+        mock_collection.__aiter__.return_value = []
+
+        # Execute: Request the third page of 20
+        response = await PaginationService.create_paginate_response(3, mock_collection, {}, page_size=20)
+
+        # Assert
+        mock_collection.skip.assert_called_once_with(40)
+        mock_collection.limit.assert_called_once_with(20)
+        self.assertEqual((response['pageSize'], response['totalPages']), (20, 3))
+
+    async def test_page_size_out_of_range(self):
+        """
+        Test that page sizes outside 1 and MAX_PAGE_SIZE are rejected with a 400 error.
+        """
+        for page_size in (0, PaginationService.MAX_PAGE_SIZE + 1):
+            with self.assertRaises(HTTPException) as context:
+                await PaginationService.create_paginate_response(1, MagicMock(), {}, page_size=page_size)
+            self.assertEqual(context.exception.status_code, 400)
+
+    async def test_identical_concurrent_queries_coalesced(self):
+        """
+        Test that identical concurrent page requests share one query, while different pages do not.
+        """
+        # Setup: Mock collection whose count is slow enough for the requests to overlap
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = mock_collection
+        mock_collection.skip.return_value = mock_collection
+        mock_collection.limit.return_value = mock_collection
+        mock_collection.__aiter__.return_value = []
+
+        async def slow_count(match):
+            await asyncio.sleep(0.01)
+            return 5
+        mock_collection.count_documents = AsyncMock(side_effect=slow_count)
+        stats = PaginationService.page_queries.stats()
+
+        # Execute: Three identical requests (filters in another key order) and one for another page
+        responses = await asyncio.gather(
+            PaginationService.create_paginate_response(1, mock_collection, {'a': 1, 'b': 2}, count_strategy='count'),
+            PaginationService.create_paginate_response(1, mock_collection, {'b': 2, 'a': 1}, count_strategy='count'),
+            PaginationService.create_paginate_response(1, mock_collection, {'a': 1, 'b': 2}, count_strategy='count'),
+            PaginationService.create_paginate_response(2, mock_collection, {'a': 1, 'b': 2}, count_strategy='count'),
+        )
+
+        # Assert: Two queries ran, the identical requests got the same response
+        self.assertEqual(mock_collection.count_documents.await_count, 2)
+        self.assertIs(responses[0], responses[1])
+        self.assertEqual(responses[3]['page'], 2)
+        self.assertEqual(PaginationService.page_queries.stats()['executed'] - stats['executed'], 2)
+        self.assertEqual(PaginationService.page_queries.stats()['coalesced'] - stats['coalesced'], 2)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import asyncio
+from fastapi import HTTPException
+
+from services.password_service import PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the off-loop scrypt password hasher.
+    """
+
+    def setUp(self):
+        """
+        Use a cheap scrypt cost to keep the tests fast.
+        """
+        self.hasher = PasswordHasher(workers=2, queue_size=0, n=1024)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    async def test_hash_and_verify(self):
+        """
+        Test that a hash verifies its password only, and is salted.
+        """
+        hashed = await self.hasher.hash('secret')
+
+        self.assertTrue(hashed.startswith('scrypt$1024$'))
+        self.assertNotEqual(hashed, await self.hasher.hash('secret'))
+        self.assertEqual(await self.hasher.verify('secret', hashed), (True, False))
+        self.assertEqual(await self.hasher.verify('wrong', hashed), (False, False))
+
+    async def test_legacy_plaintext_needs_rehash(self):
+        """
+        Test that legacy plaintext passwords still verify and are flagged for a rehash.
+        """
+        self.assertEqual(await self.hasher.verify('secret', 'secret'), (True, True))
+        self.assertEqual(await self.hasher.verify('wrong', 'secret'), (False, False))
+        self.assertEqual(await self.hasher.verify('secret', None), (False, False))
+
+    async def test_outdated_cost_needs_rehash(self):
+        """
+        Test that hashes made with another scrypt cost are flagged for a rehash.
+        """
+        hashed = await self.hasher.hash('secret')
+        stronger = PasswordHasher(workers=1, queue_size=0, n=2048)
+        try:
+            self.assertEqual(await stronger.verify('secret', hashed), (True, True))
+        finally:
+            stronger.shutdown()
+
+    async def test_hash_after_shutdown(self):
+        """
+        Test that the threads are created again after a shutdown, as on a second lifespan.
+        """
+        hashed = await self.hasher.hash('secret')
+        self.hasher.shutdown()
+        self.hasher.shutdown()
+
+        self.assertEqual(await self.hasher.verify('secret', hashed), (True, False))
+
+    async def test_queue_limit(self):
+        """
+        Test that calls beyond the pool and its queue are rejected with a 503 instead of waiting.
+        """
+        results = await asyncio.gather(*(self.hasher.hash('secret') for _ in range(3)), return_exceptions=True)
+
+        rejected = [result for result in results if isinstance(result, HTTPException)]
+        self.assertEqual(len(rejected), 1)
+        self.assertEqual(rejected[0].status_code, 503)
+        self.assertEqual(self.hasher.stats()['rejected'], 1)
+        self.assertEqual(self.hasher.stats()['inFlight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 from datetime import datetime
-from database.models import PayoutQueryParams
+from fastapi import HTTPException
+from unittest.mock import MagicMock, AsyncMock
+from database.models import PayoutQueryParams, PayoutSummaryParams
 from services.payout_service import PayoutService
 
 class TestPayoutService(unittest.TestCase):
@@ -81,6 +83,110 @@ class TestPayoutService(unittest.TestCase):
         # Assert no filters are created
         self.assertEqual(result, expected_match)
 
+    def test_build_projection(self):
+        """
+        Test that requested fields become a `$project` spec renaming them to camelCase on the server.
+        """
+        projection = PayoutService.build_projection('_id, amount,payment_date')
+
+        self.assertEqual(projection, {
+            '_id': 0,
+            'id': '$_id',
+            'amount': '$amount',
+            'paymentDate': '$payment_date',
+        })
+
+    def test_build_projection_omitted(self):
+        """
+        Test that no projection is built when no fields are requested.
+        """
+        self.assertIsNone(PayoutService.build_projection(None))
+
+    def test_build_projection_invalid(self):
+        """
+        Test that empty, nested and operator field names are rejected.
+        """
+        for fields in ['', 'amount,', 'bank.account', '$where']:
+            with self.assertRaises(HTTPException) as context:
+                PayoutService.build_projection(fields)
+            self.assertEqual(context.exception.status_code, 400)
+
+    def test_build_summary_pipeline(self):
+        """
+        Test that the summary groups by the requested fields and month, periods first, totals alongside.
+        """
+        params = PayoutSummaryParams(group_by='status,user_type', interval='month', date_field='payment_date')
+
+        pipeline = PayoutService.build_summary_pipeline({'status': {'$in': ['paid']}}, params)
+
+        self.assertEqual(pipeline[0], {'$match': {'status': {'$in': ['paid']}}})
+        group, sort, _ = pipeline[1]['$facet']['groups']
+        self.assertEqual(group['$group']['_id'], {
+            'status': '$status',
+            'userType': '$user_type',
+            'period': {'$dateTrunc': {'date': '$payment_date', 'unit': 'month', 'startOfWeek': 'monday'}},
+        })
+        self.assertEqual(list(sort['$sort']), ['_id.period', '_id.status', '_id.userType'])
+        self.assertEqual(pipeline[1]['$facet']['totals'][0]['$group']['_id'], None)
+
+    def test_build_summary_pipeline_totals_only(self):
+        """
+        Test that an empty group_by returns a single group and no sort stage.
+        """
+        pipeline = PayoutService.build_summary_pipeline({}, PayoutSummaryParams(group_by=''))
+
+        stages = pipeline[1]['$facet']['groups']
+        self.assertEqual(stages[0]['$group']['_id'], {})
+        self.assertNotIn('$sort', [next(iter(stage)) for stage in stages])
+
+    def test_build_summary_pipeline_invalid_group(self):
+        """
+        Test that grouping by an unsupported field is rejected.
+        """
+        with self.assertRaises(HTTPException) as context:
+            PayoutService.build_summary_pipeline({}, PayoutSummaryParams(group_by='status,amount'))
+        self.assertEqual(context.exception.status_code, 400)
+
+
+class TestPayoutSummary(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the server-side payout summary.
+    """
+
+    async def test_summarize(self):
+        """
+        Test that the summary is read from a single aggregation round trip.
+        """
+        # Setup: Mock collection returning the facet output
+        groups = [{'status': 'paid', 'count': 2, 'totalAmount': 30.0}, {'status': 'pending', 'count': 1, 'totalAmount': 5.0}]
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=[{'groups': groups, 'totals': [{'count': 3, 'totalAmount': 35.0}]}])
+        collection = MagicMock()
+        collection.aggregate = AsyncMock(return_value=cursor)
+
+        # Execute
+        summary = await PayoutService.summarize(collection, {}, PayoutSummaryParams(group_by='status'))
+
+        # Assert
+        collection.aggregate.assert_awaited_once()
+        self.assertEqual(summary['groupBy'], ['status'])
+        self.assertEqual(summary['totals'], {'count': 3, 'totalAmount': 35.0})
+        self.assertEqual(summary['groups'], groups)
+
+    async def test_summarize_no_match(self):
+        """
+        Test that a filter matching nothing reports zero totals.
+        """
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=[{'groups': [], 'totals': []}])
+        collection = MagicMock()
+        collection.aggregate = AsyncMock(return_value=cursor)
+
+        summary = await PayoutService.summarize(collection, {'status': 'x'}, PayoutSummaryParams())
+
+        self.assertEqual(summary['totals'], {'count': 0, 'totalAmount': 0})
+        self.assertEqual(summary['groups'], [])
+
 
 if __name__ == '__main__':
     unittest.main()
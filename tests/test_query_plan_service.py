@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from services.query_plan_service import QueryPlanService
+
+
+class TestQueryPlanService(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for QueryPlanService which checks that payout filters are served by indexes.
+    """
+
+    def test_filter_shapes(self):
+        """
+        Test that every non-empty combination of the six filter parameters produces a filter.
+        """
+        shapes = QueryPlanService.filter_shapes()
+
+        self.assertEqual(len(shapes), 63)
+        self.assertTrue(all(match for _, match in shapes))
+        self.assertIn((('user_type',), {'user_type': 'affiliate'}), shapes)
+
+    def test_plan_stages(self):
+        """
+        Test that stages are collected from nested single and multiple input stages.
+        """
+        plan = {'winningPlan': {'stage': 'FETCH', 'inputStage': {
+            'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}],
+        }}}
+
+        self.assertEqual(QueryPlanService.plan_stages(plan), {'FETCH', 'OR', 'IXSCAN', 'COLLSCAN'})
+
+    async def test_find_collscans(self):
+        """
+        Test that only the shapes whose winning plan scans the collection are reported.
+        """
+        # Setup: The planner only finds an index for filters on `created`
+        def explain_for(match):
+            stage = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}} if 'created' in match else {'stage': 'COLLSCAN'}
+            cursor = MagicMock()
+            cursor.sort.return_value = cursor
+            cursor.explain = AsyncMock(return_value={'queryPlanner': {'winningPlan': stage}})
+            return cursor
+
+        mock_collection = MagicMock()
+        mock_collection.find.side_effect = explain_for
+
+        # Execute: Explain every shape
+        offending = await QueryPlanService.find_collscans(mock_collection)
+
+        # Assert: Shapes without a date range on `created` are reported, sorted and unsorted
+        self.assertEqual(len(offending), 2 * 15)
+        self.assertTrue(any(shape.startswith('user_type: ') for shape in offending))
+        self.assertFalse(any('start_date' in shape.split(':')[0].split('+') for shape in offending))
+
+
+if __name__ == '__main__':
+    unittest.main()
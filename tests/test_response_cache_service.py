@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from services.pagination_service import PaginationService
+from services.response_cache_service import ResponseCacheService
+
+
+class TestResponseCacheService(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the rendered response cache and its conditional GET support.
+    """
+
+    def setUp(self):
+        """
+        Start every test with empty caches.
+        """
+        ResponseCacheService.cache.clear()
+        PaginationService.count_cache.clear()
+
+    def test_cache_key_normalizes_filter(self):
+        """
+        Test that equivalent filters and parameters given in another order share a key.
+        """
+        first = ResponseCacheService.cache_key('payout_affiliate', {'status': {'$in': ['paid', 'failed']}, 'user_type': 'a'}, page=1, cursor=None)
+        second = ResponseCacheService.cache_key('payout_affiliate', {'user_type': 'a', 'status': {'$in': ['failed', 'paid']}}, cursor=None, page=1)
+        other_page = ResponseCacheService.cache_key('payout_affiliate', {'user_type': 'a'}, page=2, cursor=None)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other_page)
+
+    async def test_get_or_render_caches(self):
+        """
+        Test that a body is rendered once, then served with the same strong ETag.
+        """
+        key = ResponseCacheService.cache_key('payout_affiliate', {}, page=1)
+        render = AsyncMock(return_value=b'{"results":[]}')
+
+        first = await ResponseCacheService.get_or_render(key, render)
+        second = await ResponseCacheService.get_or_render(key, render)
+
+        render.assert_awaited_once()
+        self.assertEqual(first, second)
+        self.assertTrue(first[1].startswith('"') and first[1].endswith('"'))
+
+    async def test_get_or_render_not_stored(self):
+        """
+        Test that a body not to be stored is rendered every time, still with its ETag.
+        """
+        key = ResponseCacheService.cache_key('payout_affiliate', {}, page=None)
+        render = AsyncMock(return_value=b'{"results":[]}')
+
+        first = await ResponseCacheService.get_or_render(key, render, store=False)
+        await ResponseCacheService.get_or_render(key, render, store=False)
+
+        self.assertEqual(render.await_count, 2)
+        self.assertIsNone(ResponseCacheService.cache.get(key))
+        self.assertEqual(first[1], ResponseCacheService.etag(b'{"results":[]}'))
+
+    async def test_invalidate(self):
+        """
+        Test that invalidating a collection drops its responses and totals only.
+        """
+        payouts = ResponseCacheService.cache_key('payout_affiliate', {}, page=1)
+        users = ResponseCacheService.cache_key('users', {}, page=1)
+        await ResponseCacheService.get_or_render(payouts, AsyncMock(return_value=b'1'))
+        await ResponseCacheService.get_or_render(users, AsyncMock(return_value=b'2'))
+        PaginationService.count_cache.set(('payout_affiliate', '{}'), 10)
+
+        self.assertEqual(ResponseCacheService.invalidate('payout_affiliate'), 1)
+
+        self.assertIsNone(ResponseCacheService.cache.get(payouts))
+        self.assertIsNotNone(ResponseCacheService.cache.get(users))
+        self.assertEqual(len(PaginationService.count_cache), 0)
+
+    async def test_render_racing_invalidation_not_cached(self):
+        """
+        Test that a body rendered while its collection was written to is not cached.
+        """
+        key = ResponseCacheService.cache_key('payout_affiliate', {}, page=1)
+
+        async def render():
+            ResponseCacheService.invalidate('payout_affiliate')
+            return b'stale'
+
+        await ResponseCacheService.get_or_render(key, render)
+        self.assertIsNone(ResponseCacheService.cache.get(key))
+
+    def test_conditional_response(self):
+        """
+        Test that a matching If-None-Match gets a bodiless 304, anything else the full body.
+        """
+        body = b'{"results":[]}'
+        etag = ResponseCacheService.etag(body)
+
+        not_modified = ResponseCacheService.conditional_response(body, etag, f'"other", W/{etag}')
+        full = ResponseCacheService.conditional_response(body, etag, '"other"')
+
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.body, b'')
+        self.assertEqual(not_modified.headers['etag'], etag)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(full.body, body)
+        self.assertEqual(full.headers['etag'], etag)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import json
+import uuid
+from datetime import datetime
+
+from bson import Decimal128, Int64, ObjectId, Timestamp
+from bson.binary import Binary
+
+from responses import BSONJSONResponse, encode_bson
+
+
+class TestBSONJSONResponse(unittest.TestCase):
+    """
+    Unit tests for the orjson-backed response class and its BSON encoder.
+    """
+
+    def test_render_raw_documents(self):
+        """
+        Test that raw MongoDB documents, including nested BSON values, are rendered.
+        """
+        object_id = ObjectId()
+        content = {
+            "results": [{
+                "_id": object_id,
+                "amount": Decimal128("10.10"),
+                "count": Int64(3),
+                "created": datetime(2024, 1, 2, 3, 4, 5),
+                "wallet": {"userId": object_id, "history": [Decimal128("0.1")]},
+            }],
+        }
+
+        rendered = json.loads(BSONJSONResponse(content).body)
+
+        self.assertEqual(rendered["results"][0], {
+            "_id": str(object_id),
+            "amount": "10.10",
+            "count": 3,
+            "created": "2024-01-02T03:04:05",
+            "wallet": {"userId": str(object_id), "history": ["0.1"]},
+        })
+
+    def test_encode_bson(self):
+        """
+        Test the encoding of the BSON types orjson does not handle natively.
+        """
+        self.assertEqual(encode_bson(Binary(b"\x00\x01")), "AAE=")
+        self.assertEqual(encode_bson(Timestamp(10, 2)), {"t": 10, "i": 2})
+        with self.assertRaises(TypeError):
+            encode_bson(object())
+
+    def test_native_types_untouched(self):
+        """
+        Test that UUIDs and non-string keys are serialized by orjson itself.
+        """
+        value = uuid.uuid4()
+        self.assertEqual(json.loads(BSONJSONResponse({1: value}).body), {"1": str(value)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from services.revocation_service import TokenRevocationList
+
+
+class AsyncIterator:
+    """
+    Minimal async iterator standing in for a pymongo AsyncCursor.
+    """
+
+    def __init__(self, items):
+        self.items = iter(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class TestTokenRevocationList(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the in-memory token revocation list.
+    """
+
+    def test_is_current(self):
+        """
+        Test that only tokens older than the user's recorded version are revoked.
+        """
+        revocations = TokenRevocationList(interval=1)
+        revocations.bump('admin@example.com', 2)
+
+        self.assertFalse(revocations.is_current('admin@example.com', 1))
+        self.assertTrue(revocations.is_current('admin@example.com', 2))
+        self.assertTrue(revocations.is_current('other@example.com', 0))
+
+    @patch('services.revocation_service.db')
+    async def test_refresh_keeps_newer_local_bumps(self, mock_db):
+        """
+        Test that a reload picks up versions from the database without losing newer local bumps.
+        """
+        # Setup: The database knows one user, a newer bump was made locally for another
+        mock_db.users.find = MagicMock(return_value=AsyncIterator([{'email': 'a@example.com', 'token_version': 1}]))
+        revocations = TokenRevocationList(interval=1)
+        revocations.bump('b@example.com', 4)
+
+        # Execution
+        await revocations.refresh()
+
+        # Verification
+        self.assertEqual(revocations.versions, {'a@example.com': 1, 'b@example.com': 4})
+        self.assertEqual(mock_db.users.find.call_args.args[0], {'token_version': {'$gt': 0}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, AsyncMock, patch
+
+from bson import Decimal128, ObjectId
+
+from database.models import PayoutSummaryParams
+from services.lease_service import LeaseService
+from services.rollup_service import RollupService, RollupWorker, add_amounts
+
+
+def mock_cursor(rows):
+    """
+    Builds an aggregation cursor over rows, iterable and with `to_list`.
+    """
+    cursor = MagicMock()
+    cursor.__aiter__.return_value = rows
+    cursor.to_list = AsyncMock(return_value=rows)
+    return cursor
+
+
+def mock_database(watermark, rollup_rows=(), live_groups=()):
+    """
+    Builds a database whose rollups and payouts aggregate to the given rows.
+    """
+    database = MagicMock()
+    database.rollup_state.find_one = AsyncMock(
+        return_value=None if watermark is None else {'_id': RollupService.NAME, 'watermark': watermark}
+    )
+    database.payout_rollups.aggregate = AsyncMock(return_value=mock_cursor(list(rollup_rows)))
+    database.payouts.aggregate = AsyncMock(
+        return_value=mock_cursor([{'groups': list(live_groups), 'totals': []}])
+    )
+    return database
+
+
+class TestRollupService(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the RollupService class building and reading the daily payout rollups.
+    """
+
+    async def test_days_written_finds_inserts_without_updated_at(self):
+        """
+        Test that a payout inserted without `updated_at` is matched through its ObjectId.
+        """
+        since, until = datetime(2024, 3, 4), datetime(2024, 3, 4, 0, 1)
+        payout = {'_id': ObjectId.from_datetime(datetime(2024, 3, 4, 0, 0, 30)), 'created': datetime(2024, 3, 3, 12)}
+        payouts = MagicMock()
+        payouts.aggregate = AsyncMock(return_value=mock_cursor([{'_id': datetime(2024, 3, 3)}]))
+
+        days = await RollupService.days_written(payouts, since=since, until=until)
+
+        self.assertEqual(days, [datetime(2024, 3, 3)])
+        by_id, by_update = payouts.aggregate.call_args.args[0][0]['$match']['$or']
+        self.assertNotIn('updated_at', payout)
+        self.assertTrue(by_id['_id']['$gt'] < payout['_id'] <= by_id['_id']['$lte'])
+        self.assertEqual(by_update, {'updated_at': {'$gt': since, '$lte': until}})
+
+        # Ids generated after the end of the period are left to the next run
+        later = ObjectId.from_datetime(datetime(2024, 3, 4, 0, 1, 1))
+        self.assertFalse(later <= by_id['_id']['$lte'])
+
+    async def test_rebuild_days(self):
+        """
+        Test that the rows of the days are replaced, then the stale rows of those days deleted.
+        """
+        day = datetime(2024, 3, 1)
+        stamp = datetime(2024, 3, 5)
+        key = {'day': day, 'status': 'paid', 'user_type': 'affiliate'}
+        payouts = MagicMock()
+        payouts.aggregate = AsyncMock(return_value=mock_cursor([{'_id': key, 'count': 2, 'total_amount': 30}]))
+        rollups = MagicMock()
+        rollups.bulk_write = AsyncMock()
+        rollups.delete_many = AsyncMock()
+
+        written = await RollupService.rebuild_days(payouts, rollups, [day], stamp)
+
+        self.assertEqual(written, 1)
+        match = payouts.aggregate.call_args.args[0][0]['$match']
+        self.assertEqual(match, {'$or': [{'created': {'$gte': day, '$lt': day + timedelta(days=1)}}]})
+        operation = rollups.bulk_write.call_args.args[0][0]
+        self.assertEqual(operation._filter, key)
+        self.assertEqual(operation._doc, {**key, 'count': 2, 'total_amount': 30, 'rebuilt_at': stamp})
+        self.assertFalse(rollups.bulk_write.call_args.kwargs['ordered'])
+        rollups.delete_many.assert_awaited_once_with({'day': {'$in': [day]}, 'rebuilt_at': {'$ne': stamp}})
+
+    async def test_rebuild_days_empty(self):
+        """
+        Test that nothing is read or written without days.
+        """
+        payouts, rollups = MagicMock(), MagicMock()
+        self.assertEqual(await RollupService.rebuild_days(payouts, rollups, [], datetime(2024, 3, 5)), 0)
+        payouts.aggregate.assert_not_called()
+
+    async def test_rollup_range(self):
+        """
+        Test that only the whole days before the day of the watermark qualify.
+        """
+        state = mock_database(datetime(2024, 3, 10, 12)).rollup_state
+        match = {'created': {'$gte': datetime(2024, 3, 1, 6), '$lte': datetime(2024, 3, 20)}}
+        self.assertEqual(await RollupService.rollup_range(state, match), (datetime(2024, 3, 2), datetime(2024, 3, 10)))
+
+        match = {'created': {'$gte': datetime(2024, 3, 1), '$lte': datetime(2024, 3, 4, 23, 59, 59, 999000)}}
+        self.assertEqual(await RollupService.rollup_range(state, match), (datetime(2024, 3, 1), datetime(2024, 3, 5)))
+
+        match = {'created': {'$gte': datetime(2024, 3, 1, 6, tzinfo=timezone(timedelta(hours=6)))}}
+        self.assertEqual(await RollupService.rollup_range(state, match), (datetime(2024, 3, 1), datetime(2024, 3, 10)))
+
+    async def test_rollup_range_unusable(self):
+        """
+        Test that payment date filters, missing rollups and ranges within a day are not answered from rollups.
+        """
+        state = mock_database(datetime(2024, 3, 10)).rollup_state
+        self.assertIsNone(await RollupService.rollup_range(state, {'payment_date': {'$gte': datetime(2024, 3, 1)}}))
+        match = {'created': {'$gte': datetime(2024, 3, 1, 6), '$lte': datetime(2024, 3, 1, 18)}}
+        self.assertIsNone(await RollupService.rollup_range(state, match))
+        self.assertIsNone(await RollupService.rollup_range(mock_database(None).rollup_state, {}))
+
+    async def test_summarize_merges_rollups_and_live_edges(self):
+        """
+        Test that rollup groups and the live partial days are added up per group.
+        """
+        database = mock_database(
+            datetime(2024, 3, 10, 12),
+            rollup_rows=[{'status': 'paid', 'count': 5, 'totalAmount': 50}, {'status': 'pending', 'count': 1, 'totalAmount': 3}],
+            live_groups=[{'status': 'paid', 'count': 1, 'totalAmount': 10}],
+        )
+        match = {'created': {'$gte': datetime(2024, 3, 1, 6)}, 'user_type': 'affiliate'}
+
+        summary = await RollupService.summarize(database, match, PayoutSummaryParams(group_by='status'))
+
+        rollup_match = database.payout_rollups.aggregate.call_args.args[0][0]['$match']
+        self.assertEqual(rollup_match, {'user_type': 'affiliate', 'day': {'$gte': datetime(2024, 3, 2), '$lt': datetime(2024, 3, 10)}})
+        live_matches = [call.args[0][0]['$match'] for call in database.payouts.aggregate.call_args_list]
+        self.assertEqual(live_matches, [
+            {'user_type': 'affiliate', 'created': {'$gte': datetime(2024, 3, 1, 6), '$lt': datetime(2024, 3, 2)}},
+            {'user_type': 'affiliate', 'created': {'$gte': datetime(2024, 3, 10)}},
+        ])
+        self.assertEqual(summary['groups'], [
+            {'status': 'paid', 'count': 7, 'totalAmount': 70},
+            {'status': 'pending', 'count': 1, 'totalAmount': 3},
+        ])
+        self.assertEqual(summary['totals'], {'count': 8, 'totalAmount': 73})
+        self.assertEqual(summary['rollupRange'], {'start': datetime(2024, 3, 2), 'end': datetime(2024, 3, 10)})
+
+    async def test_summarize_payment_date_periods_live(self):
+        """
+        Test that periods of the payment date are aggregated from the payouts alone.
+        """
+        database = mock_database(datetime(2024, 3, 10), live_groups=[{'status': 'paid', 'count': 1, 'totalAmount': 1}])
+        params = PayoutSummaryParams(group_by='status', interval='month', date_field='payment_date')
+
+        summary = await RollupService.summarize(database, {}, params)
+
+        database.payout_rollups.aggregate.assert_not_called()
+        database.payouts.aggregate.assert_awaited_once()
+        self.assertIsNone(summary['rollupRange'])
+
+    def test_merge_groups_sorted_by_period(self):
+        """
+        Test that merged groups are sorted by period first, missing keys first.
+        """
+        parts = [
+            [{'status': 'paid', 'period': datetime(2024, 2, 1), 'count': 1, 'totalAmount': 1}],
+            [{'status': None, 'period': datetime(2024, 1, 1), 'count': 1, 'totalAmount': 2},
+             {'status': 'paid', 'period': datetime(2024, 2, 1), 'count': 2, 'totalAmount': 3}],
+        ]
+        groups = RollupService.merge_groups(['status', 'period'], parts)
+        self.assertEqual(groups, [
+            {'status': None, 'period': datetime(2024, 1, 1), 'count': 1, 'totalAmount': 2},
+            {'status': 'paid', 'period': datetime(2024, 2, 1), 'count': 3, 'totalAmount': 4},
+        ])
+
+    def test_add_amounts(self):
+        """
+        Test that Decimal128 sums are added exactly.
+        """
+        self.assertEqual(add_amounts(Decimal128('0.1'), 0.2), Decimal('0.3'))
+        self.assertEqual(add_amounts(1, 2.5), 3.5)
+
+
+class TestRollupWorker(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the RollupWorker background job.
+    """
+
+    async def test_run_once_incremental(self):
+        """
+        Test that only the days written since the watermark are rebuilt and the watermark advanced.
+        """
+        days = [datetime(2024, 3, day) for day in (1, 2, 3)]
+        worker = RollupWorker(interval=1, settle=0, batch_days=2)
+        with patch('services.rollup_service.db') as db, \
+                patch.object(LeaseService, 'acquire', AsyncMock(return_value=True)), \
+                patch.object(LeaseService, 'release', AsyncMock()) as release_lease, \
+                patch.object(RollupService, 'get_watermark', AsyncMock(return_value=datetime(2024, 3, 4))), \
+                patch.object(RollupService, 'days_written', AsyncMock(return_value=days)) as days_written, \
+                patch.object(RollupService, 'rebuild_days', AsyncMock()) as rebuild_days, \
+                patch.object(RollupService, 'set_watermark', AsyncMock()) as set_watermark, \
+                patch('services.rollup_service.ResponseCacheService.invalidate') as invalidate:
+            self.assertEqual(await worker.run_once(), 3)
+
+        self.assertEqual(days_written.call_args.kwargs['since'], datetime(2024, 3, 4))
+        self.assertEqual([call.args[2] for call in rebuild_days.call_args_list], [days[:2], days[2:]])
+        set_watermark.assert_awaited_once()
+        invalidate.assert_called_once_with('payout_affiliate')
+        db.payout_rollups.delete_many.assert_not_called()
+        release_lease.assert_awaited_once_with(db.worker_leases, RollupService.NAME, worker.owner)
+        self.assertEqual(worker.status()['lastDays'], 3)
+
+    async def test_run_once_rebuilds_without_watermark(self):
+        """
+        Test that the first run rebuilds every day and drops the rows of vanished days.
+        """
+        worker = RollupWorker(interval=1, settle=0)
+        with patch('services.rollup_service.db') as db, \
+                patch.object(LeaseService, 'acquire', AsyncMock(return_value=True)), \
+                patch.object(LeaseService, 'release', AsyncMock()) as release_lease, \
+                patch.object(RollupService, 'get_watermark', AsyncMock(return_value=None)), \
+                patch.object(RollupService, 'days_written', AsyncMock(return_value=[])) as days_written, \
+                patch.object(RollupService, 'set_watermark', AsyncMock()), \
+                patch('services.rollup_service.ResponseCacheService.invalidate') as invalidate:
+            db.payout_rollups.delete_many = AsyncMock()
+            self.assertEqual(await worker.run_once(), 0)
+
+        days_written.assert_awaited_once_with(db.payouts)
+        db.payout_rollups.delete_many.assert_awaited_once()
+        invalidate.assert_not_called()
+
+    async def test_run_once_skipped_while_leased(self):
+        """
+        Test that a worker leaves the run to the worker holding the lease.
+        """
+        worker = RollupWorker(interval=1, settle=0)
+        with patch('services.rollup_service.db'), \
+                patch.object(LeaseService, 'acquire', AsyncMock(return_value=False)), \
+                patch.object(LeaseService, 'release', AsyncMock()) as release_lease, \
+                patch.object(RollupService, 'get_watermark', AsyncMock()) as get_watermark:
+            self.assertIsNone(await worker.run_once())
+
+        get_watermark.assert_not_called()
+        release_lease.assert_not_called()
+        self.assertEqual(worker.status()['skipped'], 1)
+
+    async def test_rebuild_aborts_when_lease_lost(self):
+        """
+        Test that a rebuild losing its lease deletes nothing and keeps the watermark.
+        """
+        worker = RollupWorker(interval=1, settle=0)
+        with patch('services.rollup_service.db') as db, \
+                patch.object(LeaseService, 'acquire', AsyncMock(side_effect=[True, True, False])), \
+                patch.object(LeaseService, 'release', AsyncMock()) as release_lease, \
+                patch.object(RollupService, 'get_watermark', AsyncMock(return_value=None)), \
+                patch.object(RollupService, 'days_written', AsyncMock(return_value=[datetime(2024, 3, 1)])), \
+                patch.object(RollupService, 'rebuild_days', AsyncMock()), \
+                patch.object(RollupService, 'set_watermark', AsyncMock()) as set_watermark:
+            db.payout_rollups.delete_many = AsyncMock()
+            with self.assertRaisesRegex(RuntimeError, 'lease lost'):
+                await worker.run_once()
+
+        db.payout_rollups.delete_many.assert_not_called()
+        set_watermark.assert_not_called()
+        release_lease.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
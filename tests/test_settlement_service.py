@@ -0,0 +1,156 @@
+import unittest
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from datetime import datetime, timedelta
+
+from services.lease_service import LeaseService
+from services.settlement_service import SettlementWorker
+from services.wallet_service import WalletService
+
+
+class TestSettlementWorker(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the SettlementWorker which settles matured wallet transactions in the background.
+    """
+
+    def mock_wallet_collection(self, mock_db, wallet_ids, oldest):
+        """
+        Wires a mocked wallet collection holding out-of-date wallets with the given ids.
+        """
+        backlog = MagicMock()
+        backlog.to_list = AsyncMock(return_value=[{'_id': None, 'wallets': len(wallet_ids), 'oldest': oldest}])
+        mock_db.wallet.aggregate = AsyncMock(return_value=backlog)
+
+        cursor = MagicMock()
+        cursor.__aiter__.return_value = [{'_id': wallet_id} for wallet_id in wallet_ids]
+        mock_db.wallet.find.return_value.batch_size.return_value = cursor
+
+        mock_db.worker_leases.find_one_and_update = AsyncMock()
+        mock_db.worker_leases.delete_one = AsyncMock()
+        mock_db.wallet.update_many = AsyncMock(return_value=MagicMock(modified_count=0))
+        mock_db.wallet.bulk_write = AsyncMock(
+            side_effect=lambda requests, ordered: MagicMock(modified_count=len(requests))
+        )
+        return mock_db.wallet
+
+    @patch('services.settlement_service.db')
+    async def test_sweep_settles_in_chunks(self, mock_db):
+        """
+        Test that a sweep settles every out-of-date wallet in unordered bulk writes of at most batch_size.
+        """
+        # Setup: Seven wallets waiting for one hour
+        wallet_collection = self.mock_wallet_collection(mock_db, list(range(7)), datetime.utcnow() - timedelta(hours=1))
+        worker = SettlementWorker(interval=1, batch_size=3, concurrency=2)
+
+        # Execute: Run a single sweep
+        settled = await worker.sweep()
+
+        # Assert: Chunks of 3, 3 and 1 written with the settlement pipeline
+        self.assertEqual(settled, 7)
+        chunk_sizes = [len(call.args[0]) for call in wallet_collection.bulk_write.call_args_list]
+        self.assertEqual(chunk_sizes, [3, 3, 1])
+        request = wallet_collection.bulk_write.call_args_list[0].args[0][0]
+        self.assertEqual(request._doc, WalletService.SETTLEMENT_PIPELINE)
+        self.assertTrue(all(call.kwargs == {'ordered': False} for call in wallet_collection.bulk_write.call_args_list))
+
+        # Assert: Only ids of out-of-date wallets are read, never their transactions
+        wallet_collection.find.assert_called_once()
+        self.assertEqual(wallet_collection.find.call_args.args[1], {'_id': 1})
+
+        # Assert: Sweeps select matured transactions only, served by their index
+        self.assertEqual(list(wallet_collection.find.call_args.args[0]), ['transactions.date_available'])
+
+        # Assert: Progress and lag are reported
+        status = worker.status()
+        self.assertEqual(status['runs'], 1)
+        self.assertEqual(status['backlogWallets'], 7)
+        self.assertEqual(status['lastSettled'], 7)
+        self.assertGreaterEqual(status['lagSeconds'], 3600)
+
+    @patch('services.settlement_service.db')
+    async def test_sweep_without_backlog(self, mock_db):
+        """
+        Test that an empty backlog writes nothing and reports no lag.
+        """
+        # Setup: Nothing to settle
+        wallet_collection = self.mock_wallet_collection(mock_db, [], None)
+        wallet_collection.aggregate.return_value.to_list = AsyncMock(return_value=[])
+        worker = SettlementWorker(interval=1, batch_size=3, concurrency=2)
+
+        # Execute: Run a single sweep
+        settled = await worker.sweep()
+
+        # Assert: No write and no lag
+        self.assertEqual(settled, 0)
+        wallet_collection.bulk_write.assert_not_called()
+        self.assertEqual(worker.status()['lagSeconds'], 0.0)
+
+    @patch('services.settlement_service.db')
+    async def test_backfill_runs_once(self, mock_db):
+        """
+        Test that wallets created without balances are settled by the first sweep only.
+        """
+        wallet_collection = self.mock_wallet_collection(mock_db, [], None)
+        wallet_collection.aggregate.return_value.to_list = AsyncMock(return_value=[])
+        worker = SettlementWorker(interval=1, batch_size=3, concurrency=2)
+
+        await worker.sweep()
+        await worker.sweep()
+
+        wallet_collection.update_many.assert_awaited_once_with(
+            {'pending_balance': {'$exists': False}}, WalletService.SETTLEMENT_PIPELINE
+        )
+
+    @patch('services.settlement_service.db')
+    async def test_sweep_skipped_while_leased(self, mock_db):
+        """
+        Test that a worker leaves the sweep to the worker holding the lease.
+        """
+        wallet_collection = self.mock_wallet_collection(mock_db, list(range(7)), None)
+        worker = SettlementWorker(interval=1, batch_size=3, concurrency=2)
+
+        with patch.object(LeaseService, 'acquire', AsyncMock(return_value=False)):
+            self.assertIsNone(await worker.sweep())
+
+        wallet_collection.find.assert_not_called()
+        wallet_collection.bulk_write.assert_not_called()
+        self.assertEqual(worker.status()['skipped'], 1)
+
+    @patch('services.settlement_service.db')
+    async def test_sweep_stops_when_lease_lost(self, mock_db):
+        """
+        Test that a sweep losing its lease sends no further writes and releases the lease.
+        """
+        wallet_collection = self.mock_wallet_collection(mock_db, list(range(7)), None)
+        worker = SettlementWorker(interval=1, batch_size=3, concurrency=2)
+
+        with patch.object(LeaseService, 'acquire', AsyncMock(side_effect=[True, True, False])):
+            with self.assertRaisesRegex(RuntimeError, 'lease lost'):
+                await worker.sweep()
+
+        self.assertEqual(wallet_collection.bulk_write.await_count, 1)
+        mock_db.worker_leases.delete_one.assert_awaited_once()
+
+    @patch('services.settlement_service.db')
+    async def test_start_and_stop(self, mock_db):
+        """
+        Test that the worker runs in the background and stops cleanly.
+        """
+        # Setup: Nothing to settle
+        self.mock_wallet_collection(mock_db, [], None)
+        worker = SettlementWorker(interval=60, batch_size=3, concurrency=2)
+
+        # Execute: Start, let the first sweep run, then stop
+        worker.start()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        self.assertTrue(worker.status()['running'])
+        await worker.stop()
+
+        # Assert: One sweep ran and the worker is stopped
+        self.assertEqual(worker.runs, 1)
+        self.assertFalse(worker.status()['running'])
+
+
+if __name__ == '__main__':
+    unittest.main()
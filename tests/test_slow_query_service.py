@@ -0,0 +1,146 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middleware import RequestContextMiddleware
+from services.slow_query_service import SlowQueryMonitor, current_request, current_route
+
+
+def event(command_name, command=None, duration_ms=0, request_id=1):
+    """
+    Builds a stand-in for the pymongo command events.
+    """
+    return SimpleNamespace(command_name=command_name, command=command or {}, request_id=request_id,
+                           connection_id=("localhost", 27017), database_name="cleancode",
+                           duration_micros=int(duration_ms * 1000))
+
+
+FIND = {
+    "find": "payout_affiliate",
+    "filter": {"status": {"$in": ["paid", "failed"]}, "created": {"$gte": "2024-01-01"}},
+    "sort": {"created": 1, "_id": 1},
+    "limit": 3,
+    "lsid": {"id": "session"},
+    "$db": "cleancode",
+}
+
+EXPLAIN = {
+    "queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "COLLSCAN"}}},
+    "executionStats": {"nReturned": 3, "totalDocsExamined": 3000, "totalKeysExamined": 0, "executionTimeMillis": 120},
+}
+
+
+class TestSlowQueryMonitor(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the slow MongoDB command log.
+    """
+
+    def test_command_shape_redacts_values(self):
+        """
+        Test that filter values are redacted while operators, sort and session-free structure are kept.
+        """
+        shape = SlowQueryMonitor.command_shape("find", FIND)
+
+        self.assertEqual(shape, {
+            "find": "payout_affiliate",
+            "filter": {"status": {"$in": ["?"]}, "created": {"$gte": "?"}},
+            "sort": {"created": 1, "_id": 1},
+            "limit": "?",
+        })
+
+    def test_logs_slow_commands_with_route(self):
+        """
+        Test that only commands over the threshold are logged, with the route that sent them.
+        """
+        monitor = SlowQueryMonitor(threshold_ms=50, sample_rate=1, explain=False)
+        token = current_request.set({"method": "GET", "path": "/payout", "route": SimpleNamespace(path="/payout")})
+        try:
+            with self.assertLogs("services.slow_query_service", level="WARNING") as logs:
+                monitor.started(event("find", FIND, request_id=1))
+                monitor.succeeded(event("find", duration_ms=10, request_id=1))
+                monitor.started(event("find", FIND, request_id=2))
+                monitor.succeeded(event("find", duration_ms=80, request_id=2))
+        finally:
+            current_request.reset(token)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("80.0 ms", logs.output[0])
+        self.assertIn("route: GET /payout", logs.output[0])
+        self.assertNotIn("paid", logs.output[0])
+
+    def test_logs_slow_get_more_with_collection(self):
+        """
+        Test that later batches of a slow query are logged with their collection, not their cursor id.
+        """
+        monitor = SlowQueryMonitor(threshold_ms=50, sample_rate=1, explain=False)
+        with self.assertLogs("services.slow_query_service", level="WARNING") as logs:
+            monitor.started(event("getMore", {"getMore": 7281046283, "collection": "payout_affiliate", "batchSize": 500}))
+            monitor.succeeded(event("getMore", duration_ms=80))
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("getMore on payout_affiliate", logs.output[0])
+
+    def test_sampling(self):
+        """
+        Test that a zero sample rate logs nothing.
+        """
+        monitor = SlowQueryMonitor(threshold_ms=0, sample_rate=0, explain=False)
+        with self.assertNoLogs("services.slow_query_service", level="WARNING"):
+            monitor.started(event("find", FIND))
+            monitor.succeeded(event("find", duration_ms=500))
+        self.assertEqual(monitor._pending, {})
+
+    async def test_explains_in_background_once_per_shape(self):
+        """
+        Test that slow commands are explained after the fact, without session fields, once per shape.
+        """
+        monitor = SlowQueryMonitor(threshold_ms=50, sample_rate=1, explain=True)
+        monitor.client = MagicMock()
+        monitor.client.__getitem__.return_value.command = AsyncMock(return_value=EXPLAIN)
+
+        with self.assertLogs("services.slow_query_service", level="WARNING") as logs:
+            for request_id in (1, 2):
+                monitor.started(event("find", FIND, request_id=request_id))
+                monitor.succeeded(event("find", duration_ms=80, request_id=request_id))
+            await asyncio.gather(*monitor._explains)
+
+        command = monitor.client.__getitem__.return_value.command
+        command.assert_awaited_once()
+        explained = command.await_args.args[0]
+        self.assertEqual(explained["verbosity"], "executionStats")
+        self.assertNotIn("lsid", explained["explain"])
+        self.assertIn("'collscan': True", logs.output[-1])
+
+    def test_summarize_explain(self):
+        """
+        Test the extraction of the plan stages and examined/returned ratio.
+        """
+        summary = SlowQueryMonitor.summarize_explain(EXPLAIN)
+
+        self.assertEqual(summary["stages"], ["COLLSCAN", "LIMIT"])
+        self.assertTrue(summary["collscan"])
+        self.assertEqual(summary["examinedPerReturned"], 1000.0)
+
+    def test_route_context_middleware(self):
+        """
+        Test that the route template of the request is visible to code running inside it.
+        """
+        app = FastAPI()
+        app.add_middleware(RequestContextMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int):
+            return {"route": current_route()}
+
+        response = TestClient(app).get("/items/1")
+
+        self.assertEqual(response.json(), {"route": "GET /items/{item_id}"})
+        self.assertIsNone(current_route())
+
+
+if __name__ == '__main__':
+    unittest.main()
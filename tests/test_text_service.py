@@ -51,5 +51,43 @@ class TestTextTransformService(unittest.TestCase):
             result = asyncio.run(TextTransformService.snake_to_camel(snake))
             self.assertEqual(result, expected_camel)
 
+    def test_convert_keys_recursive(self):
+        """
+        Test that nested dictionaries, including those inside lists, are only converted when requested.
+        """
+        # Setup: Document with nested snake_case keys
+        input_dict = {
+            'user_id': 1,
+            'bank_account': {'account_number': '42'},
+            'transactions': [{'date_available': 'today'}, 'plain_value'],
+        }
+
+        # Execute and Assert: Shallow conversion leaves nested keys untouched
+        shallow = TextTransformService.convert_keys(input_dict)
+        self.assertEqual(shallow['bankAccount'], {'account_number': '42'})
+
+        # Execute and Assert: Recursive conversion reaches every nested dictionary
+        deep = TextTransformService.convert_keys(input_dict, recursive=True)
+        self.assertEqual(deep, {
+            'userId': 1,
+            'bankAccount': {'accountNumber': '42'},
+            'transactions': [{'dateAvailable': 'today'}, 'plain_value'],
+        })
+
+    def test_convert_many(self):
+        """
+        Test batch conversion of a result list and that repeated keys are served from the translation cache.
+        """
+        # Setup: Documents sharing the same keys
+        documents = [{'payment_date': day, 'user_type': 'affiliate'} for day in range(5)]
+        hits_before = TextTransformService.to_camel.cache_info().hits
+
+        # Execute: Convert the whole list
+        result = TextTransformService.convert_many(documents)
+
+        # Assert: Every document converted, and all but the first document's keys were cache hits
+        self.assertEqual(result[4], {'paymentDate': 4, 'userType': 'affiliate'})
+        self.assertGreaterEqual(TextTransformService.to_camel.cache_info().hits - hits_before, 8)
+
 if __name__ == '__main__':
     unittest.main()
@@ -28,6 +28,9 @@ class TestTokenService(unittest.TestCase):
         self.settings_patch = patch('services.token_service.settings', self.mock_settings)
         self.settings_patch.start()
 
+        # Start every test with an empty verified token cache
+        TokenService.token_cache.clear()
+
         # Encode a valid JWT for testing purposes
         self.valid_email = "user@example.com"
         self.valid_token = jwt.encode(
@@ -77,6 +80,75 @@ class TestTokenService(unittest.TestCase):
         with self.assertRaises(HTTPException):
             TokenService.get_email_from_token('invalid.token')
 
+    def test_decode_token_cached(self):
+        """
+        Test that the signature of a token is verified once and later decodes are served from the cache.
+        """
+        hits_before = TokenService.cache_stats()['hits']
+
+        with patch('services.token_service.jwt.decode', wraps=jwt.decode) as mock_decode:
+            first = TokenService.decode_token(self.valid_token)
+            second = TokenService.decode_token(self.valid_token)
+
+        self.assertEqual(first, second)
+        mock_decode.assert_called_once()
+        self.assertEqual(TokenService.cache_stats()['hits'] - hits_before, 1)
+
+        # Mutating a returned payload must not alter the cached one
+        first['sub'] = 'someone@else.com'
+        self.assertEqual(TokenService.decode_token(self.valid_token)['sub'], self.valid_email)
+
+    @patch('services.cache_service.time.monotonic')
+    def test_decode_token_cache_expires_with_token(self, mock_monotonic):
+        """
+        Test that a cached token stops being served once its own expiry has passed.
+        """
+        # Setup: Token expiring in 60 seconds, cached at t=1000
+        mock_monotonic.return_value = 1000.0
+        token = jwt.encode(
+            {"sub": self.valid_email, "exp": datetime.utcnow() + timedelta(seconds=60)},
+            self.mock_settings.jwt_secret,
+            algorithm=self.mock_settings.jwt_algorithm
+        )
+        TokenService.decode_token(token)
+
+        # Execute and Assert: Still cached before its expiry
+        mock_monotonic.return_value = 1030.0
+        with patch('services.token_service.jwt.decode') as mock_decode:
+            TokenService.decode_token(token)
+            mock_decode.assert_not_called()
+
+        # Execute and Assert: Verified again (and rejected by PyJWT) after its expiry
+        mock_monotonic.return_value = 1090.0
+        with patch('services.token_service.jwt.decode', side_effect=jwt.ExpiredSignatureError) as mock_decode:
+            with self.assertRaises(HTTPException):
+                TokenService.decode_token(token)
+            mock_decode.assert_called_once()
+
+    def test_invalid_token_not_cached(self):
+        """
+        Test that tokens failing verification are never cached.
+        """
+        with self.assertRaises(HTTPException):
+            TokenService.decode_token('invalid.token')
+        self.assertEqual(TokenService.cache_stats()['size'], 0)
+
+    def test_create_jwt_with_role_claims(self):
+        """
+        Test that the user type and token version are signed into the token and read back as role claims.
+        """
+        token = TokenService.create_jwt(self.valid_email, 'admin', 2)
+
+        payload = TokenService.decode_token(token)
+        self.assertEqual(TokenService.get_role_claims(payload), ('admin', 2))
+
+    def test_get_role_claims_legacy_token(self):
+        """
+        Test that tokens issued without role claims report none.
+        """
+        payload = TokenService.decode_token(self.valid_token)
+        self.assertIsNone(TokenService.get_role_claims(payload))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
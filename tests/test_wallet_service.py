@@ -1,12 +1,14 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from datetime import datetime
 from fastapi import HTTPException
-from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 
 from services.wallet_service import WalletService
 
 
-class TestWalletService(unittest.TestCase):
+class TestWalletService(unittest.IsolatedAsyncioTestCase):
     """
     Test suite for WalletService class, which manages wallet-related operations.
     """
@@ -17,35 +19,44 @@ class TestWalletService(unittest.TestCase):
         """
         self.valid_user_id = '507f1f77bcf86cd799439011'
         self.invalid_user_id = 'invalid_id'
-        self.wallet_data = {
-            'available_balance': 100,
-            'transactions': [
-                {'id': '1', 'amount': 50, 'date_available': datetime.now() + timedelta(days=-1)},
-                {'id': '2', 'amount': 150, 'date_available': datetime.now() + timedelta(days=1)}
-            ]
-        }
+
+        # Settle on read unless a test enables the background settlement worker
+        self.settings_patch = patch('services.wallet_service.settings', MagicMock(settlement_worker_enabled=False))
+        self.mock_settings = self.settings_patch.start()
+
+    def tearDown(self):
+        """
+        Clean up (stop) settings patch after each test.
+        """
+        self.settings_patch.stop()
 
     @patch('services.wallet_service.db')
     async def test_check_balances_valid_user(self, mock_db):
         """
-        Test checking balances for a valid user. This test verifies that balances are correctly
-        calculated and the database update function is called.
+        Test checking balances for a valid user. This test verifies that the wallet is settled
+        atomically on the server and the settled balances are returned.
         """
-        # Mock the MongoDB document
-        mock_wallet_doc = MagicMock()
-        mock_wallet_doc.find_one.return_value = self.wallet_data
-        mock_wallet_doc.update_one = MagicMock()
-
-        mock_db.wallet.return_value = mock_wallet_doc
+        # Mock the settled wallet returned by MongoDB
+        mock_db.wallet.find_one_and_update = AsyncMock(
+            return_value={'available_balance': 150, 'pending_balance': 150}
+        )
 
         # Execute the service method
         available_balance, pending_balance = await WalletService.check_available_and_pending_balance(
             self.valid_user_id)
         
         # Assertions
-        self.assertEqual(available_balance, 150)  # 100 initial + 50 from past transaction
-        self.assertEqual(pending_balance, 150)  # Only the future transaction
-        mock_wallet_doc.update_one.assert_called_once()
+        self.assertEqual(available_balance, 150)  # Balances exactly as settled by the server
+        self.assertEqual(pending_balance, 150)
+
+        # The update targets the ObjectId, uses the settlement pipeline and never fetches transactions
+        mock_db.wallet.find_one_and_update.assert_awaited_once()
+        call = mock_db.wallet.find_one_and_update.call_args
+        self.assertEqual(call.args[0], {'user_id': ObjectId(self.valid_user_id)})
+        self.assertIs(call.args[1], WalletService.SETTLEMENT_PIPELINE)
+        self.assertEqual(call.kwargs['return_document'], ReturnDocument.AFTER)
+        self.assertNotIn('transactions', call.kwargs['projection'])
+        mock_db.wallet.find_one.assert_not_called()
 
     @patch('services.wallet_service.db')
     async def test_check_balances_invalid_user(self, mock_db):
@@ -53,9 +64,6 @@ class TestWalletService(unittest.TestCase):
         Test behavior with an invalid user ID. This test checks that an HTTPException is raised
         for an invalid user ID.
         """
-        # Mock the MongoDB operation to not find the user
-        mock_db.wallet.find_one.return_value = None
-        
         # Expecting an HTTPException for invalid user ID
         with self.assertRaises(HTTPException) as context:
             await WalletService.check_available_and_pending_balance(self.invalid_user_id)
@@ -69,7 +77,7 @@ class TestWalletService(unittest.TestCase):
         HTTPException is raised for a missing wallet.
         """
         # Mock the MongoDB operation to not find the wallet
-        mock_db.wallet.find_one.return_value = None
+        mock_db.wallet.find_one_and_update = AsyncMock(return_value=None)
         
         # Expecting an HTTPException for wallet not found
         with self.assertRaises(HTTPException) as context:
@@ -77,6 +85,160 @@ class TestWalletService(unittest.TestCase):
         
         self.assertEqual(context.exception.status_code, 404)
 
+    @patch('services.wallet_service.db')
+    async def test_check_balances_pure_lookup(self, mock_db):
+        """
+        Test that balances are only read, never settled, when the background settlement worker is enabled.
+        """
+        # Setup: Worker enabled and a settled wallet stored
+        self.mock_settings.settlement_worker_enabled = True
+        mock_db.wallet.find_one = AsyncMock(return_value={'available_balance': 80, 'pending_balance': 20})
+
+        # Execute the service method
+        balances = await WalletService.check_available_and_pending_balance(self.valid_user_id)
+
+        # Assert: A projected lookup without any write
+        self.assertEqual(balances, (80, 20))
+        mock_db.wallet.find_one.assert_awaited_once_with(
+            {'user_id': ObjectId(self.valid_user_id)}, WalletService.BALANCE_PROJECTION
+        )
+        mock_db.wallet.find_one_and_update.assert_not_called()
+
+    def test_new_wallet_settled(self):
+        """
+        Test that new wallets store both balances, so that sweeps never need to find them.
+        """
+        now = datetime(2024, 1, 10)
+        transactions = [
+            {'amount': 5, 'date_available': datetime(2024, 1, 1)},
+            {'amount': 7, 'date_available': datetime(2024, 2, 1)},
+        ]
+
+        wallet = WalletService.new_wallet(ObjectId(self.valid_user_id), transactions, now=now)
+
+        self.assertEqual(wallet['available_balance'], 5)
+        self.assertEqual(wallet['pending_balance'], 7)
+        self.assertEqual(wallet['transactions'], transactions[1:])
+
+    def test_unsettled_filter(self):
+        """
+        Test that only narrowed-down lookups also select never settled wallets.
+        """
+        now = datetime(2024, 1, 10)
+        self.assertEqual(WalletService.unsettled_filter(now), {'transactions.date_available': {'$lte': now}})
+        self.assertIn({'pending_balance': {'$exists': False}}, WalletService.unsettled_filter(now, never_settled=True)['$or'])
+
+    def test_settlement_pipeline_is_server_side(self):
+        """
+        Test that the settlement pipeline compares transactions against the server clock
+        and computes every field in a single stage.
+        """
+        self.assertEqual(len(WalletService.SETTLEMENT_PIPELINE), 1)
+        stage = WalletService.SETTLEMENT_PIPELINE[0]['$set']
+        self.assertEqual(set(stage), {'available_balance', 'pending_balance', 'transactions'})
+        self.assertIn('$$NOW', repr(stage))
+
+
+class TestWalletServiceBatch(unittest.IsolatedAsyncioTestCase):
+    """
+    Test suite for the batched balance lookup used to enrich whole pages of documents.
+    """
+
+    def setUp(self):
+        """
+        Set up three users with their settled balances.
+        """
+        self.user_ids = [str(ObjectId()) for _ in range(3)]
+        self.wallets = [
+            {'user_id': ObjectId(self.user_ids[0]), 'available_balance': 150, 'pending_balance': 150},
+            {'user_id': ObjectId(self.user_ids[1]), 'available_balance': 20, 'pending_balance': 0},
+            {'user_id': ObjectId(self.user_ids[2]), 'available_balance': 0, 'pending_balance': 30},
+        ]
+
+        self.settings_patch = patch('services.wallet_service.settings', MagicMock(settlement_worker_enabled=False))
+        self.mock_settings = self.settings_patch.start()
+
+    def tearDown(self):
+        """
+        Clean up (stop) settings patch after each test.
+        """
+        self.settings_patch.stop()
+
+    def mock_wallet_collection(self, mock_db, wallets):
+        """
+        Wires a mocked wallet collection whose find cursor returns the given wallets.
+        """
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=wallets)
+        mock_db.wallet.find.return_value = cursor
+        mock_db.wallet.update_many = AsyncMock()
+        return mock_db.wallet
+
+    @patch('services.wallet_service.db')
+    async def test_batch_balances_round_trips(self, mock_db):
+        """
+        Test that a page of users costs one settlement update and one `$in` query, whatever its size.
+        """
+        # Setup: Mock collection holding the three wallets
+        wallet_collection = self.mock_wallet_collection(mock_db, self.wallets)
+
+        # Execute: Look up balances for the whole page, with a duplicated id
+        balances = await WalletService.check_available_and_pending_balances(self.user_ids + [self.user_ids[0]])
+
+        # Assert: Balances returned for every user
+        self.assertEqual(balances[self.user_ids[0]], (150, 150))
+        self.assertEqual(balances[self.user_ids[1]], (20, 0))
+        self.assertEqual(balances[self.user_ids[2]], (0, 30))
+
+        # Assert: Exactly two round trips, no per-user lookups
+        wallet_collection.update_many.assert_awaited_once()
+        wallet_collection.find.assert_called_once()
+        wallet_collection.find_one.assert_not_called()
+        wallet_collection.find_one_and_update.assert_not_called()
+
+        # Assert: Settlement runs the server-side pipeline and the read skips transactions
+        update_filter, pipeline = wallet_collection.update_many.call_args.args
+        self.assertEqual(len(update_filter['user_id']['$in']), 3)
+        self.assertIs(pipeline, WalletService.SETTLEMENT_PIPELINE)
+        self.assertNotIn('transactions', wallet_collection.find.call_args.args[1])
+
+    @patch('services.wallet_service.db')
+    async def test_batch_balances_pure_lookup(self, mock_db):
+        """
+        Test that the batch lookup is a single read when the background settlement worker is enabled.
+        """
+        self.mock_settings.settlement_worker_enabled = True
+        wallet_collection = self.mock_wallet_collection(mock_db, self.wallets)
+
+        balances = await WalletService.check_available_and_pending_balances(self.user_ids)
+
+        self.assertEqual(len(balances), 3)
+        wallet_collection.find.assert_called_once()
+        wallet_collection.update_many.assert_not_called()
+
+    @patch('services.wallet_service.db')
+    async def test_batch_balances_missing_wallet(self, mock_db):
+        """
+        Test that a missing wallet raises a 404 like the single-user lookup.
+        """
+        self.mock_wallet_collection(mock_db, self.wallets[:2])
+
+        with self.assertRaises(HTTPException) as context:
+            await WalletService.check_available_and_pending_balances(self.user_ids)
+
+        self.assertEqual(context.exception.status_code, 404)
+
+    @patch('services.wallet_service.db')
+    async def test_batch_balances_invalid_user(self, mock_db):
+        """
+        Test that an invalid user id raises a 400 before any query is sent.
+        """
+        with self.assertRaises(HTTPException) as context:
+            await WalletService.check_available_and_pending_balances(['invalid_id'])
+
+        self.assertEqual(context.exception.status_code, 400)
+        mock_db.wallet.update_many.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()